@@ -21,9 +21,45 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     login.init_app(app)
 
+    # Pragmas de SQLite (WAL, busy_timeout...) antes de abrir la primera conexión
+    from app import perfil_sqlite
+    perfil_sqlite.init_app(app)
+
     # Importar modelos para que Flask sepa que existen
     from app import models
 
+    # Conteo de consultas SQL por petición (encabezados en debug / presupuestos en pruebas)
+    from app import instrumentacion
+    instrumentacion.init_app(app)
+
+    # Métricas opcionales (METRICAS_HABILITADAS) expuestas en /admin/metricas
+    from app import metricas
+    metricas.init_app(app)
+
+    # Caché de fragmentos versionada (agenda semanal, etc.)
+    from app import cache
+    cache.init_app(app)
+
+    # Catálogos en memoria (niveles, membresías, tarifas)
+    from app import catalogos
+    catalogos.init_app(app)
+
+    # Folios de socios y recibos repartidos por bloques
+    from app import folios
+    folios.init_app(app)
+
+    # Tareas en segundo plano (barridos nocturnos, reconstrucciones...)
+    from app import planificador
+    planificador.init_app(app)
+
+    # Recordatorios de pago por correo o webhook (los corre el planificador)
+    from app import recordatorios
+    recordatorios.init_app(app)
+
+    # Analítica de asistencia en columnas (NumPy opcional: se importa al usarla)
+    from app import analitica
+    analitica.init_app(app)
+
     # Registrar Blueprints
     from app.routes.socios import socios_bp
     app.register_blueprint(socios_bp)
@@ -49,6 +85,10 @@ def create_app(config_class=Config):
     from app.routes.reportes import reportes_bp
     app.register_blueprint(reportes_bp)
 
+    # Comandos de mantenimiento (flask estatus barrer, etc.)
+    from app.comandos import registrar_comandos
+    registrar_comandos(app)
+
 
     # Ruta raíz temporal para que no dé error 404 al entrar a localhost:5000
     @app.route('/')
@@ -0,0 +1,325 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from sqlalchemy import case, func, select
+from app import db
+from app.instrumentacion import llenado_de_cache
+
+# --- ANALÍTICA DE ASISTENCIA (arreglos columnares con NumPy) ---
+#
+# Las marcas de un rango de fechas se leen de una sola pasada como columnas
+# compactas (socio int32, clase uint16, día uint16, estado int8) y todas las
+# métricas salen de bincount/cumsum sobre esas columnas: sin objetos ORM ni
+# ciclos por fila. Definiciones:
+#   - sesión: (clase, fecha) con al menos una marca;
+#   - esperada: cada sesión de una clase a partir del alta de una inscripción
+#     activa, más cada marca de alguien que no estaba inscrito (clase suelta);
+#   - sin marca: sesión esperada de un inscrito sin ningún registro
+#     (inscrito pero ausente). Las inscripciones dadas de baja no guardan la
+#     fecha de baja: de ellas solo cuentan sus marcas.
+# Cada proceso conserva las últimas cargas ANALITICA_VIGENCIA_SEGUNDOS.
+
+ESTADOS = ('Presente', 'Falta', 'Justificado')  # código = posición; 3 = otro
+BLOQUE_LECTURA = 200000
+MAX_CARGAS = 4
+
+HorarioAnalitica = namedtuple('HorarioAnalitica', 'id dia_semana hora_inicio nivel capacidad')
+
+_cargas = OrderedDict()  # (desde, hasta) -> Datos
+_lock = threading.Lock()
+vigencia_segundos = 300
+
+def _np():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError('La analítica de asistencia requiere NumPy (pip install numpy).')
+    return numpy
+
+class Datos:
+    """ Columnas de asistencia e inscripción del rango [desde, hasta] """
+    __slots__ = ('desde', 'hasta', 'horarios', 'socio', 'clase', 'dia', 'estado',
+                 'insc_socio', 'insc_clase', 'insc_alta', 'segundos_carga', 'cargado', 'metricas')
+
+    def __init__(self, desde, hasta, horarios, marcas, inscripciones, segundos_carga):
+        self.desde, self.hasta = desde, hasta
+        self.horarios = horarios    # [HorarioAnalitica]; 'clase' es la posición en esta lista
+        self.socio, self.clase, self.dia, self.estado = marcas          # dia: días desde 'desde'
+        self.insc_socio, self.insc_clase, self.insc_alta = inscripciones  # alta: primer día esperado
+        self.segundos_carga = segundos_carga
+        self.cargado = time.monotonic()
+        self.metricas = None
+
+    @property
+    def dias(self):
+        return (self.hasta - self.desde).days + 1
+
+# --- CARGA ---
+
+def _dias_desde(columna, desde):
+    """ Días enteros entre 'desde' y la columna fecha, calculados en la BD """
+    if db.engine.dialect.name == 'sqlite':
+        # julianday(fecha) - julianday(desde); el juliano de un ordinal es ordinal + 1721424.5
+        return db.cast(func.julianday(columna) - (desde.toordinal() + 1721424.5), db.Integer)
+    return columna - desde
+
+def _leer_enteros(stmt):
+    """ Primera columna de la consulta como int64, por bloques del cursor DBAPI """
+    np = _np()
+    resultado = db.session.connection().execute(stmt)
+    partes = []
+    try:
+        # El cursor crudo evita armar un Row por fila (~40% menos tiempo con 10M de marcas)
+        cursor = resultado.cursor
+        while True:
+            filas = cursor.fetchmany(BLOQUE_LECTURA)
+            if not filas:
+                break
+            partes.append(np.fromiter(itertools.chain.from_iterable(filas), dtype=np.int64, count=len(filas)))
+    finally:
+        resultado.close()
+    return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64)
+
+def cargar(desde, hasta):
+    """
+    Lee marcas, inscripciones activas y horarios en columnas. Las marcas viajan
+    empacadas en un solo entero por fila (socio, horario, día, estado): el
+    driver convierte un valor por fila en lugar de cuatro.
+    """
+    from app.models import Asistencia, Horario, Inscripcion, Socio
+
+    np = _np()
+    inicio = time.perf_counter()
+    dias = (hasta - desde).days + 1
+    if not 0 < dias <= 1 << 16:
+        raise ValueError('El rango debe tener entre 1 y 65536 días.')
+
+    horarios = [HorarioAnalitica(*fila) for fila in db.session.query(
+        Horario.id, Horario.dia_semana, Horario.hora_inicio, Horario.nivel, Horario.capacidad_maxima
+    ).order_by(Horario.id)]
+    max_horario = horarios[-1].id if horarios else 0
+    max_socio = db.session.query(func.max(Socio.id)).scalar() or 0
+    if max_horario >= 1 << 16 or max_socio >= 1 << 29:
+        raise ValueError('IDs fuera del rango empacable (horario < 65536, socio < 2^29).')
+
+    posicion = np.full(max_horario + 1, -1, dtype=np.int32)
+    posicion[[h.id for h in horarios]] = np.arange(len(horarios), dtype=np.int32)
+
+    estado = case({nombre: codigo for codigo, nombre in enumerate(ESTADOS)},
+                  value=Asistencia.estado, else_=len(ESTADOS))
+    clave = ((Asistencia.socio_id * 65536 + Asistencia.horario_id) * 65536
+             + _dias_desde(Asistencia.fecha, desde)) * 4 + estado
+    claves = _leer_enteros(select(clave).where(Asistencia.fecha.between(desde, hasta)))
+
+    clase = posicion[np.minimum((claves >> 18) & 0xFFFF, max_horario)]
+    if (clase < 0).any():  # marcas de horarios que ya no existen
+        claves, clase = claves[clase >= 0], clase[clase >= 0]
+    marcas = ((claves >> 34).astype(np.int32), clase.astype(np.uint16),
+              ((claves >> 2) & 0xFFFF).astype(np.uint16), (claves & 3).astype(np.int8))
+    del claves, clase
+
+    # Inscripciones activas: una por (socio, clase), con el alta más antigua
+    socios, clases, altas = [], [], []
+    for socio_id, horario_id, fecha_alta in db.session.query(
+            Inscripcion.socio_id, Inscripcion.horario_id, Inscripcion.fecha_alta).filter_by(activo=True):
+        if horario_id > max_horario or posicion[horario_id] < 0:
+            continue
+        socios.append(socio_id)
+        clases.append(posicion[horario_id])
+        # Antes del rango cuenta desde el día 0; después del rango no espera ninguna sesión (= dias)
+        altas.append(min(max((fecha_alta.date() - desde).days, 0), dias) if fecha_alta else 0)
+    par = np.asarray(socios, dtype=np.int64) * max(len(horarios), 1) + np.asarray(clases, dtype=np.int64)
+    altas = np.asarray(altas, dtype=np.int32)
+    orden = np.lexsort((altas, par))
+    par, primeros = np.unique(par[orden], return_index=True)
+    inscripciones = ((par // max(len(horarios), 1)).astype(np.int32),
+                     (par % max(len(horarios), 1)).astype(np.uint16), altas[orden][primeros])
+
+    return Datos(desde, hasta, horarios, marcas, inscripciones, time.perf_counter() - inicio)
+
+def datos_de(desde, hasta):
+    """ Columnas del rango; se reutilizan mientras la carga tenga menos de vigencia_segundos """
+    clave = (desde, hasta)
+    with _lock:
+        datos = _cargas.get(clave)
+        if datos is None or time.monotonic() - datos.cargado >= vigencia_segundos:
+            # Con el candado: dos peticiones del mismo reporte no cargan dos veces
+            with llenado_de_cache():
+                datos = _cargas[clave] = cargar(desde, hasta)
+            while len(_cargas) > MAX_CARGAS:
+                _cargas.popitem(last=False)
+        _cargas.move_to_end(clave)
+        return datos
+
+def descartar():
+    with _lock:
+        _cargas.clear()
+
+# --- CÁLCULO VECTORIZADO ---
+
+def _agrupar(np, indices, valores, n):
+    """ Suma las filas de 'valores' (m, k) por grupo: resultado (n, k) """
+    return np.stack([np.bincount(indices, weights=valores[:, j], minlength=n)
+                     for j in range(valores.shape[1])], axis=1).astype(np.int64)
+
+def calcular(datos):
+    """
+    Conteos (n, 5) = presentes, faltas, justificados, otros, sin marca; por
+    socio, clase y día del rango, más las sesiones realizadas por clase y por
+    día. Se memorizan en 'datos'.
+    """
+    if datos.metricas is not None:
+        return datos.metricas
+
+    np = _np()
+    inicio = time.perf_counter()
+    H, D = len(datos.horarios), datos.dias
+    S = int(max(datos.socio.max(initial=0), datos.insc_socio.max(initial=0))) + 1
+    socio = datos.socio.astype(np.int64)
+    clase = datos.clase.astype(np.int64)
+
+    # Sesiones realizadas: (clase, día) con al menos una marca
+    sesion = clase * D + datos.dia
+    realizada = np.bincount(sesion, minlength=H * D).reshape(H, D) > 0
+
+    # Marca "cubierta": su (socio, clase) tiene inscripción activa con alta <= día
+    par_insc = datos.insc_socio.astype(np.int64) * H + datos.insc_clase
+    cubiertas_insc = np.zeros(len(par_insc), dtype=np.int64)
+    sin_marca_sesion = np.zeros((H, D), dtype=np.int32)
+    if len(par_insc):
+        par = socio * H + clase
+        pos = np.minimum(np.searchsorted(par_insc, par), len(par_insc) - 1)
+        cubierta = (par_insc[pos] == par) & (datos.insc_alta[pos] <= datos.dia)
+        del par
+        cubiertas_insc = np.bincount(pos[cubierta], minlength=len(par_insc))
+        sin_marca_sesion -= np.bincount(sesion[cubierta], minlength=H * D).reshape(H, D).astype(np.int32)
+        del pos, cubierta
+    del sesion
+
+    # Sin marca por sesión = inscritos vigentes (altas acumuladas) - marcas cubiertas
+    altas = np.bincount(datos.insc_clase.astype(np.int64) * (D + 1) + datos.insc_alta,
+                        minlength=H * (D + 1)).reshape(H, D + 1)[:, :D]
+    sin_marca_sesion += altas.cumsum(axis=1, dtype=np.int32)
+    sin_marca_sesion[~realizada] = 0
+    del altas
+
+    # Sin marca por inscripción = sesiones realizadas desde su alta - sus marcas cubiertas
+    antes = np.zeros((H, D + 1), dtype=np.int32)
+    np.cumsum(realizada, axis=1, dtype=np.int32, out=antes[:, 1:])
+    sin_marca_insc = antes[datos.insc_clase, D] - antes[datos.insc_clase, datos.insc_alta] - cubiertas_insc
+    del antes
+
+    def conteos(indices, n, sin_marca):
+        por_estado = np.bincount(indices * 4 + datos.estado, minlength=n * 4).reshape(n, 4)
+        return np.column_stack([por_estado, sin_marca]).astype(np.int64)
+
+    datos.metricas = {
+        'socio': conteos(socio, S, np.bincount(datos.insc_socio, weights=sin_marca_insc, minlength=S)),
+        'clase': conteos(clase, H, sin_marca_sesion.sum(axis=1)),
+        'dia': conteos(datos.dia.astype(np.int64), D, sin_marca_sesion.sum(axis=0)),
+        'sesiones_clase': realizada.sum(axis=1),
+        'sesiones_dia': realizada.sum(axis=0),
+        'segundos_calculo': time.perf_counter() - inicio,
+    }
+    return datos.metricas
+
+# --- REPORTE (listas y dicts listos para plantilla o JSON) ---
+
+def _renglones(np, etiquetas, conteos, **extra):
+    """ Une etiquetas [dict] con sus conteos y tasas; extra: columnas adicionales """
+    esperadas = conteos.sum(axis=1)
+    presentes = conteos[:, 0]
+    ausencias = conteos[:, 1] + conteos[:, 4]
+    tasa = np.divide(presentes, esperadas, out=np.zeros(len(esperadas)), where=esperadas > 0)
+    columnas = {
+        'presentes': presentes.tolist(), 'faltas': conteos[:, 1].tolist(),
+        'justificados': conteos[:, 2].tolist(), 'sin_marca': conteos[:, 4].tolist(),
+        'ausencias': ausencias.tolist(), 'esperadas': esperadas.tolist(),
+        'tasa': np.round(tasa, 4).tolist(),
+    }
+    columnas.update({nombre: valores.tolist() for nombre, valores in extra.items()})
+    return [dict(etiqueta, **{nombre: valores[i] for nombre, valores in columnas.items()})
+            for i, etiqueta in enumerate(etiquetas)]
+
+def _por_grupo(np, grupos, conteos, sesiones):
+    """ Suma clases con la misma etiqueta (franja, nivel): [(etiqueta, conteos, sesiones)] """
+    claves = sorted(set(grupos))
+    indice = np.asarray([claves.index(g) for g in grupos], dtype=np.int64)
+    return claves, _agrupar(np, indice, conteos, len(claves)), np.bincount(indice, weights=sesiones,
+                                                                         minlength=len(claves))
+
+def reporte(desde, hasta, limite_socios=20):
+    """ Métricas del rango: totales, por clase, franja, nivel, semana, día de la semana y socios """
+    from app.models import DIAS_SEMANA
+
+    np = _np()
+    datos = datos_de(desde, hasta)
+    metricas = calcular(datos)
+    H, D = len(datos.horarios), datos.dias
+
+    # Por clase (asistencia promedio = presentes por sesión realizada)
+    por_clase, sesiones = metricas['clase'], metricas['sesiones_clase']
+    promedio = np.divide(por_clase[:, 0], sesiones, out=np.zeros(H), where=sesiones > 0)
+    capacidad = np.asarray([h.capacidad or 0 for h in datos.horarios], dtype=np.float64)
+    ocupacion = np.divide(promedio, capacidad, out=np.zeros(H), where=capacidad > 0)
+    clases = _renglones(np, [{'horario_id': h.id, 'dia_semana': h.dia_semana, 'nivel': h.nivel,
+                              'hora': h.hora_inicio.strftime('%H:%M'), 'capacidad': h.capacidad}
+                             for h in datos.horarios],
+                        por_clase, sesiones=sesiones, promedio_asistentes=np.round(promedio, 2),
+                        ocupacion=np.round(ocupacion, 4))
+    orden_dia = {dia: i for i, dia in enumerate(DIAS_SEMANA)}
+    clases.sort(key=lambda c: (orden_dia.get(c['dia_semana'], 7), c['hora'], c['nivel']))
+
+    # Franja horaria (el horario no tiene instructor: la franja es la unidad de turno) y nivel
+    grupos = {}
+    for nombre, etiqueta in (('franja', lambda h: h.hora_inicio.strftime('%H:%M')), ('nivel', lambda h: h.nivel)):
+        claves, conteos, ses = _por_grupo(np, [etiqueta(h) for h in datos.horarios], por_clase, sesiones)
+        prom = np.divide(conteos[:, 0], ses, out=np.zeros(len(claves)), where=ses > 0)
+        grupos[nombre] = _renglones(np, [{nombre: c} for c in claves], conteos,
+                                    sesiones=ses.astype(np.int64), promedio_asistentes=np.round(prom, 2))
+
+    # Por semana (lunes a domingo) y patrón por día de la semana
+    por_dia, sesiones_dia = metricas['dia'], metricas['sesiones_dia']
+    dias = np.arange(D)
+    semana = (dias + datos.desde.weekday()) // 7
+    W = int(semana[-1]) + 1
+    lunes = datos.desde - timedelta(days=datos.desde.weekday())
+    semanas = _renglones(np, [{'semana': (lunes + timedelta(weeks=i)).isoformat()} for i in range(W)],
+                         _agrupar(np, semana, por_dia, W),
+                         sesiones=np.bincount(semana, weights=sesiones_dia, minlength=W).astype(np.int64))
+    dia_semana = (dias + datos.desde.weekday()) % 7
+    por_dia_semana = _renglones(np, [{'dia_semana': d} for d in DIAS_SEMANA], _agrupar(np, dia_semana, por_dia, 7),
+                                sesiones=np.bincount(dia_semana, weights=sesiones_dia, minlength=7).astype(np.int64))
+
+    # Socios con más ausencias (faltas + sin marca); desempata la menor tasa
+    por_socio = metricas['socio']
+    esperadas = por_socio.sum(axis=1)
+    ausencias = por_socio[:, 1] + por_socio[:, 4]
+    con_clases = np.flatnonzero(esperadas)
+    tasa = por_socio[con_clases, 0] / esperadas[con_clases]
+    peores = con_clases[np.lexsort((tasa, -ausencias[con_clases]))[:limite_socios]]
+    socios = _renglones(np, [{'socio_id': int(i)} for i in peores], por_socio[peores])
+
+    totales = _renglones(np, [{}], por_clase.sum(axis=0, keepdims=True))[0]
+    totales.update(sesiones=int(sesiones.sum()), socios=len(con_clases))
+    return {
+        'desde': datos.desde.isoformat(), 'hasta': datos.hasta.isoformat(),
+        'marcas': int(len(datos.socio)), 'inscripciones_activas': int(len(datos.insc_socio)),
+        'segundos': {'carga': round(datos.segundos_carga, 3), 'calculo': round(metricas['segundos_calculo'], 3)},
+        'totales': totales,
+        'por_clase': clases,
+        'por_franja': grupos['franja'],
+        'por_nivel': grupos['nivel'],
+        'por_semana': semanas,
+        'por_dia_semana': por_dia_semana,
+        'socios_mas_ausentes': socios,
+    }
+
+def init_app(app):
+    global vigencia_segundos
+    vigencia_segundos = app.config.get('ANALITICA_VIGENCIA_SEGUNDOS', vigencia_segundos)
+
+    # Otra app (ej. pruebas) puede apuntar a otra BD con el mismo rango de fechas
+    descartar()
@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+from itertools import chain
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.instrumentacion import llenado_de_cache
+
+# --- CACHÉ DE FRAGMENTOS VERSIONADA ---
+#
+# Cada grupo de tablas tiene un número de versión en 'version_datos' que sube
+# en el mismo commit que modifica alguna de sus tablas (ORM o UPDATE/DELETE
+# masivos). Las entradas del caché se guardan con la versión en la llave:
+# al cambiar los datos la llave cambia y lo viejo sale por LRU. Leer la
+# versión es una consulta por PK, así que todos los procesos ven el cambio.
+
+# Grupo de versión -> tablas que lo invalidan
+GRUPOS_VERSION = {
+    'agenda': ('horario', 'inscripcion'),
+    'catalogos': ('nivel', 'membresia', 'tarifa'),
+}
+
+# Funciones f(grupo) que se llaman después de un commit que subió la versión
+# del grupo en ESTE proceso (ej. app/catalogos.py descarta su copia)
+oyentes_version = []
+
+class CacheLRU:
+    """ Diccionario acotado con desalojo LRU y contadores de aciertos/fallos """
+
+    def __init__(self, nombre, max_entradas=256):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener_o_calcular(self, clave, calcular):
+        """ Regresa el valor guardado o lo calcula con calcular() y lo guarda """
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave]
+            self.fallos += 1
+
+        # Se calcula fuera del candado; si dos hilos fallan a la vez gana el último
+        with llenado_de_cache():
+            valor = calcular()
+
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {'entradas': len(self._datos), 'max_entradas': self.max_entradas,
+                    'aciertos': self.aciertos, 'fallos': self.fallos, 'desalojos': self.desalojos}
+
+# Cachés registrados (se reportan en /admin/metricas)
+caches = {}
+
+def crear_cache(nombre, max_entradas=256):
+    caches[nombre] = CacheLRU(nombre, max_entradas)
+    return caches[nombre]
+
+agenda_cache = crear_cache('agenda')
+
+# --- VERSIÓN DE DATOS ---
+
+def version_de(grupo):
+    """ Versión actual del grupo (memorizada durante la petición) """
+    from app.models import VersionDatos
+
+    memo = g.setdefault('versiones_datos', {}) if has_request_context() else {}
+    if grupo not in memo:
+        memo[grupo] = db.session.query(VersionDatos.version).filter_by(nombre=grupo).scalar() or 0
+    return memo[grupo]
+
+def fragmento(cache, grupo, clave, calcular):
+    """ Valor cacheado de 'clave' para la versión vigente del grupo """
+    return cache.obtener_o_calcular((clave, version_de(grupo)), calcular)
+
+def incrementar_version(grupo):
+    """ Sube la versión del grupo (upsert). No hace commit. """
+    from app.models import VersionDatos, _insert_con_conflicto
+
+    stmt = _insert_con_conflicto(VersionDatos).values(nombre=grupo, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=['nombre'],
+                                      set_={'version': VersionDatos.version + 1})
+    db.session.execute(stmt)
+
+    if has_request_context():
+        g.pop('versiones_datos', None)
+
+def _marcar_tabla(session, tabla):
+    for grupo, tablas in GRUPOS_VERSION.items():
+        if tabla in tablas:
+            session.info.setdefault('grupos_modificados', set()).add(grupo)
+
+def _marcar_objetos(session, objetos):
+    for obj in objetos:
+        tabla = getattr(obj, '__tablename__', None)
+        if tabla:
+            _marcar_tabla(session, tabla)
+
+@event.listens_for(Session, 'before_flush')
+def _antes_de_flush(session, flush_context, instances):
+    _marcar_objetos(session, chain(session.new, session.dirty, session.deleted))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _al_ejecutar_dml(orm_execute_state):
+    # UPDATE/DELETE/INSERT masivos (query.update, db.insert(Modelo), upserts...)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _marcar_tabla(orm_execute_state.session, mapper.local_table.name)
+
+@event.listens_for(Session, 'before_commit')
+def _antes_de_commit(session):
+    # before_commit corre ANTES del último flush: revisar también lo pendiente
+    _marcar_objetos(session, chain(session.new, session.dirty, session.deleted))
+    grupos = sorted(session.info.pop('grupos_modificados', ()))
+    for grupo in grupos:
+        incrementar_version(grupo)
+    session.info['grupos_confirmados'] = grupos
+
+@event.listens_for(Session, 'after_commit')
+def _despues_de_commit(session):
+    session.info.pop('grupos_modificados', None)
+    for grupo in session.info.pop('grupos_confirmados', ()):
+        for oyente in oyentes_version:
+            oyente(grupo)
+
+@event.listens_for(Session, 'after_rollback')
+def _despues_de_rollback(session):
+    session.info.pop('grupos_modificados', None)
+    session.info.pop('grupos_confirmados', None)
+
+def lineas_prometheus():
+    """ Colector para app/metricas.py """
+    lineas = [
+        '# HELP swimmers_cache_eventos_total Aciertos, fallos y desalojos por caché.',
+        '# TYPE swimmers_cache_eventos_total counter',
+    ]
+    for nombre, cache in caches.items():
+        datos = cache.estadisticas()
+        for evento in ('aciertos', 'fallos', 'desalojos'):
+            lineas.append(f'swimmers_cache_eventos_total{{cache="{nombre}",evento="{evento}"}} {datos[evento]}')
+    lineas += [
+        '# HELP swimmers_cache_entradas Entradas vigentes por caché.',
+        '# TYPE swimmers_cache_entradas gauge',
+    ]
+    for nombre, cache in caches.items():
+        lineas.append(f'swimmers_cache_entradas{{cache="{nombre}"}} {cache.estadisticas()["entradas"]}')
+    return lineas
+
+def init_app(app):
+    agenda_cache.max_entradas = app.config.get('CACHE_AGENDA_MAX', agenda_cache.max_entradas)
+
+    # Otra app (ej. pruebas) puede apuntar a otra BD con los mismos números de versión
+    for cache in caches.values():
+        cache.limpiar()
+
+    from app import metricas
+    if lineas_prometheus not in metricas.registro.colectores:
+        metricas.registro.colectores.append(lineas_prometheus)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import namedtuple
+from app import db
+from app import cache
+from app.instrumentacion import llenado_de_cache
+
+# --- CATÁLOGOS EN MEMORIA (Nivel, Membresía, Tarifa) ---
+#
+# Tablas pequeñas que casi no cambian y que se consultan en cada formulario
+# y en cada cotización. Se cargan una vez por proceso (3 consultas) y se
+# sirven desde memoria. Se descartan:
+#   - al instante, cuando un commit de ESTE proceso toca nivel/membresia/tarifa
+#     (incluye la cascada de admin.editar_nivel, que usa UPDATE masivos);
+#   - si otro proceso los cambió: la versión 'catalogos' en BD se revisa como
+#     máximo cada CATALOGOS_REVALIDAR_SEGUNDOS.
+
+NivelCatalogo = namedtuple('NivelCatalogo', 'id nombre orden')
+MembresiaCatalogo = namedtuple('MembresiaCatalogo', 'id nombre clases_por_semana')
+TarifaCatalogo = namedtuple('TarifaCatalogo', 'id membresia_id nivel costo_mensual costo_anualidad costo_inscripcion')
+
+class Catalogos:
+    __slots__ = ('version', 'niveles', 'membresias', 'tarifas', 'revisado')
+
+    def __init__(self, version, niveles, membresias, tarifas):
+        self.version = version
+        self.niveles = niveles          # [NivelCatalogo] ordenados por 'orden'
+        self.membresias = membresias    # [MembresiaCatalogo] ordenadas por id
+        self.tarifas = tarifas          # {(membresia_id, nivel): TarifaCatalogo}
+        self.revisado = time.monotonic()
+
+_actual = None
+_lock = threading.Lock()
+revalidar_segundos = 30
+
+def _cargar():
+    from app.models import Nivel, Membresia, Tarifa
+
+    version = cache.version_de('catalogos')
+    niveles = [NivelCatalogo(*fila) for fila in db.session.query(
+        Nivel.id, Nivel.nombre, Nivel.orden).order_by(Nivel.orden, Nivel.id)]
+    membresias = [MembresiaCatalogo(*fila) for fila in db.session.query(
+        Membresia.id, Membresia.nombre, Membresia.clases_por_semana).order_by(Membresia.id)]
+    tarifas = {(t.membresia_id, t.nivel): t for t in (TarifaCatalogo(*fila) for fila in db.session.query(
+        Tarifa.id, Tarifa.membresia_id, Tarifa.nivel,
+        Tarifa.costo_mensual, Tarifa.costo_anualidad, Tarifa.costo_inscripcion))}
+    return Catalogos(version, niveles, membresias, tarifas)
+
+def obtener():
+    """ Copia vigente de los catálogos (la carga o revalida si hace falta) """
+    global _actual
+
+    actual = _actual
+    if actual is not None and time.monotonic() - actual.revisado < revalidar_segundos:
+        return actual
+
+    with _lock:
+        actual = _actual
+        if actual is not None and time.monotonic() - actual.revisado < revalidar_segundos:
+            return actual
+
+        with llenado_de_cache():
+            if actual is not None and cache.version_de('catalogos') == actual.version:
+                actual.revisado = time.monotonic()
+            else:
+                actual = _actual = _cargar()
+        return actual
+
+def descartar(grupo='catalogos'):
+    """ Olvida la copia en memoria (oyente de app/cache.py) """
+    global _actual
+    if grupo == 'catalogos':
+        _actual = None
+
+# --- ATAJOS PARA FORMULARIOS Y COTIZACIONES ---
+
+def niveles():
+    return obtener().niveles
+
+def membresias():
+    return obtener().membresias
+
+def opciones_niveles():
+    """ choices de WTForms: [(nombre, nombre)] """
+    return [(n.nombre, n.nombre) for n in obtener().niveles]
+
+def opciones_membresias():
+    """ choices de WTForms: [(id, nombre)] """
+    return [(m.id, m.nombre) for m in obtener().membresias]
+
+def tarifa_de(membresia_id, nivel):
+    """ Tarifa de una combinación Membresía + Nivel, o None """
+    return obtener().tarifas.get((membresia_id, nivel))
+
+def init_app(app):
+    global revalidar_segundos
+    revalidar_segundos = app.config.get('CATALOGOS_REVALIDAR_SEGUNDOS', revalidar_segundos)
+
+    descartar()
+    if descartar not in cache.oyentes_version:
+        cache.oyentes_version.append(descartar)
@@ -0,0 +1,401 @@
+import os
+import click
+from flask.cli import AppGroup
+from app import db
+
+# --- COMANDOS DE MANTENIMIENTO (flask <grupo> <comando>) ---
+
+estatus_cli = AppGroup('estatus', help='Foto de estatus financiero de los socios.')
+
+@estatus_cli.command('barrer')
+def barrer_estatus():
+    """Pasa a 'vencido' a los socios cuya anualidad o mensualidad expiró (correr cada noche)."""
+    from app.models import barrer_estatus_vencidos
+
+    afectados = barrer_estatus_vencidos()
+    db.session.commit()
+    click.echo(f'Socios pasados a vencido: {afectados}')
+
+@estatus_cli.command('reconstruir')
+def reconstruir_estatus():
+    """Regenera la tabla estatus_socio desde el historial de pagos."""
+    from app.models import reconstruir_estatus_socios
+
+    total = reconstruir_estatus_socios()
+    db.session.commit()
+    click.echo(f'Estatus reconstruido para {total} socios.')
+
+horarios_cli = AppGroup('horarios', help='Mantenimiento de horarios y cupos.')
+
+@horarios_cli.command('reconciliar')
+@click.option('--reparar', is_flag=True, help='Corregir los contadores desfasados.')
+def reconciliar(reparar):
+    """Detecta (y opcionalmente corrige) desfases en 'ocupados' y en la agenda de cada socio."""
+    from app.models import reconciliar_ocupados, reconciliar_agendas
+
+    desfasados = reconciliar_ocupados(reparar=reparar)
+    for horario_id, guardado, real in desfasados:
+        click.echo(f'Horario {horario_id}: ocupados={guardado}, inscripciones activas={real}')
+
+    agendas = reconciliar_agendas(reparar=reparar)
+    for socio_id, (dias, clases), (dias_reales, clases_reales) in agendas:
+        click.echo(f'Socio {socio_id}: días={dias:07b} clases={clases}, '
+                   f'inscripciones activas: días={dias_reales:07b} clases={clases_reales}')
+
+    if reparar:
+        db.session.commit()
+        click.echo(f'Horarios corregidos: {len(desfasados)}; agendas corregidas: {len(agendas)}')
+    else:
+        click.echo(f'Horarios desfasados: {len(desfasados)}; agendas desfasadas: {len(agendas)}')
+
+asistencia_cli = AppGroup('asistencia', help='Mantenimiento de la sincronización de asistencia.')
+
+@asistencia_cli.command('purgar-claves')
+@click.option('--dias', default=30, show_default=True, help='Conservar las llaves de los últimos N días.')
+def purgar_claves(dias):
+    """Borra llaves de idempotencia viejas (un dispositivo no reenvía marcas de hace semanas)."""
+    from app.models import purgar_claves_procesadas
+
+    borradas = purgar_claves_procesadas(dias)
+    db.session.commit()
+    click.echo(f'Llaves borradas: {borradas}')
+
+resumenes_cli = AppGroup('resumenes', help='Resúmenes diarios de ingresos y asistencia.')
+
+@resumenes_cli.command('reconstruir')
+def reconstruir_resumenes():
+    """Regenera los resúmenes diarios desde pagos y asistencias (backfill)."""
+    from app.models import reconstruir_resumenes
+
+    dias, clases = reconstruir_resumenes()
+    db.session.commit()
+    click.echo(f'Resumen de ingresos: {dias} filas (día/concepto).')
+    click.echo(f'Resumen de asistencia: {clases} filas (día/clase).')
+
+indices_cli = AppGroup('indices', help='Índices y planes de consulta.')
+
+@indices_cli.command('verificar')
+@click.option('--crear-esquema', is_flag=True, help='Crear las tablas antes (útil con DATABASE_URL=sqlite://).')
+@click.option('-v', '--detalle', is_flag=True, help='Mostrar el plan de cada sentencia.')
+def verificar_indices(crear_esquema, detalle):
+    """Falla si alguna consulta crítica recorre una tabla completa (EXPLAIN QUERY PLAN)."""
+    from app.planes import verificar_planes
+
+    if crear_esquema:
+        db.create_all()
+
+    fallas = 0
+    for nombre, sentencias in verificar_planes().items():
+        escaneadas = sorted({tabla for _, _, tablas in sentencias for tabla in tablas})
+        if escaneadas:
+            fallas += 1
+            click.secho(f'FALLA  {nombre}: recorre {", ".join(escaneadas)} sin índice', fg='red')
+        else:
+            click.echo(f'OK     {nombre}')
+
+        if detalle or escaneadas:
+            for statement, plan, _ in sentencias:
+                click.echo('       ' + ' '.join(statement.split()))
+                for linea in plan:
+                    click.echo(f'         -> {linea}')
+
+    if fallas:
+        raise click.ClickException(f'{fallas} consulta(s) crítica(s) sin índice.')
+
+importar_cli = AppGroup('importar', help='Importación masiva desde CSV o XLSX (reanudable).')
+
+def _opciones_importacion(funcion):
+    funcion = click.option('--desde-cero', is_flag=True, help='Ignorar el avance guardado de este archivo.')(funcion)
+    funcion = click.option('--errores', type=click.Path(dir_okay=False),
+                           help='CSV de filas rechazadas (por defecto <archivo>.errores.csv).')(funcion)
+    funcion = click.option('--lote', default=1000, show_default=True, help='Filas por lote (una transacción cada uno).')(funcion)
+    return click.argument('archivo', type=click.Path(exists=True, dir_okay=False))(funcion)
+
+def _importar(tipo, archivo, lote, errores, desde_cero):
+    from app.importador import importar
+
+    def progreso(avance, por_segundo):
+        click.echo(f'\r{avance.filas_procesadas} filas | {avance.insertadas} importadas | '
+                   f'{avance.rechazadas} rechazadas | {por_segundo:,.0f} filas/s', nl=False)
+
+    try:
+        avance = importar(tipo, archivo, tamano_lote=lote, ruta_errores=errores,
+                          desde_cero=desde_cero, progreso=progreso, avisar=click.echo)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+
+    click.echo()
+    click.echo(f'Importación completa: {avance.insertadas} importadas, {avance.rechazadas} rechazadas '
+               f'de {avance.filas_procesadas} filas.')
+    if avance.rechazadas:
+        click.echo(f'Filas rechazadas en: {errores or os.path.splitext(archivo)[0] + ".errores.csv"}')
+
+@importar_cli.command('socios')
+@_opciones_importacion
+def importar_socios(archivo, lote, errores, desde_cero):
+    """Columnas: folio (opcional), nombre_completo, telefono, email, nivel, membresia, fecha_registro."""
+    _importar('socios', archivo, lote, errores, desde_cero)
+
+@importar_cli.command('pagos')
+@_opciones_importacion
+def importar_pagos(archivo, lote, errores, desde_cero):
+    """Columnas: socio_folio, fecha_pago, concepto, detalle, monto, metodo_pago, folio_recibo (opcional), requiere_factura."""
+    _importar('pagos', archivo, lote, errores, desde_cero)
+
+@importar_cli.command('asistencias')
+@_opciones_importacion
+def importar_asistencias(archivo, lote, errores, desde_cero):
+    """Columnas: socio_folio, horario_id, fecha, estado (Presente/Falta/Justificado)."""
+    _importar('asistencias', archivo, lote, errores, desde_cero)
+
+exportar_cli = AppGroup('exportar', help='Exportación de pagos y asistencias en CSV o NDJSON (en flujo).')
+
+def _opciones_exportacion(funcion):
+    funcion = click.option('--salida', type=click.File('w', encoding='utf-8'), default='-',
+                           help='Archivo destino (por defecto la salida estándar).')(funcion)
+    funcion = click.option('--formato', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)(funcion)
+    funcion = click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), required=True)(funcion)
+    return click.option('--desde', type=click.DateTime(['%Y-%m-%d']), required=True)(funcion)
+
+@exportar_cli.command('pagos')
+@_opciones_exportacion
+@click.option('--concepto', help='Solo este concepto (Mensualidad, Anualidad...).')
+@click.option('--metodo-pago', help='Solo este método de pago.')
+@click.option('--solo-factura', is_flag=True, help='Solo pagos que requieren factura.')
+def exportar_pagos(desde, hasta, formato, salida, concepto, metodo_pago, solo_factura):
+    """Pagos entre dos fechas (inclusivas), para el cierre de mes."""
+    from app import exportador
+
+    stmt = exportador.consulta_pagos(desde.date(), hasta.date(), concepto=concepto,
+                                     metodo_pago=metodo_pago, solo_factura=solo_factura)
+    for bloque in exportador.generar(formato, stmt, exportador.COLUMNAS_PAGOS):
+        salida.write(bloque)
+
+@exportar_cli.command('asistencias')
+@_opciones_exportacion
+@click.option('--horario-id', type=int, help='Solo esta clase.')
+def exportar_asistencias(desde, hasta, formato, salida, horario_id):
+    """Asistencias entre dos fechas (inclusivas)."""
+    from app import exportador
+
+    stmt = exportador.consulta_asistencias(desde.date(), hasta.date(), horario_id=horario_id)
+    for bloque in exportador.generar(formato, stmt, exportador.COLUMNAS_ASISTENCIAS):
+        salida.write(bloque)
+
+datos_cli = AppGroup('datos', help='Datos sintéticos para pruebas de carga.')
+
+@datos_cli.command('generar')
+@click.option('--socios', default=1000, show_default=True, help='Cantidad de socios.')
+@click.option('--anios', default=2, show_default=True, help='Años de historial de pagos.')
+@click.option('--semanas-asistencia', default=12, show_default=True, help='Semanas de historial de asistencia.')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Fecha final del historial (por defecto hoy).')
+@click.option('--semilla', default=42, show_default=True, help='Misma semilla y fecha final = mismos datos.')
+@click.option('--capacidad', default=8, show_default=True, help='Cupo de cada clase.')
+@click.option('--lote', default=10000, show_default=True, help='Filas por INSERT.')
+@click.confirmation_option(prompt='Esto BORRA toda la base de datos. ¿Continuar?')
+def generar_datos(socios, anios, semanas_asistencia, hasta, semilla, capacidad, lote):
+    """Borra la base y la llena con socios, agenda, inscripciones, pagos y asistencias."""
+    import time
+    from app.generador import generar
+
+    inicio = time.perf_counter()
+    conteo = generar(socios=socios, anios=anios, semanas_asistencia=semanas_asistencia,
+                     hasta=hasta.date() if hasta else None, semilla=semilla, capacidad=capacidad,
+                     tamano_lote=lote, progreso=lambda texto: click.echo(f'\r{texto}', nl=False))
+    segundos = time.perf_counter() - inicio
+
+    click.echo()
+    for tabla, filas in conteo.items():
+        click.echo(f'{tabla}: {filas:,}')
+    click.echo(f'{sum(conteo.values()):,} filas en {segundos:.1f} s '
+               f'({sum(conteo.values()) / segundos:,.0f} filas/s)')
+
+sqlite_cli = AppGroup('sqlite', help='Mantenimiento del archivo SQLite (WAL y estadísticas).')
+
+@sqlite_cli.command('checkpoint')
+@click.option('--modo', type=click.Choice(['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'], case_sensitive=False),
+              default='PASSIVE', show_default=True,
+              help='PASSIVE no espera a nadie; TRUNCATE espera a los lectores y deja el -wal en cero.')
+def sqlite_checkpoint(modo):
+    """Copia el WAL al archivo principal (correr en horas de poca carga si el -wal crece)."""
+    from app import perfil_sqlite
+
+    ocupado, en_wal, copiadas = perfil_sqlite.checkpoint(modo.upper())
+    click.echo(f'Páginas en el WAL: {en_wal}, copiadas: {copiadas}' + (' (bloqueado por otra conexión)' if ocupado else ''))
+
+@sqlite_cli.command('optimizar')
+@click.option('--completo', is_flag=True, help='ANALYZE de todas las tablas en vez del PRAGMA optimize incremental.')
+def sqlite_optimizar(completo):
+    """Actualiza las estadísticas del planificador (después de cargas masivas o cada noche)."""
+    from app import perfil_sqlite
+
+    perfil_sqlite.optimizar(completo)
+    click.echo('ANALYZE completo.' if completo else 'PRAGMA optimize aplicado.')
+
+@sqlite_cli.command('estado')
+def sqlite_estado():
+    """Muestra los pragmas efectivos y el tamaño del archivo y del WAL."""
+    from app import perfil_sqlite
+
+    for nombre, valor in perfil_sqlite.estado().items():
+        click.echo(f'{nombre}: {valor}')
+
+tareas_cli = AppGroup('tareas', help='Tareas en segundo plano (planificador).')
+
+@tareas_cli.command('listar')
+def listar_tareas():
+    """Estado de cada tarea: próxima corrida, última duración y fallos."""
+    from app.models import Tarea
+    from app.planificador import sincronizar_recurrentes
+
+    sincronizar_recurrentes()
+    for t in Tarea.query.order_by(Tarea.activa.desc(), Tarea.proxima).all():
+        duracion = f'{t.ultima_duracion:.2f}s' if t.ultima_duracion is not None else '-'
+        click.echo(f"{t.nombre:<30} {t.cron or 'una vez':<14} {t.estado:<10} "
+                   f"próxima={t.proxima:%Y-%m-%d %H:%M} última={duracion} "
+                   f"corridas={t.ejecuciones} fallos={t.fallos}" + ('' if t.activa else ' (pausada)'))
+
+@tareas_cli.command('ejecutar')
+@click.argument('nombre')
+def ejecutar_tarea(nombre):
+    """Corre ya una tarea (con su candado: no se encima con un worker)."""
+    import os
+    import socket
+    from datetime import datetime
+    from app.models import Tarea
+    from app import planificador
+
+    planificador.sincronizar_recurrentes()
+    t = Tarea.query.filter_by(nombre=nombre).first()
+    if t is None:
+        raise click.ClickException(f'No existe la tarea {nombre}.')
+    ahora = datetime.now()
+    t.proxima = min(t.proxima or ahora, ahora)
+    db.session.commit()
+
+    identidad = f'cli:{socket.gethostname()}:{os.getpid()}'
+    if not planificador.reclamar(t.id, identidad, ahora, 3600):
+        raise click.ClickException(f'{nombre} está pausada o la está corriendo otro proceso.')
+    planificador.ejecutar(t.id, identidad)
+
+    t = db.session.get(Tarea, t.id)
+    click.echo(f'{nombre}: {t.estado} en {t.ultima_duracion:.2f}s')
+    if t.estado != 'ok':
+        click.echo(t.ultimo_error or '')
+
+@tareas_cli.command('trabajar')
+def trabajar():
+    """Corre el planificador en primer plano (proceso dedicado; Ctrl+C para salir)."""
+    from flask import current_app
+    from app import planificador
+
+    proceso = planificador.iniciar(current_app._get_current_object())
+    click.echo(f'Planificador {proceso.identidad}: {proceso.hilos} hilos, revisión cada {proceso.intervalo}s.')
+    try:
+        while not proceso.detener.wait(1):
+            pass
+    except KeyboardInterrupt:
+        click.echo('Esperando a que terminen las tareas en curso...')
+        proceso.parar()
+
+recordatorios_cli = AppGroup('recordatorios', help='Recordatorios de pago por correo o webhook.')
+
+def _fecha_de_corte(fecha):
+    from datetime import datetime
+    return datetime.combine(fecha.date(), datetime.now().time()) if fecha else None
+
+@recordatorios_cli.command('pendientes')
+@click.option('--fecha', type=click.DateTime(['%Y-%m-%d']), help='Calcular como si hoy fuera esta fecha.')
+@click.option('--campo', type=click.Choice(['email', 'telefono']), default='email', show_default=True,
+              help='Dato de contacto que debe tener el socio (correo o webhook).')
+def recordatorios_pendientes(fecha, campo):
+    """Cuenta los avisos que saldrían hoy, por concepto y motivo."""
+    from collections import Counter
+    from flask import current_app
+    from app.recordatorios import seleccionar
+
+    config = current_app.config
+    candidatos = seleccionar(_fecha_de_corte(fecha), config['RECORDATORIOS_DIAS_AVISO'],
+                             config['RECORDATORIOS_DIAS_VENCIDO'], campo, config['RECORDATORIOS_MAX_INTENTOS'])
+    for (concepto, motivo), total in sorted(Counter((c.concepto, c.motivo) for c in candidatos).items()):
+        click.echo(f'{concepto:<12} {motivo:<11} {total:>6}')
+    click.echo(f'Total: {len(candidatos)}')
+
+@recordatorios_cli.command('enviar')
+@click.option('--transporte', type=click.Choice(['smtp', 'webhook', 'registro']),
+              help='En vez de RECORDATORIOS_TRANSPORTE.')
+@click.option('--fecha', type=click.DateTime(['%Y-%m-%d']), help='Calcular como si hoy fuera esta fecha.')
+@click.option('--simular', is_flag=True, help='Solo mostrar los mensajes; no envía ni anota en la bitácora.')
+def recordatorios_enviar(transporte, fecha, simular):
+    """Selecciona, renderiza y envía los recordatorios pendientes (lo mismo que la tarea diaria)."""
+    from flask import current_app
+    from app.recordatorios import crear_transporte, enviar_recordatorios
+
+    elegido = crear_transporte(current_app.config, transporte)
+    if elegido is None:
+        raise click.ClickException('Sin transporte: definir RECORDATORIOS_TRANSPORTE o usar --transporte.')
+
+    def mostrar(mensajes):
+        for m in mensajes:
+            click.echo(f'--- {m.destino}: {m.asunto}')
+            click.echo(m.cuerpo)
+
+    resumen = enviar_recordatorios(_fecha_de_corte(fecha), elegido, simular, mostrar if simular else None)
+    click.echo(f"Candidatos: {resumen['candidatos']}" + ('' if simular else
+               f", enviados: {resumen['enviado']}, fallidos: {resumen['fallido']}, "
+               f"rechazados: {resumen['rechazado']}") + f" en {resumen['segundos']:.1f} s")
+
+analitica_cli = AppGroup('analitica', help='Analítica de asistencia en columnas (requiere NumPy).')
+
+@analitica_cli.command('resumen')
+@click.option('--desde', type=click.DateTime(['%Y-%m-%d']), help='Por defecto, 12 semanas antes de --hasta.')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Por defecto, hoy.')
+@click.option('--socios', default=10, show_default=True, help='Socios con más ausencias a listar.')
+@click.option('--json', 'como_json', is_flag=True, help='Imprimir el reporte completo en JSON.')
+def analitica_resumen(desde, hasta, socios, como_json):
+    """Tasas de asistencia por clase y semana, e inscritos sin marca."""
+    import json
+    from datetime import date, timedelta
+    from app.analitica import reporte
+
+    hasta = hasta.date() if hasta else date.today()
+    desde = desde.date() if desde else hasta - timedelta(days=hasta.weekday(), weeks=11)
+    try:
+        datos = reporte(desde, hasta, socios)
+    except (RuntimeError, ValueError) as e:
+        raise click.ClickException(str(e))
+
+    if como_json:
+        click.echo(json.dumps(datos, ensure_ascii=False, indent=2))
+        return
+
+    totales = datos['totales']
+    click.echo(f"{datos['desde']} a {datos['hasta']}: {datos['marcas']:,} marcas, "
+               f"{datos['inscripciones_activas']:,} inscripciones activas "
+               f"(carga {datos['segundos']['carga']:.2f} s, cálculo {datos['segundos']['calculo']:.2f} s)")
+    click.echo(f"Tasa {totales['tasa']:.1%}: {totales['presentes']:,} presentes, {totales['faltas']:,} faltas, "
+               f"{totales['justificados']:,} justificadas, {totales['sin_marca']:,} sin marca "
+               f"en {totales['sesiones']:,} sesiones")
+    click.echo('')
+    for clase in datos['por_clase']:
+        if clase['esperadas']:
+            click.echo(f"{clase['dia_semana']:<10} {clase['hora']} {clase['nivel']:<12} {clase['sesiones']:>5} ses. "
+                       f"prom. {clase['promedio_asistentes']:>6.2f}  tasa {clase['tasa']:>6.1%}  "
+                       f"sin marca {clase['sin_marca']:>6}")
+    click.echo('')
+    for socio in datos['socios_mas_ausentes']:
+        click.echo(f"socio {socio['socio_id']:>7}  ausencias {socio['ausencias']:>5}  tasa {socio['tasa']:>6.1%}")
+
+def registrar_comandos(app):
+    app.cli.add_command(estatus_cli)
+    app.cli.add_command(horarios_cli)
+    app.cli.add_command(asistencia_cli)
+    app.cli.add_command(resumenes_cli)
+    app.cli.add_command(indices_cli)
+    app.cli.add_command(importar_cli)
+    app.cli.add_command(exportar_cli)
+    app.cli.add_command(datos_cli)
+    app.cli.add_command(sqlite_cli)
+    app.cli.add_command(tareas_cli)
+    app.cli.add_command(recordatorios_cli)
+    app.cli.add_command(analitica_cli)
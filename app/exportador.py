@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from app import db
+from app.models import Pago, Asistencia, Socio, Horario
+
+# --- EXPORTACIONES EN FLUJO (CSV / NDJSON) ---
+#
+# Las consultas se recorren con yield_per: en PostgreSQL usa un cursor del
+# lado del servidor y en SQLite se leen las filas conforme se piden, así que
+# la memoria no crece con el tamaño de la exportación. Cada generador entrega
+# bloques de texto que la ruta manda como respuesta en partes (chunked) y el
+# CLI escribe directo al archivo.
+
+FILAS_POR_LOTE = 1000
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+COLUMNAS_PAGOS = ('id', 'folio_recibo', 'socio_folio', 'socio_nombre', 'fecha_pago', 'concepto_tipo',
+                  'detalle_concepto', 'monto_base', 'monto_ajuste', 'total_cobrado', 'metodo_pago',
+                  'requiere_factura')
+
+COLUMNAS_ASISTENCIAS = ('id', 'fecha', 'timestamp', 'socio_folio', 'socio_nombre', 'horario_id',
+                        'dia_semana', 'hora_inicio', 'nivel', 'estado')
+
+def consulta_pagos(desde, hasta, concepto=None, metodo_pago=None, solo_factura=False):
+    """ SELECT de pagos entre dos fechas (inclusivas) por ix_pago_fecha_pago, en orden cronológico """
+    stmt = db.select(
+        Pago.id, Pago.folio_recibo, Socio.folio, Socio.nombre_completo, Pago.fecha_pago, Pago.concepto_tipo,
+        Pago.detalle_concepto, Pago.monto_base, Pago.monto_ajuste, Pago.total_cobrado, Pago.metodo_pago,
+        Pago.requiere_factura
+    ).join(Socio, Socio.id == Pago.socio_id)\
+     .where(Pago.fecha_pago >= datetime.combine(desde, time.min),
+            Pago.fecha_pago < datetime.combine(hasta + timedelta(days=1), time.min))\
+     .order_by(Pago.fecha_pago, Pago.id)
+
+    if concepto:
+        stmt = stmt.where(Pago.concepto_tipo == concepto)
+    if metodo_pago:
+        stmt = stmt.where(Pago.metodo_pago == metodo_pago)
+    if solo_factura:
+        stmt = stmt.where(Pago.requiere_factura == True)
+    return stmt
+
+def consulta_asistencias(desde, hasta, horario_id=None):
+    """ SELECT de asistencias entre dos fechas (por ix_asistencia_fecha o ix_asistencia_horario_fecha) """
+    stmt = db.select(
+        Asistencia.id, Asistencia.fecha, Asistencia.timestamp, Socio.folio, Socio.nombre_completo,
+        Asistencia.horario_id, Horario.dia_semana, Horario.hora_inicio, Horario.nivel, Asistencia.estado
+    ).join(Socio, Socio.id == Asistencia.socio_id)\
+     .join(Horario, Horario.id == Asistencia.horario_id)\
+     .where(Asistencia.fecha.between(desde, hasta))\
+     .order_by(Asistencia.fecha, Asistencia.id)
+
+    if horario_id:
+        stmt = stmt.where(Asistencia.horario_id == horario_id)
+    return stmt
+
+def _filas(stmt):
+    """ Recorre la consulta por lotes sin materializarla """
+    return db.session.execute(stmt.execution_options(yield_per=FILAS_POR_LOTE))
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    raise TypeError(f'No serializable: {type(valor).__name__}')
+
+def generar_csv(stmt, columnas):
+    """ Genera el CSV en bloques de FILAS_POR_LOTE filas """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+
+    for i, fila in enumerate(_filas(stmt), 1):
+        escritor.writerow(fila)
+        if i % FILAS_POR_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def generar_ndjson(stmt, columnas):
+    """ Un objeto JSON por línea, en bloques de FILAS_POR_LOTE filas """
+    lineas = []
+    for fila in _filas(stmt):
+        lineas.append(json.dumps(dict(zip(columnas, fila)), default=_valor_json, ensure_ascii=False))
+        if len(lineas) >= FILAS_POR_LOTE:
+            yield '\n'.join(lineas) + '\n'
+            lineas = []
+    if lineas:
+        yield '\n'.join(lineas) + '\n'
+
+def generar(formato, stmt, columnas):
+    if formato == 'ndjson':
+        return generar_ndjson(stmt, columnas)
+    return generar_csv(stmt, columnas)
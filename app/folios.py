@@ -0,0 +1,110 @@
+import os
+import threading
+from app import db
+from app.instrumentacion import llenado_de_cache
+
+# --- FOLIOS CONSECUTIVOS (socios SW0001, recibos REC-000001) ---
+#
+# Cada serie tiene un contador en la tabla 'contador'. Para no pelear por esa
+# fila en cada alta, cada proceso reserva un BLOQUE de números en una
+# transacción corta y aparte (no espera al commit de la petición) y los
+# reparte desde memoria. Los números de un bloque que no se lleguen a usar
+# (reinicio del proceso, rollback de la petición) se pierden: los folios son
+# únicos pero pueden tener huecos y no siguen el orden de alta entre procesos.
+
+# Serie -> (prefijo, ancho mínimo del número). SW10000 sigue siendo válido.
+SERIES = {
+    'socio': ('SW', 4),
+    'recibo': ('REC-', 6),
+}
+
+_bloques = {}   # serie -> [siguiente, ultimo, pid]
+_lock = threading.Lock()
+tamano_bloque = 20
+
+def formatear(serie, numero):
+    prefijo, ancho = SERIES[serie]
+    return f'{prefijo}{numero:0{ancho}d}'
+
+def _ultimo_emitido(conexion, serie):
+    """ Número más alto que ya existe en los datos (antes de que hubiera contador) """
+    from app.models import Socio, Pago
+
+    prefijo, _ = SERIES[serie]
+    columna = Socio.folio if serie == 'socio' else Pago.folio_recibo
+    # Se comparan como números: 'SW9999' < 'SW10000'
+    numeros = (folio[len(prefijo):] for (folio,) in conexion.execute(
+        db.select(columna).where(columna.like(prefijo + '%'))))
+    return max((int(numero) for numero in numeros if numero.isdigit()), default=0)
+
+def _reservar(serie, cantidad):
+    """
+    Sube el contador 'cantidad' números en su propia transacción y retorna el
+    primero del bloque. En SQLite no llamar con la sesión a media escritura:
+    usa otra conexión y esperaría el candado de la propia petición.
+    """
+    from app.models import Contador, _insert_con_conflicto
+
+    with llenado_de_cache(), db.engine.begin() as conexion:
+        ultimo = conexion.execute(
+            db.update(Contador).where(Contador.nombre == serie)
+            .values(valor=Contador.valor + cantidad).returning(Contador.valor)
+        ).scalar()
+
+        if ultimo is None:
+            # Primera vez en esta BD: arrancar después de los folios existentes
+            stmt = _insert_con_conflicto(Contador).values(
+                nombre=serie, valor=_ultimo_emitido(conexion, serie) + cantidad)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['nombre'], set_={'valor': Contador.valor + cantidad}
+            ).returning(Contador.valor)
+            ultimo = conexion.execute(stmt).scalar()
+
+    return ultimo - cantidad + 1
+
+def siguiente(serie):
+    """ Siguiente folio de la serie ('SW0042', 'REC-000123') """
+    with _lock:
+        bloque = _bloques.get(serie)
+        # Un proceso hijo (fork) no puede repartir el bloque que heredó
+        if bloque is None or bloque[0] > bloque[1] or bloque[2] != os.getpid():
+            primero = _reservar(serie, tamano_bloque)
+            bloque = _bloques[serie] = [primero, primero + tamano_bloque - 1, os.getpid()]
+        numero = bloque[0]
+        bloque[0] += 1
+    return formatear(serie, numero)
+
+def reservar(serie, cantidad):
+    """ 'cantidad' folios consecutivos de un solo golpe (cargas masivas) """
+    if cantidad <= 0:
+        return []
+    primero = _reservar(serie, cantidad)
+    return [formatear(serie, numero) for numero in range(primero, primero + cantidad)]
+
+def numero_de(serie, folio):
+    """ 'SW0042' -> 42; None si el folio no es de la serie """
+    prefijo, _ = SERIES[serie]
+    resto = folio[len(prefijo):] if folio and folio.startswith(prefijo) else ''
+    return int(resto) if resto.isdigit() else None
+
+def asegurar_minimo(serie, numero):
+    """
+    Sube el contador a 'numero' si va atrás, para no repartir folios que
+    llegarán ya hechos (ej. una importación). Usa su propia transacción.
+    Si aún no hay fila la crea arrancando después de los datos existentes.
+    """
+    from app.models import Contador
+
+    _reservar(serie, 0)
+    with db.engine.begin() as conexion:
+        conexion.execute(
+            db.update(Contador).where(Contador.nombre == serie, Contador.valor < numero).values(valor=numero)
+        )
+
+def init_app(app):
+    global tamano_bloque
+    tamano_bloque = app.config.get('FOLIOS_TAMANO_BLOQUE', tamano_bloque)
+
+    # Otra app (ej. pruebas) puede apuntar a otra BD
+    with _lock:
+        _bloques.clear()
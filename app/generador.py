@@ -0,0 +1,303 @@
+import math
+import random
+from datetime import date, datetime, time, timedelta
+from app import db
+from app import folios
+from app.models import (Membresia, Tarifa, Horario, Socio, Inscripcion, Pago, Asistencia, User, Nivel,
+                        reconstruir_estatus_socios, reconstruir_resumenes, reconstruir_agendas)
+
+# --- GENERADOR DE DATOS SINTÉTICOS (seed.py / flask generar) ---
+#
+# Produce un conjunto de datos realista y DETERMINISTA (misma semilla y misma
+# fecha 'hasta' = mismos datos): socios repartidos entre niveles y planes,
+# agenda semanal completa, inscripciones que respetan cupo y "una clase por
+# día", años de mensualidades con atrasos y bajas, e historial de asistencia.
+# Todo se escribe con INSERT de varias filas (executemany) por lotes y con IDs
+# asignados aquí, sin objetos del ORM; los agregados (estatus, resúmenes,
+# contadores de folio) se reconstruyen una vez al final.
+
+DIAS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado"]
+
+NIVELES = [("Bebés", 1), ("Niños", 2), ("Adultos", 3)]
+
+# (nombre, clases_por_semana, peso en la población)
+PLANES = [
+    ("Plan A (1 Clase/sem)", 1, 35),
+    ("Plan B (2 Clases/sem)", 2, 40),
+    ("Plan C (3 Clases/sem)", 3, 20),
+    ("Plan F (6 Clases/sem)", 6, 5),
+]
+
+# Costo mensual por plan y nivel; anualidad e inscripción son fijas
+COSTO_MENSUAL = {
+    "Plan A (1 Clase/sem)": {"Bebés": 700, "Niños": 800, "Adultos": 900},
+    "Plan B (2 Clases/sem)": {"Bebés": 1200, "Niños": 1400, "Adultos": 1600},
+    "Plan C (3 Clases/sem)": {"Bebés": 1600, "Niños": 1900, "Adultos": 2100},
+    "Plan F (6 Clases/sem)": {"Bebés": 2600, "Niños": 3000, "Adultos": 3300},
+}
+COSTO_ANUALIDAD = 2000
+COSTO_INSCRIPCION = 500
+
+PESO_NIVEL = {"Bebés": 15, "Niños": 50, "Adultos": 35}
+
+# Agenda de seed.py (entre semana, tarde) y la agenda completa del generador
+HORAS_BASE = [(16, "Niños"), (17, "Niños"), (18, "Adultos"), (19, "Adultos")]
+HORAS_COMPLETAS = [(7, "Adultos"), (8, "Adultos"), (9, "Bebés"), (10, "Bebés"), (11, "Bebés"),
+                   (15, "Niños"), (16, "Niños"), (17, "Niños"), (18, "Adultos"), (19, "Adultos"), (20, "Adultos")]
+
+NOMBRES = ["Juan", "María", "José", "Guadalupe", "Luis", "Ana", "Carlos", "Fernanda", "Miguel", "Sofía",
+           "Jorge", "Valeria", "Pedro", "Camila", "Diego", "Regina", "Javier", "Ximena", "Andrés", "Daniela"]
+APELLIDOS = ["Pérez", "López", "García", "Hernández", "Martínez", "González", "Rodríguez", "Sánchez",
+             "Ramírez", "Cruz", "Flores", "Gómez", "Morales", "Vázquez", "Reyes", "Jiménez", "Torres", "Díaz"]
+METODOS_PAGO = [("Efectivo", 60), ("Tarjeta", 25), ("Transferencia", 15)]
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto", "Septiembre",
+         "Octubre", "Noviembre", "Diciembre"]
+
+# Probabilidades mensuales
+PROB_ATRASO = 0.07  # se salta una mensualidad
+PROB_BAJA = 0.015   # deja de pagar (y de venir) para siempre
+ESTADOS_ASISTENCIA = [("Presente", 85), ("Falta", 10), ("Justificado", 5)]
+
+def _elegir(azar, opciones):
+    """ Elección ponderada de [(valor, peso)] """
+    valores, pesos = zip(*opciones)
+    return azar.choices(valores, weights=pesos)[0]
+
+def _en_lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _insertar(modelo, filas, tamano_lote, progreso=None, etiqueta=''):
+    """
+    INSERT por lotes de una secuencia (o generador) de dicts. Va contra la
+    tabla (Core) y no contra el modelo: el camino "bulk" del ORM revisa cada
+    fila y cuesta más que el propio INSERT. Retorna cuántas filas.
+    """
+    total = 0
+    for lote in _en_lotes(filas, tamano_lote):
+        db.session.execute(modelo.__table__.insert(), lote)
+        db.session.commit()
+        total += len(lote)
+        if progreso:
+            progreso(f'{etiqueta}: {total:,}')
+    return total
+
+# --- CATÁLOGOS, AGENDA Y USUARIOS (también los usa seed.py) ---
+
+def reiniciar_esquema():
+    """ Borra TODO y crea las tablas vacías """
+    db.drop_all()
+    db.create_all()
+
+def crear_catalogos():
+    """ Niveles, planes y su tarifa por nivel. Retorna ({nombre_plan: Membresia}, [nombres_de_nivel]) """
+    db.session.add_all([Nivel(nombre=nombre, orden=orden) for nombre, orden in NIVELES])
+    planes = {nombre: Membresia(nombre=nombre, clases_por_semana=clases) for nombre, clases, _ in PLANES}
+    db.session.add_all(planes.values())
+    db.session.flush()
+
+    db.session.add_all([
+        Tarifa(membresia_id=plan.id, nivel=nivel, costo_mensual=COSTO_MENSUAL[nombre][nivel],
+               costo_anualidad=COSTO_ANUALIDAD, costo_inscripcion=COSTO_INSCRIPCION)
+        for nombre, plan in planes.items() for nivel, _ in NIVELES
+    ])
+    db.session.commit()
+    return planes, [nombre for nombre, _ in NIVELES]
+
+def crear_usuarios():
+    """ admin / recepcion / profe con contraseñas de prueba """
+    usuarios = [('admin', 'admin', 'admin123'), ('recepcion', 'recepcion', '1234'), ('profe', 'instructor', '1234')]
+    for username, role, password in usuarios:
+        usuario = User(username=username, role=role)
+        usuario.set_password(password)
+        db.session.add(usuario)
+    db.session.commit()
+
+def filas_horarios(horas, dias=DIAS, carriles=None, capacidad=8):
+    """
+    Clases de una hora por día y hora. 'carriles' {nivel: n} repite cada
+    clase n veces (varias clases en paralelo a la misma hora).
+    """
+    carriles = carriles or {}
+    filas = []
+    for dia in dias:
+        for hora, nivel in horas:
+            for _ in range(carriles.get(nivel, 1)):
+                filas.append({'id': len(filas) + 1, 'dia_semana': dia, 'hora_inicio': time(hora),
+                              'hora_fin': time(hora + 1), 'nivel': nivel, 'capacidad_maxima': capacidad,
+                              'ocupados': 0})
+    return filas
+
+# --- VOLUMEN ---
+
+def _socios(azar, total, planes, desde, hasta):
+    """ Filas de socio con fecha de registro repartida entre 'desde' y 'hasta' """
+    niveles = list(PESO_NIVEL.items())
+    pesos_plan = [(nombre, peso) for nombre, _, peso in PLANES]
+    dias_rango = max((hasta - desde).days, 1)
+
+    for i in range(1, total + 1):
+        nombre = f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}'
+        yield {
+            'id': i,
+            'folio': folios.formatear('socio', i),
+            'nombre_completo': nombre,
+            'telefono': f'712{azar.randrange(10**7):07d}',
+            'email': f'socio{i}@ejemplo.mx',
+            'nivel': _elegir(azar, niveles),
+            'membresia_id': planes[_elegir(azar, pesos_plan)].id,
+            'fecha_registro': datetime.combine(desde + timedelta(days=azar.randrange(dias_rango)), time(10)),
+        }
+
+def _pagos(azar, socios, planes, hasta, bajas):
+    """
+    Inscripción y anualidad al registrarse, anualidad cada año y una
+    mensualidad por mes con atrasos (PROB_ATRASO) y bajas (PROB_BAJA).
+    Anota en 'bajas' a los socios que dejaron de pagar. Los recibos se
+    numeran REC-000001... en orden, así que el último es el total de pagos.
+    """
+    folio = 0
+    nombre_plan = {plan.id: nombre for nombre, plan in planes.items()}
+
+    def pago(socio, fecha, concepto, detalle, monto):
+        nonlocal folio
+        folio += 1
+        return {
+            'folio_recibo': folios.formatear('recibo', folio), 'socio_id': socio['id'],
+            'fecha_pago': fecha, 'concepto_tipo': concepto, 'detalle_concepto': detalle,
+            'monto_base': monto, 'monto_ajuste': 0.0, 'total_cobrado': monto,
+            'metodo_pago': _elegir(azar, METODOS_PAGO), 'requiere_factura': azar.random() < 0.1,
+        }
+
+    fin = datetime.combine(hasta, time(20))
+    for socio in socios:
+        inicio = socio['fecha_registro']
+        mensual = COSTO_MENSUAL[nombre_plan[socio['membresia_id']]][socio['nivel']]
+
+        yield pago(socio, inicio, 'Inscripción', 'Inscripción Nuevo Ingreso', COSTO_INSCRIPCION)
+        anualidad = inicio
+        while anualidad <= fin:
+            yield pago(socio, anualidad, 'Anualidad', f'Anualidad {anualidad.year}', COSTO_ANUALIDAD)
+            anualidad += timedelta(days=365)
+
+        mes = 0
+        while True:
+            anio, indice = divmod(inicio.month - 1 + mes, 12)
+            fecha = datetime(inicio.year + anio, indice + 1, min(inicio.day, 28), 10) \
+                + timedelta(days=azar.randrange(8), minutes=azar.randrange(600))
+            if fecha > fin:
+                break
+            if mes and azar.random() < PROB_BAJA:
+                bajas.add(socio['id'])
+                break
+            if not azar.random() < PROB_ATRASO:
+                yield pago(socio, fecha, 'Mensualidad', f'{MESES[indice]} {inicio.year + anio}', mensual)
+            mes += 1
+
+def _inscribir(azar, socios, planes, horarios, bajas):
+    """
+    Asigna clases en memoria: hasta 'clases_por_semana' días distintos por
+    socio, solo horarios de su nivel y con cupo. Llena 'ocupados' de cada
+    horario y retorna las filas de inscripción.
+    """
+    limite_plan = {plan.id: plan.clases_por_semana for plan in planes.values()}
+    con_cupo = {}  # (nivel, dia) -> [horario con cupo]
+    for h in horarios:
+        con_cupo.setdefault((h['nivel'], h['dia_semana']), []).append(h)
+
+    inscripciones = []
+    for socio in socios:
+        if socio['id'] in bajas:
+            continue
+        dias = [dia for dia in DIAS if con_cupo.get((socio['nivel'], dia))]
+        azar.shuffle(dias)
+        for dia in dias[:limite_plan[socio['membresia_id']]]:
+            opciones = con_cupo[(socio['nivel'], dia)]
+            horario = opciones[azar.randrange(len(opciones))]
+            horario['ocupados'] += 1
+            if horario['ocupados'] >= horario['capacidad_maxima']:
+                opciones.remove(horario)
+            inscripciones.append({'id': len(inscripciones) + 1, 'socio_id': socio['id'], 'horario_id': horario['id'],
+                                  'fecha_alta': socio['fecha_registro'], 'activo': True})
+    return inscripciones
+
+def _asistencias(azar, inscripciones, horarios, socios, semanas, hasta):
+    """ Una marca por inscripción y semana (las últimas 'semanas'), desde que el socio se registró """
+    por_id = {h['id']: h for h in horarios}
+    registro = {s['id']: s['fecha_registro'].date() for s in socios}
+    estados, pesos = zip(*ESTADOS_ASISTENCIA)
+    acumulados = [sum(pesos[:i + 1]) for i in range(len(pesos))]
+
+    for insc in inscripciones:
+        horario = por_id[insc['horario_id']]
+        # Última fecha <= hasta que cae en el día de la clase
+        ultima = hasta - timedelta(days=(hasta.weekday() - DIAS.index(horario['dia_semana'])) % 7)
+        alta = registro[insc['socio_id']]
+        for semana in range(semanas):
+            fecha = ultima - timedelta(weeks=semana)
+            if fecha < alta:
+                break
+            estado = azar.choices(estados, cum_weights=acumulados)[0]
+            yield {'socio_id': insc['socio_id'], 'horario_id': horario['id'], 'fecha': fecha, 'estado': estado,
+                   'timestamp': datetime.combine(fecha, horario['hora_inicio'])}
+
+def generar(socios=1000, anios=2, semanas_asistencia=12, hasta=None, semilla=42, capacidad=8,
+            tamano_lote=10000, progreso=None):
+    """
+    Borra la base y genera un conjunto completo. Con la misma semilla y
+    'hasta' (por defecto hoy) el resultado es idéntico. progreso(texto)
+    recibe avisos. Retorna {tabla: filas}.
+    """
+    progreso = progreso or (lambda texto: None)
+    azar = random.Random(semilla)
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=365 * anios)
+
+    reiniciar_esquema()
+    planes, _ = crear_catalogos()
+    crear_usuarios()
+
+    progreso('Socios...')
+    filas_socios = list(_socios(azar, socios, planes, desde, hasta))
+    conteo = {'socio': _insertar(Socio, filas_socios, tamano_lote)}
+
+    # Pagos primero: deciden quién se dio de baja (sin clases ni asistencia)
+    bajas = set()
+    conteo['pago'] = _insertar(Pago, _pagos(azar, filas_socios, planes, hasta, bajas),
+                               tamano_lote, progreso, 'Pagos')
+
+    # Agenda con suficientes clases en paralelo para la demanda de cada nivel (+10%)
+    limite_plan = {plan.id: plan.clases_por_semana for plan in planes.values()}
+    demanda = {}
+    for socio in filas_socios:
+        if socio['id'] not in bajas:
+            demanda[socio['nivel']] = demanda.get(socio['nivel'], 0) + limite_plan[socio['membresia_id']]
+    lugares_por_carril = {nivel: capacidad * len(DIAS) * sum(1 for _, n in HORAS_COMPLETAS if n == nivel)
+                          for nivel in PESO_NIVEL}
+    carriles = {nivel: max(1, math.ceil(demanda.get(nivel, 0) * 1.1 / lugares_por_carril[nivel]))
+                for nivel in PESO_NIVEL}
+    horarios = filas_horarios(HORAS_COMPLETAS, carriles=carriles, capacidad=capacidad)
+
+    progreso('Horarios e inscripciones...')
+    inscripciones = _inscribir(azar, filas_socios, planes, horarios, bajas)
+    conteo['horario'] = _insertar(Horario, horarios, tamano_lote)
+    conteo['inscripcion'] = _insertar(Inscripcion, inscripciones, tamano_lote)
+
+    conteo['asistencia'] = _insertar(
+        Asistencia, _asistencias(azar, inscripciones, horarios, filas_socios, semanas_asistencia, hasta),
+        tamano_lote, progreso, 'Asistencias')
+
+    progreso('Estatus, resúmenes, agendas y folios...')
+    reconstruir_estatus_socios()
+    reconstruir_resumenes()
+    reconstruir_agendas()
+    db.session.commit()
+    folios.asegurar_minimo('socio', socios)
+    folios.asegurar_minimo('recibo', conteo['pago'])
+    return conteo
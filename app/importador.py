@@ -0,0 +1,374 @@
+import csv
+import hashlib
+import os
+import time
+from datetime import datetime, date
+from app import db
+from app import catalogos, folios
+from app.models import (Socio, Pago, Horario, ImportacionAvance, upsert_asistencias,
+                        reconstruir_estatus_socios, reconstruir_resumenes)
+
+# --- IMPORTACIÓN MASIVA DESDE CSV / XLSX (flask importar ...) ---
+#
+# Lee el archivo fila por fila (memoria constante), valida contra los
+# catálogos y escribe por lotes con INSERT de varias filas (executemany), sin
+# crear objetos del ORM. Cada lote se confirma junto con su punto de avance
+# en 'importacion_avance': si el proceso muere, volver a correr el mismo
+# comando salta las filas ya confirmadas. Las filas rechazadas se escriben
+# en un CSV de errores con la columna extra 'error'.
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y', '%d/%m/%Y %H:%M')
+
+class FilaInvalida(Exception):
+    pass
+
+# --- LECTURA ---
+
+def _normalizar_encabezado(nombre):
+    return str(nombre or '').strip().lower().replace(' ', '_')
+
+def leer_filas(ruta):
+    """ Genera cada fila como dict {encabezado_normalizado: valor}. CSV o XLSX. """
+    if ruta.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError('Para importar .xlsx instale openpyxl (pip install openpyxl) o exporte a CSV.')
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezados = [_normalizar_encabezado(c) for c in next(filas, [])]
+            for valores in filas:
+                if any(v not in (None, '') for v in valores):
+                    yield dict(zip(encabezados, valores))
+        finally:
+            libro.close()
+        return
+
+    # utf-8-sig: Excel guarda el CSV con BOM
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        lector = csv.reader(archivo)
+        encabezados = [_normalizar_encabezado(c) for c in next(lector, [])]
+        for valores in lector:
+            if any(v.strip() for v in valores):
+                yield dict(zip(encabezados, valores))
+
+def huella_archivo(ruta):
+    """ sha1 del contenido: identifica el archivo aunque lo muevan o renombren """
+    huella = hashlib.sha1()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            huella.update(bloque)
+    return huella.hexdigest()
+
+# --- CONVERSIONES ---
+
+def _texto(fila, columna, requerido=False, maximo=None):
+    valor = fila.get(columna)
+    valor = '' if valor is None else str(valor).strip()
+    if requerido and not valor:
+        raise FilaInvalida(f'Falta "{columna}"')
+    if maximo and len(valor) > maximo:
+        raise FilaInvalida(f'"{columna}" excede {maximo} caracteres')
+    return valor or None
+
+def _fecha(fila, columna, requerido=False):
+    valor = fila.get(columna)
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+
+    texto = _texto(fila, columna, requerido)
+    if texto is None:
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise FilaInvalida(f'Fecha inválida en "{columna}": {texto}')
+
+def _numero(fila, columna, requerido=False):
+    valor = fila.get(columna)
+    if isinstance(valor, (int, float)):
+        return float(valor)
+
+    texto = _texto(fila, columna, requerido)
+    if texto is None:
+        return None
+    try:
+        return float(texto.replace('$', '').replace(',', ''))
+    except ValueError:
+        raise FilaInvalida(f'Número inválido en "{columna}": {texto}')
+
+def _ids_por_folio(folios_socio):
+    """ {folio: socio_id} de los folios dados (una consulta por lote) """
+    if not folios_socio:
+        return {}
+    return dict(db.session.query(Socio.folio, Socio.id).filter(Socio.folio.in_(folios_socio)))
+
+def _recibos_existentes(folios_recibo):
+    """ Folios de recibo que ya están en 'pago' (una consulta por lote) """
+    if not folios_recibo:
+        return set()
+    return {folio for (folio,) in db.session.query(Pago.folio_recibo).filter(Pago.folio_recibo.in_(folios_recibo))}
+
+def _completar_folios(serie, registros, columna):
+    """ Folio del contador para los registros que no traen (antes de escribir: usa otra conexión) """
+    sin_folio = [r for r in registros if not r[columna]]
+    for registro, folio in zip(sin_folio, folios.reservar(serie, len(sin_folio))):
+        registro[columna] = folio
+
+def _reservar_folios_del_archivo(ruta, serie, columna):
+    """
+    Sube el contador por encima del mayor folio que trae el archivo, para que
+    los que se asignen a filas sin folio nunca choquen con uno que viene después.
+    """
+    numeros = (folios.numero_de(serie, _texto(fila, columna)) for fila in leer_filas(ruta))
+    mayor = max((n for n in numeros if n is not None), default=0)
+    if mayor:
+        folios.asegurar_minimo(serie, mayor)
+
+# --- TIPOS DE IMPORTACIÓN ---
+#
+# preparar(filas) recibe las filas crudas de un lote y retorna
+# (registros_validos, [(fila, error)]); insertar(registros) los escribe.
+
+class ImportacionSocios:
+    """ folio (opcional), nombre_completo, telefono, email, nivel, membresia (nombre o id), fecha_registro """
+    folio = ('socio', 'folio')
+    columnas = ('folio', 'nombre_completo', 'telefono', 'email', 'nivel', 'membresia', 'fecha_registro')
+
+    def __init__(self):
+        self.niveles = {n.nombre.lower(): n.nombre for n in catalogos.niveles()}
+        self.membresias = {}
+        for m in catalogos.membresias():
+            self.membresias[str(m.id)] = m.id
+            self.membresias[m.nombre.lower()] = m.id
+
+    def preparar(self, filas):
+        registros, rechazos, vistos = [], [], set()
+        existentes = set(_ids_por_folio({f for f in (_texto(fila, 'folio') for fila in filas) if f}))
+
+        for fila in filas:
+            try:
+                folio = _texto(fila, 'folio', maximo=20)
+                if folio and (folio in existentes or folio in vistos):
+                    raise FilaInvalida(f'El folio {folio} ya existe')
+
+                nivel = self.niveles.get((_texto(fila, 'nivel', requerido=True)).lower())
+                if nivel is None:
+                    raise FilaInvalida(f'Nivel desconocido: {fila.get("nivel")}')
+
+                membresia = _texto(fila, 'membresia')
+                membresia_id = None
+                if membresia:
+                    membresia_id = self.membresias.get(membresia.lower())
+                    if membresia_id is None:
+                        raise FilaInvalida(f'Membresía desconocida: {membresia}')
+
+                registros.append({
+                    'folio': folio,
+                    'nombre_completo': _texto(fila, 'nombre_completo', requerido=True, maximo=100),
+                    'telefono': _texto(fila, 'telefono', maximo=20),
+                    'email': _texto(fila, 'email', maximo=120),
+                    'nivel': nivel,
+                    'membresia_id': membresia_id,
+                    'fecha_registro': _fecha(fila, 'fecha_registro') or datetime.utcnow(),
+                })
+                if folio:
+                    vistos.add(folio)
+            except FilaInvalida as error:
+                rechazos.append((fila, str(error)))
+
+        _completar_folios('socio', registros, 'folio')
+        return registros, rechazos
+
+    def insertar(self, registros):
+        db.session.execute(db.insert(Socio), registros)
+
+    def finalizar(self):
+        pass
+
+class ImportacionPagos:
+    """ socio_folio, fecha_pago, concepto, detalle, monto, metodo_pago, folio_recibo (opcional), requiere_factura """
+    folio = ('recibo', 'folio_recibo')
+    columnas = ('socio_folio', 'fecha_pago', 'concepto', 'detalle', 'monto', 'metodo_pago', 'folio_recibo', 'requiere_factura')
+
+    def preparar(self, filas):
+        registros, rechazos, vistos = [], [], set()
+        ids = _ids_por_folio({f for f in (_texto(fila, 'socio_folio') for fila in filas) if f})
+        existentes = _recibos_existentes({f for f in (_texto(fila, 'folio_recibo') for fila in filas) if f})
+
+        for fila in filas:
+            try:
+                # Reimportar (--desde-cero) o cruzar exportaciones no debe duplicar cobros
+                folio_recibo = _texto(fila, 'folio_recibo', maximo=20)
+                if folio_recibo and (folio_recibo in existentes or folio_recibo in vistos):
+                    raise FilaInvalida(f'El recibo {folio_recibo} ya existe')
+
+                socio_folio = _texto(fila, 'socio_folio', requerido=True)
+                if socio_folio not in ids:
+                    raise FilaInvalida(f'No existe el socio {socio_folio}')
+
+                monto = _numero(fila, 'monto', requerido=True)
+                registros.append({
+                    'folio_recibo': folio_recibo,
+                    'socio_id': ids[socio_folio],
+                    'fecha_pago': _fecha(fila, 'fecha_pago', requerido=True),
+                    'concepto_tipo': _texto(fila, 'concepto', requerido=True, maximo=50),
+                    'detalle_concepto': _texto(fila, 'detalle', maximo=100),
+                    'monto_base': monto,
+                    'monto_ajuste': 0.0,
+                    'total_cobrado': monto,
+                    'metodo_pago': _texto(fila, 'metodo_pago', maximo=50),
+                    'requiere_factura': (_texto(fila, 'requiere_factura') or '').lower() in ('1', 'si', 'sí', 'true', 'x'),
+                })
+                if folio_recibo:
+                    vistos.add(folio_recibo)
+            except FilaInvalida as error:
+                rechazos.append((fila, str(error)))
+
+        _completar_folios('recibo', registros, 'folio_recibo')
+        return registros, rechazos
+
+    def insertar(self, registros):
+        db.session.execute(db.insert(Pago), registros)
+
+    def finalizar(self):
+        # Estatus y resumen de ingresos se regeneran una vez al final (no fila por fila)
+        reconstruir_estatus_socios()
+        reconstruir_resumenes()
+
+class ImportacionAsistencias:
+    """ socio_folio, horario_id, fecha, estado (Presente/Falta/Justificado) """
+    folio = None
+    columnas = ('socio_folio', 'horario_id', 'fecha', 'estado')
+    estados = {'presente': 'Presente', 'falta': 'Falta', 'justificado': 'Justificado'}
+
+    def __init__(self):
+        self.horarios = {h for (h,) in db.session.query(Horario.id)}
+
+    def preparar(self, filas):
+        unicos, rechazos = {}, []
+        ids = _ids_por_folio({f for f in (_texto(fila, 'socio_folio') for fila in filas) if f})
+
+        for fila in filas:
+            try:
+                socio_folio = _texto(fila, 'socio_folio', requerido=True)
+                if socio_folio not in ids:
+                    raise FilaInvalida(f'No existe el socio {socio_folio}')
+
+                horario_id = _numero(fila, 'horario_id', requerido=True)
+                if horario_id not in self.horarios:
+                    raise FilaInvalida(f'No existe el horario {fila.get("horario_id")}')
+
+                estado = self.estados.get((_texto(fila, 'estado') or 'Presente').lower())
+                if estado is None:
+                    raise FilaInvalida(f'Estado inválido: {fila.get("estado")}')
+
+                fecha = _fecha(fila, 'fecha', requerido=True)
+                llave = (ids[socio_folio], int(horario_id), fecha.date())
+                # Repetida dentro del lote: gana la última (como en el upsert)
+                unicos[llave] = {
+                    'socio_id': llave[0], 'horario_id': llave[1], 'fecha': llave[2],
+                    'estado': estado, 'timestamp': fecha,
+                }
+            except FilaInvalida as error:
+                rechazos.append((fila, str(error)))
+
+        return list(unicos.values()), rechazos
+
+    def insertar(self, registros):
+        # Upsert por (socio, horario, fecha): reimportar el mismo archivo no duplica
+        upsert_asistencias(registros)
+
+    def finalizar(self):
+        pass
+
+TIPOS = {
+    'socios': ImportacionSocios,
+    'pagos': ImportacionPagos,
+    'asistencias': ImportacionAsistencias,
+}
+
+# --- EJECUCIÓN ---
+
+def _lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def importar(tipo, ruta, tamano_lote=1000, ruta_errores=None, desde_cero=False, progreso=None, avisar=None):
+    """
+    Importa 'ruta' como 'tipo' (socios, pagos, asistencias). Reanuda desde el
+    último lote confirmado salvo desde_cero=True. progreso(avance, filas_por_seg)
+    se llama después de cada lote y avisar(texto) al reanudar o si el archivo
+    ya estaba importado. Retorna el ImportacionAvance final.
+    """
+    avisar = avisar or (lambda texto: None)
+    importacion = TIPOS[tipo]()
+    clave = f'{tipo}:{huella_archivo(ruta)}'
+    ruta_errores = ruta_errores or os.path.splitext(ruta)[0] + '.errores.csv'
+
+    avance = db.session.get(ImportacionAvance, clave)
+    if avance is None or desde_cero:
+        if avance is not None:
+            db.session.delete(avance)
+            db.session.flush()
+        avance = ImportacionAvance(clave=clave, tipo=tipo, archivo=os.path.basename(ruta),
+                                   filas_procesadas=0, insertadas=0, rechazadas=0, completada=False)
+        db.session.add(avance)
+        db.session.commit()
+    elif avance.completada:
+        avisar('Este archivo ya se importó por completo (use --desde-cero para repetirlo).')
+        return avance
+
+    if importacion.folio:
+        _reservar_folios_del_archivo(ruta, *importacion.folio)
+
+    saltar = avance.filas_procesadas
+    if saltar:
+        avisar(f'Reanudando después de la fila {saltar}.')
+    filas = leer_filas(ruta)
+    for _ in range(saltar):
+        if next(filas, None) is None:
+            break
+
+    reanudando = saltar > 0 and os.path.exists(ruta_errores)
+    with open(ruta_errores, 'a' if reanudando else 'w', newline='', encoding='utf-8') as archivo_errores:
+        errores = csv.writer(archivo_errores)
+        if not reanudando:
+            errores.writerow(list(importacion.columnas) + ['error'])
+
+        inicio, filas_sesion = time.perf_counter(), 0
+        for lote in _lotes(filas, tamano_lote):
+            registros, rechazos = importacion.preparar(lote)
+            if registros:
+                importacion.insertar(registros)
+
+            avance.filas_procesadas += len(lote)
+            avance.insertadas += len(registros)
+            avance.rechazadas += len(rechazos)
+            # El lote y su punto de avance se confirman juntos
+            db.session.commit()
+
+            for fila, error in rechazos:
+                errores.writerow([fila.get(c, '') for c in importacion.columnas] + [error])
+            archivo_errores.flush()
+
+            filas_sesion += len(lote)
+            if progreso:
+                progreso(avance, filas_sesion / max(time.perf_counter() - inicio, 1e-9))
+
+    importacion.finalizar()
+    avance.completada = True
+    db.session.commit()
+    return avance
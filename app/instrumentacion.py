@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+from flask import g, current_app, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# --- INSTRUMENTACIÓN DE SQL POR PETICIÓN ---
+#
+# Cuenta sentencias, tiempo total en BD y cargas perezosas (lazy loads) de
+# cada petición. En modo debug (o INSTRUMENTACION_ENCABEZADOS=True) lo expone
+# en encabezados de respuesta; con PRESUPUESTO_CONSULTAS_ESTRICTO=True (pruebas)
+# falla si una ruta rebasa su presupuesto declarado con @presupuesto_consultas.
+
+class PresupuestoExcedido(AssertionError):
+    """ Una ruta rebasó su techo de consultas o hizo cargas perezosas no planeadas """
+
+def presupuesto_consultas(max_consultas, cargas_perezosas=0):
+    """
+    Declara el techo de consultas SQL de una ruta (incluye la del usuario de
+    Flask-Login). Va justo encima del 'def' para que login_required y
+    admin_required (que usan @wraps) conserven el atributo.
+    """
+    def decorador(f):
+        f.presupuesto_consultas = (max_consultas, cargas_perezosas)
+        return f
+    return decorador
+
+@contextmanager
+def llenado_de_cache():
+    """
+    Las consultas hechas dentro no se cargan al presupuesto de la ruta: son
+    el llenado de un caché compartido (se pagan una vez, no en cada petición).
+    Se reportan aparte en X-DB-Consultas-Cache.
+    """
+    if not has_request_context():
+        yield
+        return
+
+    previo = g.get('db_llenando_cache', False)
+    g.db_llenando_cache = True
+    try:
+        yield
+    finally:
+        g.db_llenando_cache = previo
+
+# Funciones extra que reciben (statement, duracion) de cada sentencia
+observadores_sql = []
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consulta', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info['inicio_consulta'].pop()
+
+    if has_request_context():
+        if g.get('db_llenando_cache'):
+            g.db_consultas_cache = g.get('db_consultas_cache', 0) + 1
+        else:
+            g.db_consultas = g.get('db_consultas', 0) + 1
+        g.db_tiempo = g.get('db_tiempo', 0.0) + duracion
+
+    for observador in observadores_sql:
+        observador(statement, duracion)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _al_ejecutar_orm(orm_execute_state):
+    if orm_execute_state.is_relationship_load and has_request_context():
+        g.db_cargas_perezosas = g.get('db_cargas_perezosas', 0) + 1
+
+def init_app(app):
+
+    @app.after_request
+    def reportar_consultas(response):
+        consultas = g.get('db_consultas', 0)
+        cargas = g.get('db_cargas_perezosas', 0)
+
+        encabezados = app.config.get('INSTRUMENTACION_ENCABEZADOS')
+        if encabezados is None:
+            encabezados = app.debug
+
+        if encabezados:
+            response.headers['X-DB-Consultas'] = str(consultas)
+            response.headers['X-DB-Tiempo-Ms'] = f"{g.get('db_tiempo', 0.0) * 1000:.2f}"
+            response.headers['X-DB-Cargas-Perezosas'] = str(cargas)
+            response.headers['X-DB-Consultas-Cache'] = str(g.get('db_consultas_cache', 0))
+
+        if app.config.get('PRESUPUESTO_CONSULTAS_ESTRICTO') and request.blueprint:
+            verificar_presupuesto(request.endpoint, consultas, cargas)
+
+        return response
+
+def verificar_presupuesto(endpoint, consultas, cargas):
+    vista = current_app.view_functions.get(endpoint)
+    presupuesto = getattr(vista, 'presupuesto_consultas', None)
+
+    if presupuesto is None:
+        raise PresupuestoExcedido(f'{endpoint}: la ruta no declara @presupuesto_consultas.')
+
+    max_consultas, max_cargas = presupuesto
+    if consultas > max_consultas:
+        raise PresupuestoExcedido(f'{endpoint}: {consultas} consultas (presupuesto: {max_consultas}).')
+    if cargas > max_cargas:
+        raise PresupuestoExcedido(f'{endpoint}: {cargas} cargas perezosas no planeadas (permitidas: {max_cargas}).')
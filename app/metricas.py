@@ -0,0 +1,197 @@
+import re
+import threading
+import time
+from collections import deque
+from flask import g, request, before_render_template, template_rendered
+from app import instrumentacion
+
+# --- MÉTRICAS EN PROCESO (formato de texto Prometheus) ---
+#
+# Opcional: se activa con METRICAS_HABILITADAS=True. Por endpoint guarda
+# conteo, latencia (p50/p95/p99 sobre una ventana de muestras), tiempo en BD
+# y tiempo de render de plantillas; además el top-N de sentencias SQL más
+# lentas con literales y parámetros omitidos. Las métricas son por proceso.
+
+CUANTILES = (0.5, 0.95, 0.99)
+
+# Literales que podrían traer datos personales dentro del SQL
+_PATRON_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_PATRON_NUMEROS = re.compile(r'\b\d+(\.\d+)?\b')
+_PATRON_ESPACIOS = re.compile(r'\s+')
+
+def redactar_sql(statement):
+    """ Normaliza una sentencia y reemplaza sus literales por '?' """
+    sql = _PATRON_CADENAS.sub('?', statement)
+    sql = _PATRON_NUMEROS.sub('?', sql)
+    return _PATRON_ESPACIOS.sub(' ', sql).strip()
+
+class EstadisticaRuta:
+    __slots__ = ('conteo', 'por_estado', 'suma_latencia', 'suma_db', 'suma_plantillas', 'muestras')
+
+    def __init__(self, ventana):
+        self.conteo = 0
+        self.por_estado = {}
+        self.suma_latencia = 0.0
+        self.suma_db = 0.0
+        self.suma_plantillas = 0.0
+        self.muestras = deque(maxlen=ventana)
+
+class Metricas:
+    def __init__(self, ventana=1024, top_sql=20):
+        self.ventana = ventana
+        self.top_sql = top_sql
+        self.rutas = {}
+        self.sql = {}           # sql_redactada -> [max_segundos, conteo, suma_segundos]
+        self._redactadas = {}   # caché: sentencia original -> redactada
+        self._lock = threading.Lock()
+        # Funciones extra que regresan líneas Prometheus (cachés, tareas, etc.)
+        self.colectores = []
+
+    def registrar_peticion(self, endpoint, estado, latencia, tiempo_db, tiempo_plantillas):
+        with self._lock:
+            ruta = self.rutas.get(endpoint)
+            if ruta is None:
+                ruta = self.rutas[endpoint] = EstadisticaRuta(self.ventana)
+            ruta.conteo += 1
+            ruta.por_estado[estado] = ruta.por_estado.get(estado, 0) + 1
+            ruta.suma_latencia += latencia
+            ruta.suma_db += tiempo_db
+            ruta.suma_plantillas += tiempo_plantillas
+            ruta.muestras.append(latencia)
+
+    def registrar_sql(self, statement, duracion):
+        sql = self._redactadas.get(statement)
+        if sql is None:
+            sql = redactar_sql(statement)
+            if len(self._redactadas) < 2048:
+                self._redactadas[statement] = sql
+
+        with self._lock:
+            datos = self.sql.get(sql)
+            if datos is None:
+                datos = self.sql[sql] = [0.0, 0, 0.0]
+            if duracion > datos[0]:
+                datos[0] = duracion
+            datos[1] += 1
+            datos[2] += duracion
+
+            # Acotar memoria: conservar solo las más lentas
+            if len(self.sql) > self.top_sql * 10:
+                conservar = sorted(self.sql.items(), key=lambda kv: kv[1][0], reverse=True)[:self.top_sql]
+                self.sql = dict(conservar)
+
+    def reiniciar(self):
+        with self._lock:
+            self.rutas.clear()
+            self.sql.clear()
+
+    def exportar(self):
+        """ Texto en formato de exposición de Prometheus (version=0.0.4) """
+        with self._lock:
+            rutas = {nombre: (r.conteo, dict(r.por_estado), r.suma_latencia, r.suma_db,
+                              r.suma_plantillas, sorted(r.muestras))
+                     for nombre, r in self.rutas.items()}
+            lentas = sorted(self.sql.items(), key=lambda kv: kv[1][0], reverse=True)[:self.top_sql]
+
+        lineas = [
+            '# HELP swimmers_peticiones_total Peticiones atendidas por endpoint y código HTTP.',
+            '# TYPE swimmers_peticiones_total counter',
+        ]
+        for nombre, (_, por_estado, *_resto) in rutas.items():
+            for estado, total in sorted(por_estado.items()):
+                lineas.append(f'swimmers_peticiones_total{{endpoint="{_escapar(nombre)}",status="{estado}"}} {total}')
+
+        lineas += [
+            '# HELP swimmers_peticion_segundos Latencia de la petición (cuantiles sobre las últimas muestras).',
+            '# TYPE swimmers_peticion_segundos summary',
+        ]
+        for nombre, (conteo, _, suma, _, _, muestras) in rutas.items():
+            etiqueta = f'endpoint="{_escapar(nombre)}"'
+            for q in CUANTILES:
+                lineas.append(f'swimmers_peticion_segundos{{{etiqueta},quantile="{q}"}} {_cuantil(muestras, q):.6f}')
+            lineas.append(f'swimmers_peticion_segundos_sum{{{etiqueta}}} {suma:.6f}')
+            lineas.append(f'swimmers_peticion_segundos_count{{{etiqueta}}} {conteo}')
+
+        lineas += [
+            '# HELP swimmers_db_segundos_total Tiempo acumulado en la base de datos por endpoint.',
+            '# TYPE swimmers_db_segundos_total counter',
+        ]
+        for nombre, (_, _, _, suma_db, _, _) in rutas.items():
+            lineas.append(f'swimmers_db_segundos_total{{endpoint="{_escapar(nombre)}"}} {suma_db:.6f}')
+
+        lineas += [
+            '# HELP swimmers_plantillas_segundos_total Tiempo acumulado renderizando plantillas por endpoint.',
+            '# TYPE swimmers_plantillas_segundos_total counter',
+        ]
+        for nombre, (_, _, _, _, suma_plantillas, _) in rutas.items():
+            lineas.append(f'swimmers_plantillas_segundos_total{{endpoint="{_escapar(nombre)}"}} {suma_plantillas:.6f}')
+
+        lineas += [
+            '# HELP swimmers_sql_lenta_segundos Sentencias SQL más lentas (máximo observado, literales omitidos).',
+            '# TYPE swimmers_sql_lenta_segundos gauge',
+        ]
+        for sql, (maximo, _, _) in lentas:
+            lineas.append(f'swimmers_sql_lenta_segundos{{sql="{_escapar(sql)}"}} {maximo:.6f}')
+
+        # El conteo va en su propia serie: como etiqueta crearía una serie nueva en cada scrape
+        lineas += [
+            '# HELP swimmers_sql_lenta_total Ejecuciones de cada sentencia SQL lenta listada arriba.',
+            '# TYPE swimmers_sql_lenta_total counter',
+        ]
+        for sql, (_, conteo, _) in lentas:
+            lineas.append(f'swimmers_sql_lenta_total{{sql="{_escapar(sql)}"}} {conteo}')
+
+        for colector in self.colectores:
+            lineas.extend(colector())
+
+        return '\n'.join(lineas) + '\n'
+
+def _cuantil(muestras_ordenadas, q):
+    if not muestras_ordenadas:
+        return 0.0
+    indice = min(int(q * len(muestras_ordenadas)), len(muestras_ordenadas) - 1)
+    return muestras_ordenadas[indice]
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+# Registro único por proceso
+registro = Metricas()
+
+def init_app(app):
+    if not app.config.get('METRICAS_HABILITADAS'):
+        return
+
+    registro.ventana = app.config.get('METRICAS_VENTANA', registro.ventana)
+    registro.top_sql = app.config.get('METRICAS_TOP_SQL', registro.top_sql)
+    if registro.registrar_sql not in instrumentacion.observadores_sql:
+        instrumentacion.observadores_sql.append(registro.registrar_sql)
+
+    @app.before_request
+    def iniciar_cronometro():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_plantillas = 0.0
+
+    def antes_de_plantilla(sender, template, context, **extra):
+        g.metricas_plantilla_inicio = time.perf_counter()
+
+    def despues_de_plantilla(sender, template, context, **extra):
+        inicio = g.pop('metricas_plantilla_inicio', None)
+        if inicio is not None:
+            g.metricas_plantillas = g.get('metricas_plantillas', 0.0) + time.perf_counter() - inicio
+
+    before_render_template.connect(antes_de_plantilla, app, weak=False)
+    template_rendered.connect(despues_de_plantilla, app, weak=False)
+
+    @app.after_request
+    def registrar(response):
+        inicio = g.get('metricas_inicio')
+        if inicio is not None:
+            registro.registrar_peticion(
+                request.endpoint or 'sin_ruta',
+                response.status_code,
+                time.perf_counter() - inicio,
+                g.get('db_tiempo', 0.0),
+                g.get('metricas_plantillas', 0.0)
+            )
+        return response
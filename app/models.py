@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime, timedelta
+from sqlalchemy import func
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import login  
@@ -14,6 +15,11 @@ class Membresia(db.Model):
     tarifas = db.relationship('Tarifa', backref='membresia', lazy=True)
 
 class Tarifa(db.Model):
+    __table_args__ = (
+        # Una sola tarifa por combinación Membresía + Nivel
+        db.Index('uq_tarifa_membresia_nivel', 'membresia_id', 'nivel', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     membresia_id = db.Column(db.Integer, db.ForeignKey('membresia.id'), nullable=False)
     nivel = db.Column(db.String(20), nullable=False)  # Bebés, Niños, Adultos
@@ -22,25 +28,55 @@ class Tarifa(db.Model):
     costo_inscripcion = db.Column(db.Float, nullable=False)
 
 class Horario(db.Model):
+    __table_args__ = (
+        db.Index('ix_horario_dia_hora', 'dia_semana', 'hora_inicio'),
+        db.Index('ix_horario_nivel_hora', 'nivel', 'hora_inicio'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     dia_semana = db.Column(db.String(15), nullable=False) # Lunes, Martes...
     hora_inicio = db.Column(db.Time, nullable=False)
     hora_fin = db.Column(db.Time, nullable=False)
     nivel = db.Column(db.String(20), nullable=False)
     capacidad_maxima = db.Column(db.Integer, default=10)
+    # Contador desnormalizado de inscripciones activas
+    # (lo mantienen academico.inscribir / academico.baja con UPDATE atómicos)
+    ocupados = db.Column(db.Integer, nullable=False, default=0)
     
     # Relación dinámica para filtros
     inscripciones = db.relationship('Inscripcion', backref='horario', lazy='dynamic')
     asistencias = db.relationship('Asistencia', backref='horario', lazy=True)
 
     def cupos_disponibles(self):
-        # Cuenta solo las inscripciones activas
-        ocupados = self.inscripciones.filter_by(activo=True).count()
-        return self.capacidad_maxima - ocupados
+        # Lee el contador, no toca la tabla 'inscripcion'
+        return self.capacidad_maxima - (self.ocupados or 0)
+
+    @staticmethod
+    def reservar_lugar(horario_id):
+        """
+        Incrementa 'ocupados' SOLO si aún hay cupo (UPDATE condicionado).
+        Retorna True si se obtuvo el lugar. No hace commit.
+        """
+        return Horario.query.filter(
+            Horario.id == horario_id,
+            Horario.ocupados < Horario.capacidad_maxima
+        ).update({Horario.ocupados: Horario.ocupados + 1}, synchronize_session=False) == 1
+
+    @staticmethod
+    def liberar_lugar(horario_id):
+        """ Decrementa 'ocupados' sin bajar de cero. No hace commit. """
+        Horario.query.filter(Horario.id == horario_id, Horario.ocupados > 0)\
+            .update({Horario.ocupados: Horario.ocupados - 1}, synchronize_session=False)
 
 # --- TABLAS OPERATIVAS ---
 
 class Socio(db.Model):
+    __table_args__ = (
+        # Filtros del directorio (socios.lista) con orden por ID descendente
+        db.Index('ix_socio_nivel_id', 'nivel', 'id'),
+        db.Index('ix_socio_membresia_id', 'membresia_id', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     folio = db.Column(db.String(20), unique=True, index=True) # SW0001
     nombre_completo = db.Column(db.String(100), nullable=False)
@@ -60,36 +96,18 @@ class Socio(db.Model):
     def get_estatus_financiero(self):
         """
         Retorna una tupla: (Es_Activo: bool, Mensaje: str, Color: str)
+        Para varios socios a la vez usar estatus_financiero_bulk().
         """
-        # 1. VALIDAR ANUALIDAD
-        pago_anual = self.pagos.filter_by(concepto_tipo='Anualidad')\
-            .order_by(Pago.fecha_pago.desc()).first()
-        
-        if not pago_anual:
-            return False, "Falta pago de Inscripción/Anualidad", "error"
-            
-        dias_anualidad = (datetime.now() - pago_anual.fecha_pago).days
-        if dias_anualidad > 365:
-            return False, "Anualidad Vencida", "error"
-
-        # 2. VALIDAR MENSUALIDAD
-        pago_mes = self.pagos.filter_by(concepto_tipo='Mensualidad')\
-            .order_by(Pago.fecha_pago.desc()).first()
-            
-        if not pago_mes:
-            return False, "No ha pagado su primera mensualidad", "error"
-            
-        dias_mes = (datetime.now() - pago_mes.fecha_pago).days
-        
-        # Tolerancia: 35 días (para dar margen de 5 días después del mes)
-        if dias_mes > 35: 
-            return False, f"Mensualidad Vencida ({dias_mes} días)", "warning"
-            
-        # SI PASA TODO
-        return True, "Activo / Al Corriente", "success"
+        return estatus_financiero_bulk([self.id])[self.id]
 
 class Inscripcion(db.Model):
     """ Reservaciones Fijas """
+    __table_args__ = (
+        # Índices parciales: casi todas las consultas filtran activo = 1
+        db.Index('ix_inscripcion_socio_activo', 'socio_id', 'horario_id', sqlite_where=db.text('activo = 1')),
+        db.Index('ix_inscripcion_horario_activo', 'horario_id', 'socio_id', sqlite_where=db.text('activo = 1')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), nullable=False)
     horario_id = db.Column(db.Integer, db.ForeignKey('horario.id'), nullable=False)
@@ -97,6 +115,15 @@ class Inscripcion(db.Model):
     activo = db.Column(db.Boolean, default=True)
 
 class Asistencia(db.Model):
+    __table_args__ = (
+        # Una sola marca por socio, clase y día (permite el upsert de la sincronización)
+        db.UniqueConstraint('socio_id', 'horario_id', 'fecha', name='uq_asistencia_socio_horario_fecha'),
+        db.Index('ix_asistencia_horario_fecha', 'horario_id', 'fecha'),
+        db.Index('ix_asistencia_socio_fecha', 'socio_id', 'fecha'),
+        # Exportaciones por rango de fechas (app/exportador.py)
+        db.Index('ix_asistencia_fecha', 'fecha'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), nullable=False)
     horario_id = db.Column(db.Integer, db.ForeignKey('horario.id'), nullable=False)
@@ -105,6 +132,16 @@ class Asistencia(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Pago(db.Model):
+    __table_args__ = (
+        # Último pago por concepto de un socio (estatus financiero)
+        db.Index('ix_pago_socio_concepto_fecha', 'socio_id', 'concepto_tipo', 'fecha_pago'),
+        db.Index('ix_pago_fecha_pago', 'fecha_pago'),
+        # Historial del perfil paginado por (fecha_pago, id)
+        db.Index('ix_pago_socio_fecha', 'socio_id', 'fecha_pago'),
+        # Recibos ya registrados (la importación rechaza folios repetidos)
+        db.Index('ix_pago_folio_recibo', 'folio_recibo'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     folio_recibo = db.Column(db.String(20))
     socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), nullable=False)
@@ -120,6 +157,570 @@ class Pago(db.Model):
     metodo_pago = db.Column(db.String(50))
     requiere_factura = db.Column(db.Boolean, default=False)
 
+# --- ESTATUS FINANCIERO ---
+
+DIAS_VIGENCIA_ANUALIDAD = 365
+DIAS_TOLERANCIA_MENSUALIDAD = 35 # Margen de 5 días después del mes
+
+def evaluar_estatus_financiero(fecha_anualidad, fecha_mensualidad, ahora=None):
+    """
+    Aplica las reglas de negocio a las fechas del último pago de Anualidad
+    y de Mensualidad. Retorna: (Es_Activo: bool, Mensaje: str, Color: str)
+    """
+    ahora = ahora or datetime.now()
+
+    # 1. VALIDAR ANUALIDAD
+    if not fecha_anualidad:
+        return False, "Falta pago de Inscripción/Anualidad", "error"
+
+    dias_anualidad = (ahora - fecha_anualidad).days
+    if dias_anualidad > DIAS_VIGENCIA_ANUALIDAD:
+        return False, "Anualidad Vencida", "error"
+
+    # 2. VALIDAR MENSUALIDAD
+    if not fecha_mensualidad:
+        return False, "No ha pagado su primera mensualidad", "error"
+
+    dias_mes = (ahora - fecha_mensualidad).days
+
+    if dias_mes > DIAS_TOLERANCIA_MENSUALIDAD:
+        return False, f"Mensualidad Vencida ({dias_mes} días)", "warning"
+
+    # SI PASA TODO
+    return True, "Activo / Al Corriente", "success"
+
+class EstatusSocio(db.Model):
+    """
+    Foto desnormalizada del estatus financiero de cada socio.
+    Se actualiza al cobrar (misma transacción que el Pago) y el barrido
+    nocturno (flask estatus barrer) pasa a 'vencido' a quien ya expiró.
+    """
+    __tablename__ = 'estatus_socio'
+    __table_args__ = (
+        # Recordatorios de pago: vencimientos dentro de una ventana (app/recordatorios.py)
+        db.Index('ix_estatus_socio_vence_mensualidad', 'vence_mensualidad'),
+        db.Index('ix_estatus_socio_vence_anualidad', 'vence_anualidad'),
+    )
+
+    socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), primary_key=True)
+    ultima_anualidad = db.Column(db.DateTime)
+    ultima_mensualidad = db.Column(db.DateTime)
+    # Primer instante en que el pago correspondiente se considera vencido
+    vence_anualidad = db.Column(db.DateTime)
+    vence_mensualidad = db.Column(db.DateTime)
+    estado = db.Column(db.String(20), nullable=False, default='sin_pago', index=True) # activo, vencido, sin_pago
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow)
+
+    socio = db.relationship('Socio', backref=db.backref('estatus', uselist=False))
+
+    @staticmethod
+    def calcular(fecha_anualidad, fecha_mensualidad, ahora=None):
+        """ Retorna las columnas derivadas (vencimientos y estado) como dict """
+        es_activo, _, _ = evaluar_estatus_financiero(fecha_anualidad, fecha_mensualidad, ahora)
+
+        if es_activo:
+            estado = 'activo'
+        elif fecha_anualidad and fecha_mensualidad:
+            estado = 'vencido'
+        else:
+            estado = 'sin_pago'
+
+        return {
+            'vence_anualidad': fecha_anualidad + timedelta(days=DIAS_VIGENCIA_ANUALIDAD + 1) if fecha_anualidad else None,
+            'vence_mensualidad': fecha_mensualidad + timedelta(days=DIAS_TOLERANCIA_MENSUALIDAD + 1) if fecha_mensualidad else None,
+            'estado': estado,
+            'actualizado': datetime.utcnow()
+        }
+
+    def registrar_pago(self, concepto_tipo, fecha_pago):
+        """ Incorpora un pago nuevo (o histórico) y recalcula el estado """
+        if concepto_tipo == 'Anualidad':
+            if not self.ultima_anualidad or fecha_pago > self.ultima_anualidad:
+                self.ultima_anualidad = fecha_pago
+        elif concepto_tipo == 'Mensualidad':
+            if not self.ultima_mensualidad or fecha_pago > self.ultima_mensualidad:
+                self.ultima_mensualidad = fecha_pago
+
+        for columna, valor in self.calcular(self.ultima_anualidad, self.ultima_mensualidad).items():
+            setattr(self, columna, valor)
+
+    def evaluar(self, ahora=None):
+        return evaluar_estatus_financiero(self.ultima_anualidad, self.ultima_mensualidad, ahora)
+
+def registrar_pago_en_estatus(pago):
+    """
+    Actualiza la foto de estatus del socio con un Pago recién creado.
+    No hace commit: debe ir en la misma transacción que el pago.
+    """
+    if pago.concepto_tipo not in ('Anualidad', 'Mensualidad'):
+        return
+
+    estatus = db.session.get(EstatusSocio, pago.socio_id)
+    if estatus is None:
+        estatus = EstatusSocio(socio_id=pago.socio_id)
+        db.session.add(estatus)
+
+    estatus.registrar_pago(pago.concepto_tipo, pago.fecha_pago or datetime.utcnow())
+
+def estatus_financiero_bulk(socio_ids):
+    """
+    Calcula el estatus financiero de varios socios con UNA sola consulta
+    por llave primaria sobre la foto 'estatus_socio'.
+    Retorna: {socio_id: (Es_Activo, Mensaje, Color)}
+    """
+    ids = {int(socio_id) for socio_id in socio_ids}
+    if not ids:
+        return {}
+
+    fotos = {e.socio_id: e for e in EstatusSocio.query.filter(EstatusSocio.socio_id.in_(ids))}
+
+    ahora = datetime.now()
+    resultado = {}
+    for socio_id in ids:
+        foto = fotos.get(socio_id)
+        if foto:
+            resultado[socio_id] = foto.evaluar(ahora)
+        else:
+            # Sin foto = nunca ha pagado Anualidad ni Mensualidad
+            resultado[socio_id] = evaluar_estatus_financiero(None, None, ahora)
+    return resultado
+
+def barrer_estatus_vencidos(ahora=None):
+    """
+    Pasa a 'vencido' a los socios activos cuya anualidad o mensualidad
+    ya expiró. Retorna el número de socios afectados. No hace commit.
+    """
+    ahora = ahora or datetime.now()
+    return EstatusSocio.query.filter(
+        EstatusSocio.estado == 'activo',
+        db.or_(EstatusSocio.vence_anualidad <= ahora, EstatusSocio.vence_mensualidad <= ahora)
+    ).update({EstatusSocio.estado: 'vencido', EstatusSocio.actualizado: datetime.utcnow()},
+             synchronize_session=False)
+
+def reconstruir_estatus_socios(tamano_lote=1000):
+    """
+    Regenera TODA la tabla 'estatus_socio' a partir del historial de pagos
+    (para respaldos, importaciones o si se sospecha desfase). No hace commit.
+    """
+    filas = db.session.query(Pago.socio_id, Pago.concepto_tipo, func.max(Pago.fecha_pago))\
+        .filter(Pago.concepto_tipo.in_(['Anualidad', 'Mensualidad']))\
+        .group_by(Pago.socio_id, Pago.concepto_tipo).all()
+
+    ultimos = {}
+    for socio_id, concepto, fecha in filas:
+        ultimos.setdefault(socio_id, {})[concepto] = fecha
+
+    db.session.query(EstatusSocio).delete(synchronize_session=False)
+
+    ahora = datetime.now()
+    lote = []
+    for socio_id, fechas in ultimos.items():
+        anual, mes = fechas.get('Anualidad'), fechas.get('Mensualidad')
+        lote.append(dict(socio_id=socio_id, ultima_anualidad=anual, ultima_mensualidad=mes,
+                         **EstatusSocio.calcular(anual, mes, ahora)))
+        if len(lote) >= tamano_lote:
+            db.session.execute(db.insert(EstatusSocio), lote)
+            lote = []
+    if lote:
+        db.session.execute(db.insert(EstatusSocio), lote)
+
+    return len(ultimos)
+
+# --- OCUPACIÓN DE HORARIOS ---
+
+def reconciliar_ocupados(reparar=False):
+    """
+    Compara el contador 'ocupados' de cada Horario contra el conteo real de
+    inscripciones activas. Retorna [(horario_id, guardado, real)] con los
+    horarios desfasados; si reparar=True los corrige (sin commit).
+    """
+    reales = db.session.query(
+        Horario.id, Horario.ocupados, func.count(Inscripcion.id)
+    ).outerjoin(Inscripcion, db.and_(Inscripcion.horario_id == Horario.id, Inscripcion.activo == True))\
+     .group_by(Horario.id, Horario.ocupados).all()
+
+    desfasados = [(horario_id, guardado, real) for horario_id, guardado, real in reales if guardado != real]
+
+    if reparar:
+        for horario_id, _, real in desfasados:
+            Horario.query.filter_by(id=horario_id).update({Horario.ocupados: real}, synchronize_session=False)
+
+    return desfasados
+
+# --- AGENDA SEMANAL DE CADA SOCIO (bits por día) ---
+#
+# Regla de negocio: una clase por día y a lo más 'clases_por_semana' del
+# plan. En vez de contar y cruzar 'inscripcion' con 'horario' en cada alta,
+# cada socio tiene una fila con un bit por día ocupado y su número de clases
+# activas; validar es un AND y una comparación sobre esa fila (O(1)).
+# La mantienen inscribir_socio() y liberar_dia_de_agenda() en la misma
+# transacción que la inscripción; 'flask horarios reconciliar' la revisa.
+
+DIAS_SEMANA = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+
+class AgendaSocio(db.Model):
+    """ Días con clase (bit i = DIAS_SEMANA[i]) y clases activas de cada socio """
+    __tablename__ = 'agenda_socio'
+
+    socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), primary_key=True)
+    dias = db.Column(db.Integer, nullable=False, default=0)
+    clases = db.Column(db.Integer, nullable=False, default=0)
+
+    def tiene_dia(self, dia_semana):
+        return bool(self.dias & bit_de_dia(dia_semana))
+
+    def dias_ocupados(self):
+        return [dia for dia in DIAS_SEMANA if self.tiene_dia(dia)]
+
+def bit_de_dia(dia_semana):
+    """ 'Lunes' -> 1, 'Martes' -> 2, ... 'Domingo' -> 64; 0 si no es un día válido """
+    return 1 << DIAS_SEMANA.index(dia_semana) if dia_semana in DIAS_SEMANA else 0
+
+def _bit_sql(dia_semana):
+    """ bit_de_dia() como expresión SQL sobre una columna de día """
+    return db.case({dia: 1 << i for i, dia in enumerate(DIAS_SEMANA)}, value=dia_semana, else_=0)
+
+def _agenda_real(socio_ids=None):
+    """ SELECT socio_id, bits de sus días, clases activas (desde 'inscripcion') """
+    # Con una clase por día SUM(DISTINCT bit) equivale a un OR de bits (portable)
+    seleccion = db.select(
+        Inscripcion.socio_id, func.sum(_bit_sql(Horario.dia_semana).distinct()), func.count(Inscripcion.id)
+    ).join(Horario, Horario.id == Inscripcion.horario_id).where(Inscripcion.activo == True)\
+     .group_by(Inscripcion.socio_id)
+    if socio_ids is not None:
+        seleccion = seleccion.where(Inscripcion.socio_id.in_(socio_ids))
+    return seleccion
+
+def reconstruir_agendas():
+    """ Regenera 'agenda_socio' desde las inscripciones activas. Retorna filas. No hace commit. """
+    db.session.execute(db.delete(AgendaSocio))
+    db.session.execute(db.insert(AgendaSocio).from_select(['socio_id', 'dias', 'clases'], _agenda_real()))
+    return db.session.query(func.count()).select_from(AgendaSocio).scalar()
+
+def reconciliar_agendas(reparar=False, socio_ids=None):
+    """
+    Compara 'agenda_socio' contra las inscripciones activas (de todos o solo
+    de 'socio_ids'). Retorna [(socio_id, (dias, clases) guardados, (dias,
+    clases) reales)] de los socios desfasados; si reparar=True los corrige
+    (sin commit).
+    """
+    reales = {socio_id: (dias, clases) for socio_id, dias, clases in db.session.execute(_agenda_real(socio_ids))}
+    guardadas = AgendaSocio.query
+    if socio_ids is not None:
+        guardadas = guardadas.filter(AgendaSocio.socio_id.in_(socio_ids))
+    guardadas = {a.socio_id: (a.dias, a.clases) for a in guardadas}
+
+    desfasados = []
+    for socio_id in sorted(set(reales) | set(guardadas)):
+        real, guardada = reales.get(socio_id, (0, 0)), guardadas.get(socio_id, (0, 0))
+        if real != guardada:
+            desfasados.append((socio_id, guardada, real))
+
+    if reparar and desfasados:
+        stmt = _insert_con_conflicto(AgendaSocio)
+        stmt = stmt.on_conflict_do_update(index_elements=['socio_id'],
+                                          set_={'dias': stmt.excluded.dias, 'clases': stmt.excluded.clases})
+        db.session.execute(stmt, [{'socio_id': socio_id, 'dias': real[0], 'clases': real[1]}
+                                  for socio_id, _, real in desfasados])
+    return desfasados
+
+def ocupar_dia_en_agenda(socio_id, horario_id, limite_clases):
+    """
+    Marca el día del horario y suma una clase en UNA sentencia (upsert
+    condicionado): solo si ese día está libre y el socio tiene menos de
+    'limite_clases'. También es el candado por socio (primera escritura).
+    Retorna True si se marcó. No hace commit.
+    """
+    bit = _bit_sql(Horario.dia_semana)
+    seleccion = db.select(db.literal(socio_id), bit, db.literal(1))\
+        .where(Horario.id == horario_id, bit != 0, db.literal(limite_clases) > 0)
+
+    stmt = _insert_con_conflicto(AgendaSocio).from_select(['socio_id', 'dias', 'clases'], seleccion)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['socio_id'],
+        set_={'dias': AgendaSocio.dias.op('|')(stmt.excluded.dias), 'clases': AgendaSocio.clases + 1},
+        where=db.and_(AgendaSocio.dias.op('&')(stmt.excluded.dias) == 0, AgendaSocio.clases < limite_clases)
+    )
+    return db.session.execute(stmt).rowcount == 1
+
+def liberar_dia_de_agenda(socio_id, horario_id):
+    """
+    Resta la clase y libera su día (si no queda otra clase activa ese día)
+    después de dar de baja una inscripción. No hace commit.
+    """
+    bit = db.select(_bit_sql(Horario.dia_semana)).where(Horario.id == horario_id).scalar_subquery()
+    otra_del_dia = db.select(Inscripcion.id).join(Horario, Horario.id == Inscripcion.horario_id).where(
+        Inscripcion.socio_id == socio_id, Inscripcion.activo == True, _bit_sql(Horario.dia_semana) == bit
+    ).exists()
+
+    AgendaSocio.query.filter(AgendaSocio.socio_id == socio_id).update({
+        AgendaSocio.clases: db.case((AgendaSocio.clases > 0, AgendaSocio.clases - 1), else_=0),
+        AgendaSocio.dias: db.case((db.and_(AgendaSocio.dias.op('&')(bit) != 0, ~otra_del_dia),
+                                   AgendaSocio.dias - bit), else_=AgendaSocio.dias),
+    }, synchronize_session=False)
+
+def inscribir_socio(socio_id, horario_id, limite_clases):
+    """
+    Inscribe al socio en el horario como UNA operación atómica:
+      1. ocupar_dia_en_agenda(): upsert condicionado sobre la fila del socio
+         en 'agenda_socio' (día libre y menos de 'limite_clases'); además
+         toma el candado de escritura por socio.
+      2. INSERT de la inscripción.
+      3. Reserva el lugar con el UPDATE condicionado de Horario.reservar_lugar.
+    Retorna 'ok', 'inexistente', 'limite', 'mismo_dia' o 'lleno'. No hace
+    commit; si el resultado no es 'ok' el llamador debe hacer rollback.
+    Los candados son por socio y por horario: clases distintas no se esperan.
+    """
+    if not ocupar_dia_en_agenda(socio_id, horario_id, limite_clases):
+        # Solo para elegir el mensaje: la decisión ya la tomó el upsert
+        existe, clases = db.session.query(
+            db.select(Horario.id).where(Horario.id == horario_id).exists(),
+            db.select(AgendaSocio.clases).where(AgendaSocio.socio_id == socio_id).scalar_subquery()
+        ).one()
+        if not existe:
+            return 'inexistente'
+        return 'limite' if (clases or 0) >= limite_clases else 'mismo_dia'
+
+    db.session.execute(db.insert(Inscripcion).values(socio_id=socio_id, horario_id=horario_id,
+                                                     fecha_alta=datetime.utcnow(), activo=True))
+
+    if not Horario.reservar_lugar(horario_id):
+        return 'lleno'
+    return 'ok'
+
+# --- SINCRONIZACIÓN DE ASISTENCIA ---
+
+class MarcaProcesada(db.Model):
+    """ Llave de idempotencia de cada marca recibida desde un dispositivo """
+    __tablename__ = 'marca_procesada'
+
+    clave = db.Column(db.String(64), primary_key=True)
+    socio_id = db.Column(db.Integer, nullable=False)
+    horario_id = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    resultado = db.Column(db.String(20), nullable=False) # aplicada, obsoleta, rechazada
+    procesada = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+def _insert_con_conflicto(tabla):
+    """ INSERT con soporte ON CONFLICT del dialecto activo (SQLite o PostgreSQL) """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabla)
+
+def upsert_asistencias(filas):
+    """
+    Inserta o actualiza en UNA sentencia (executemany) las marcas
+    [{socio_id, horario_id, fecha, estado, timestamp}]. Gana la escritura con
+    timestamp más reciente: una marca más vieja que la guardada no cambia nada.
+    No hace commit.
+    """
+    if not filas:
+        return
+
+    stmt = _insert_con_conflicto(Asistencia)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['socio_id', 'horario_id', 'fecha'],
+        set_={'estado': stmt.excluded.estado, 'timestamp': stmt.excluded.timestamp},
+        where=db.or_(Asistencia.timestamp.is_(None), stmt.excluded.timestamp > Asistencia.timestamp)
+    )
+    db.session.execute(stmt, filas)
+
+    # Mantener el resumen diario de las clases/días tocados
+    actualizar_resumen_asistencia({(fila['horario_id'], fila['fecha']) for fila in filas})
+
+def registrar_claves_procesadas(filas):
+    """ Guarda las llaves de idempotencia [{clave, socio_id, ...}] ignorando repetidas. No hace commit. """
+    if not filas:
+        return
+
+    stmt = _insert_con_conflicto(MarcaProcesada).on_conflict_do_nothing(index_elements=['clave'])
+    db.session.execute(stmt, filas)
+
+def purgar_claves_procesadas(dias=30):
+    """ Borra las llaves de idempotencia más viejas que 'dias'. Retorna cuántas. No hace commit. """
+    limite = datetime.utcnow() - timedelta(days=dias)
+    return MarcaProcesada.query.filter(MarcaProcesada.procesada < limite).delete(synchronize_session=False)
+
+# --- RESÚMENES DIARIOS (reportes.dashboard) ---
+#
+# Agregados que se mantienen en la misma transacción de cada pago/marca para
+# que los reportes no recorran 'pago' ni 'asistencia'. Si se desfasan (cargas
+# masivas, correcciones a mano) se regeneran con 'flask resumenes reconstruir'.
+
+class ResumenIngresoDiario(db.Model):
+    __tablename__ = 'resumen_ingreso_diario'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    concepto = db.Column(db.String(50), primary_key=True) # Mensualidad, Anualidad...
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    pagos = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenAsistenciaDiaria(db.Model):
+    __tablename__ = 'resumen_asistencia_diaria'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    horario_id = db.Column(db.Integer, db.ForeignKey('horario.id'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    presentes = db.Column(db.Integer, nullable=False, default=0)
+    faltas = db.Column(db.Integer, nullable=False, default=0)
+    justificados = db.Column(db.Integer, nullable=False, default=0)
+
+CONCEPTO_SIN_NOMBRE = 'Otro'
+
+def acumular_ingreso(pago):
+    """ Suma un pago al resumen de su día y concepto (upsert). No hace commit. """
+    stmt = _insert_con_conflicto(ResumenIngresoDiario).values(
+        fecha=(pago.fecha_pago or datetime.utcnow()).date(),
+        concepto=pago.concepto_tipo or CONCEPTO_SIN_NOMBRE,
+        total=pago.total_cobrado or 0.0,
+        pagos=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['fecha', 'concepto'],
+        set_={'total': ResumenIngresoDiario.total + stmt.excluded.total,
+              'pagos': ResumenIngresoDiario.pagos + stmt.excluded.pagos}
+    )
+    db.session.execute(stmt)
+
+def _conteos_asistencia():
+    """ SELECT fecha, horario_id, total, presentes, faltas, justificados agrupado por clase/día """
+    def contar(estado):
+        return func.coalesce(func.sum(db.case((Asistencia.estado == estado, 1), else_=0)), 0)
+
+    return db.select(
+        Asistencia.fecha, Asistencia.horario_id, func.count(Asistencia.id),
+        contar('Presente'), contar('Falta'), contar('Justificado')
+    ).group_by(Asistencia.fecha, Asistencia.horario_id)
+
+_COLUMNAS_RESUMEN_ASISTENCIA = ['fecha', 'horario_id', 'total', 'presentes', 'faltas', 'justificados']
+
+def actualizar_resumen_asistencia(pares):
+    """
+    Recalcula el resumen de los pares {(horario_id, fecha)} con un solo
+    INSERT ... SELECT (usa ix_asistencia_horario_fecha). Como una marca puede
+    cambiar de estado, se recuenta la clase del día en vez de sumar +1.
+    No hace commit.
+    """
+    if not pares:
+        return
+
+    seleccion = _conteos_asistencia().where(
+        db.tuple_(Asistencia.horario_id, Asistencia.fecha).in_(list(pares))
+    )
+    stmt = _insert_con_conflicto(ResumenAsistenciaDiaria).from_select(_COLUMNAS_RESUMEN_ASISTENCIA, seleccion)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['fecha', 'horario_id'],
+        set_={columna: stmt.excluded[columna] for columna in _COLUMNAS_RESUMEN_ASISTENCIA[2:]}
+    )
+    db.session.execute(stmt)
+
+def reconstruir_resumenes():
+    """
+    Regenera ambos resúmenes desde 'pago' y 'asistencia'.
+    Retorna (dias_de_ingreso, clases_dia). No hace commit.
+    """
+    db.session.execute(db.delete(ResumenIngresoDiario))
+    db.session.execute(db.delete(ResumenAsistenciaDiaria))
+
+    dia_pago = func.date(Pago.fecha_pago)
+    ingresos = db.select(
+        dia_pago,
+        func.coalesce(Pago.concepto_tipo, CONCEPTO_SIN_NOMBRE),
+        func.coalesce(func.sum(Pago.total_cobrado), 0.0),
+        func.count(Pago.id)
+    ).where(Pago.fecha_pago.isnot(None))\
+     .group_by(dia_pago, func.coalesce(Pago.concepto_tipo, CONCEPTO_SIN_NOMBRE))
+
+    db.session.execute(db.insert(ResumenIngresoDiario).from_select(['fecha', 'concepto', 'total', 'pagos'], ingresos))
+    db.session.execute(db.insert(ResumenAsistenciaDiaria).from_select(_COLUMNAS_RESUMEN_ASISTENCIA, _conteos_asistencia()))
+
+    return (db.session.query(func.count()).select_from(ResumenIngresoDiario).scalar(),
+            db.session.query(func.count()).select_from(ResumenAsistenciaDiaria).scalar())
+
+# --- VERSIONES DE DATOS (invalidación de cachés, ver app/cache.py) ---
+
+class VersionDatos(db.Model):
+    """ Contador que sube en cada commit que toca las tablas de un grupo (ej. 'agenda') """
+    __tablename__ = 'version_datos'
+
+    nombre = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# --- CONTADORES DE FOLIOS (ver app/folios.py) ---
+
+class Contador(db.Model):
+    """ Último número reservado de cada serie de folios ('socio', 'recibo') """
+    __tablename__ = 'contador'
+
+    nombre = db.Column(db.String(30), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+# --- IMPORTACIONES MASIVAS (ver app/importador.py) ---
+
+class ImportacionAvance(db.Model):
+    """ Punto de reanudación de un archivo importado con 'flask importar' """
+    __tablename__ = 'importacion_avance'
+
+    clave = db.Column(db.String(80), primary_key=True) # tipo:sha1 del archivo
+    tipo = db.Column(db.String(20), nullable=False)     # socios, pagos, asistencias
+    archivo = db.Column(db.String(255), nullable=False)
+    filas_procesadas = db.Column(db.Integer, nullable=False, default=0) # incluye rechazadas
+    insertadas = db.Column(db.Integer, nullable=False, default=0)
+    rechazadas = db.Column(db.Integer, nullable=False, default=0)
+    completada = db.Column(db.Boolean, nullable=False, default=False)
+    actualizada = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# --- TAREAS EN SEGUNDO PLANO (ver app/planificador.py) ---
+
+class Tarea(db.Model):
+    """ Trabajo recurrente (cron) o de una sola vez que corre fuera de las peticiones """
+    __tablename__ = 'tarea'
+    __table_args__ = (
+        # Tareas vencidas: activa = 1 AND proxima <= ahora ORDER BY proxima
+        db.Index('ix_tarea_activa_proxima', 'activa', 'proxima'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(120), unique=True, nullable=False) # 'estatus.barrer' o 'funcion:xxxx' (una vez)
+    funcion = db.Column(db.String(80), nullable=False)  # Nombre registrado con @planificador.tarea
+    argumentos = db.Column(db.Text)                     # JSON con los kwargs
+    cron = db.Column(db.String(60))                     # 'min hora día mes día_semana'; vacío = una sola vez
+    proxima = db.Column(db.DateTime)                    # Hora local de la siguiente ejecución
+    activa = db.Column(db.Boolean, nullable=False, default=True)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente') # pendiente, corriendo, ok, error
+
+    # Candado con vencimiento: un solo proceso la corre; si muere, otro la retoma al vencer
+    bloqueada_por = db.Column(db.String(80))
+    bloqueada_hasta = db.Column(db.DateTime)
+
+    intentos = db.Column(db.Integer, nullable=False, default=0)     # fallos seguidos
+    max_intentos = db.Column(db.Integer, nullable=False, default=3) # reintentos de las de una sola vez
+    ejecuciones = db.Column(db.Integer, nullable=False, default=0)
+    fallos = db.Column(db.Integer, nullable=False, default=0)
+    ultima_ejecucion = db.Column(db.DateTime)
+    ultima_duracion = db.Column(db.Float) # segundos
+    ultimo_error = db.Column(db.Text)
+    creada = db.Column(db.DateTime, default=datetime.utcnow)
+
+# --- RECORDATORIOS DE PAGO (ver app/recordatorios.py) ---
+
+class Recordatorio(db.Model):
+    """ Bitácora de avisos: uno por socio, concepto, vencimiento y motivo (evita repetirlos) """
+    __tablename__ = 'recordatorio'
+
+    socio_id = db.Column(db.Integer, db.ForeignKey('socio.id'), primary_key=True)
+    concepto = db.Column(db.String(20), primary_key=True) # Mensualidad, Anualidad
+    vence = db.Column(db.DateTime, primary_key=True)      # EstatusSocio.vence_* que se avisó
+    motivo = db.Column(db.String(20), primary_key=True)   # por_vencer, vencido
+    canal = db.Column(db.String(20), nullable=False)      # correo, webhook, registro
+    destino = db.Column(db.String(120), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)     # enviado, fallido (se reintenta), rechazado
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
 # --- NUEVA CLASE USUARIO ---
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
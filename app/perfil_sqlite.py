@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+from app import db
+
+# --- PERFIL DE SQLITE PARA PRODUCCIÓN (WAL, pragmas y escrituras cortas) ---
+#
+# Con el diario por defecto (rollback journal) una escritura bloquea a todos
+# los lectores mientras hace commit y los demás ven "database is locked". En
+# WAL los lectores leen su foto del archivo mientras alguien escribe; solo
+# las escrituras se forman (una a la vez, esperando hasta busy_timeout).
+#
+# Los pragmas de SQLITE_PRAGMAS se aplican a cada conexión nueva del pool
+# (journal_mode=WAL queda guardado en el archivo, los demás son por conexión).
+#
+# El driver de Python abre la transacción hasta la primera sentencia de
+# escritura (las lecturas previas no toman candado), así que el candado de
+# escritura dura desde el primer INSERT/UPDATE/DELETE hasta el commit. Aquí se
+# mide ese tramo: si pasa de SQLITE_ESCRITURA_MAX_MS se registra (y con
+# SQLITE_ESCRITURA_ESTRICTA, en pruebas, el commit falla).
+
+log = logging.getLogger(__name__)
+
+_ESCRITURAS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Orden de aplicación: busy_timeout primero para que el cambio a WAL espere
+# si otro proceso tiene el archivo ocupado.
+ORDEN_PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+                 'wal_autocheckpoint', 'journal_size_limit')
+
+class TransaccionEscrituraLarga(AssertionError):
+    """ Una transacción retuvo el candado de escritura más tiempo del permitido """
+
+class Estadisticas:
+    """ Transacciones de escritura por proceso (para /admin/metricas) """
+
+    def __init__(self):
+        self.escrituras = 0
+        self.largas = 0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, duracion_ms, larga):
+        with self._lock:
+            self.escrituras += 1
+            self.largas += larga
+            self.max_ms = max(self.max_ms, duracion_ms)
+
+estadisticas = Estadisticas()
+
+def aplicar_pragmas(conexion_dbapi, pragmas):
+    cursor = conexion_dbapi.cursor()
+    try:
+        for nombre in sorted(pragmas, key=lambda n: ORDEN_PRAGMAS.index(n) if n in ORDEN_PRAGMAS else len(ORDEN_PRAGMAS)):
+            cursor.execute(f'PRAGMA {nombre} = {pragmas[nombre]}')
+    finally:
+        cursor.close()
+
+def _es_escritura(statement):
+    return statement.lstrip()[:7].upper().startswith(_ESCRITURAS)
+
+def vigilar_escrituras(engine, max_ms, estricta=False):
+    """ Mide el tiempo entre la primera escritura de cada transacción y su commit/rollback """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def marcar_inicio(conn, cursor, statement, parameters, context, executemany):
+        if 'escritura_desde' not in conn.info and _es_escritura(statement):
+            conn.info['escritura_desde'] = (time.perf_counter(), statement)
+
+    @event.listens_for(engine, 'commit')
+    def al_confirmar(conn):
+        inicio = conn.info.pop('escritura_desde', None)
+        if inicio is None:
+            return
+        duracion_ms = (time.perf_counter() - inicio[0]) * 1000
+        larga = duracion_ms > max_ms
+        estadisticas.registrar(duracion_ms, larga)
+        if larga:
+            primera = ' '.join(inicio[1].split())[:120]
+            log.warning('Transacción de escritura de %.0f ms (máximo %s ms); empezó con: %s',
+                        duracion_ms, max_ms, primera)
+            if estricta:
+                raise TransaccionEscrituraLarga(
+                    f'Candado de escritura retenido {duracion_ms:.0f} ms (máximo {max_ms} ms): {primera}')
+
+    @event.listens_for(engine, 'rollback')
+    def al_deshacer(conn):
+        conn.info.pop('escritura_desde', None)
+
+def checkpoint(modo='PASSIVE'):
+    """ Pasa el WAL al archivo principal. Retorna (ocupado, páginas_en_wal, páginas_copiadas) """
+    with db.engine.connect() as conexion:
+        return tuple(conexion.exec_driver_sql(f'PRAGMA wal_checkpoint({modo})').one())
+
+def optimizar(completo=False):
+    """ Estadísticas del planificador: ANALYZE completo o el 'optimize' incremental """
+    with db.engine.connect() as conexion:
+        conexion.exec_driver_sql('ANALYZE' if completo else 'PRAGMA optimize')
+        conexion.commit()
+
+def estado():
+    """ Valor efectivo de cada pragma del perfil y tamaño de los archivos """
+    with db.engine.connect() as conexion:
+        valores = {nombre: conexion.exec_driver_sql(f'PRAGMA {nombre}').scalar() for nombre in ORDEN_PRAGMAS}
+    ruta = db.engine.url.database
+    if ruta and ruta != ':memory:':
+        for sufijo in ('', '-wal'):
+            valores[f'archivo{sufijo}_bytes'] = os.path.getsize(ruta + sufijo) if os.path.exists(ruta + sufijo) else 0
+    return valores
+
+def lineas_prometheus():
+    """ Colector para app/metricas.py """
+    return [
+        '# HELP swimmers_sqlite_escrituras_total Transacciones de escritura confirmadas.',
+        '# TYPE swimmers_sqlite_escrituras_total counter',
+        f'swimmers_sqlite_escrituras_total {estadisticas.escrituras}',
+        '# HELP swimmers_sqlite_escrituras_largas_total Transacciones que pasaron de SQLITE_ESCRITURA_MAX_MS.',
+        '# TYPE swimmers_sqlite_escrituras_largas_total counter',
+        f'swimmers_sqlite_escrituras_largas_total {estadisticas.largas}',
+        '# HELP swimmers_sqlite_escritura_max_segundos Candado de escritura más largo visto.',
+        '# TYPE swimmers_sqlite_escritura_max_segundos gauge',
+        f'swimmers_sqlite_escritura_max_segundos {estadisticas.max_ms / 1000:.6f}',
+    ]
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = dict(app.config.get('SQLITE_PRAGMAS') or {})
+    if pragmas:
+        event.listen(engine, 'connect', lambda conexion_dbapi, registro: aplicar_pragmas(conexion_dbapi, pragmas))
+
+    max_ms = app.config.get('SQLITE_ESCRITURA_MAX_MS')
+    if max_ms:
+        vigilar_escrituras(engine, max_ms, app.config.get('SQLITE_ESCRITURA_ESTRICTA', False))
+
+    # Conexiones abiertas antes de registrar el evento no tendrían los pragmas
+    engine.dispose()
+
+    from app import metricas
+    if lineas_prometheus not in metricas.registro.colectores:
+        metricas.registro.colectores.append(lineas_prometheus)
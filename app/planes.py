@@ -0,0 +1,103 @@
+import re
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from app import db
+from app.models import (Socio, Horario, Inscripcion, Asistencia, Pago, Tarifa, EstatusSocio,
+                        ResumenAsistenciaDiaria, estatus_financiero_bulk, barrer_estatus_vencidos,
+                        actualizar_resumen_asistencia, inscribir_socio, liberar_dia_de_agenda)
+from app.routes.socios import consulta_directorio, historial_pagos, historial_asistencias, resumen_socio
+from app.routes.reportes import serie_ingresos
+from app.exportador import consulta_pagos, consulta_asistencias
+from app.importador import _recibos_existentes
+from app.planificador import vencidas
+from app.recordatorios import seleccionar
+
+# --- REGRESIÓN DE PLANES DE CONSULTA (EXPLAIN QUERY PLAN, solo SQLite) ---
+#
+# Cada consulta crítica se ejecuta tal como la emite la aplicación; se capturan
+# las sentencias SQL reales y se pide su plan a SQLite. Si alguna recorre una
+# tabla completa ("SCAN tabla" sin índice) se reporta como falla.
+
+# Líneas del plan que indican un recorrido completo sin índice
+PATRON_SCAN = re.compile(r'^SCAN (TABLE )?(\w+)$')
+
+CONSULTAS_CRITICAS = {
+    'estatus_financiero_bulk': lambda: estatus_financiero_bulk([1, 2, 3]),
+    'socios_activos': lambda: EstatusSocio.query.filter_by(estado='activo').count(),
+    'barrido_vencidos': lambda: barrer_estatus_vencidos(),
+    'ultimo_pago_por_concepto': lambda: Pago.query.filter_by(socio_id=1, concepto_tipo='Mensualidad')
+        .order_by(Pago.fecha_pago.desc()).first(),
+    'ultimos_pagos': lambda: Pago.query.order_by(Pago.fecha_pago.desc()).limit(5).all(),
+    'lista_de_clase': lambda: Inscripcion.query.filter_by(horario_id=1, activo=True).all(),
+    'clases_activas_socio': lambda: Inscripcion.query.filter_by(socio_id=1, activo=True).count(),
+    'asistencias_de_clase_hoy': lambda: Asistencia.query.filter_by(horario_id=1, fecha=date.today()).all(),
+    'asistencia_socio_hoy': lambda: Asistencia.query.filter_by(socio_id=1, horario_id=1, fecha=date.today()).first(),
+    'historial_asistencia_socio': lambda: Asistencia.query.filter_by(socio_id=1)
+        .order_by(Asistencia.fecha.desc()).limit(50).all(),
+    'clases_del_dia': lambda: Horario.query.filter_by(dia_semana='Lunes').order_by(Horario.hora_inicio).all(),
+    'horarios_por_nivel': lambda: Horario.query.filter_by(nivel='Niños').order_by(Horario.hora_inicio).all(),
+    'reservar_lugar': lambda: Horario.reservar_lugar(1),
+    'inscribir_socio': lambda: inscribir_socio(1, 1, 2),
+    'liberar_dia_de_agenda': lambda: liberar_dia_de_agenda(1, 1),
+    'tarifa_de_socio': lambda: Tarifa.query.filter_by(membresia_id=1, nivel='Niños').first(),
+    'socio_por_folio': lambda: Socio.query.filter_by(folio='SW0001').first(),
+    'historial_pagos_socio': lambda: historial_pagos(1, despues=(datetime(2030, 1, 1), 10)),
+    'historial_asistencias_socio': lambda: historial_asistencias(1, despues=(date(2030, 1, 1), 10)),
+    'resumen_socio': lambda: resumen_socio(1, 90),
+    'directorio_pagina': lambda: consulta_directorio(despues=1000),
+    'directorio_por_nivel': lambda: consulta_directorio(nivel='Niños', despues=1000),
+    'directorio_por_membresia': lambda: consulta_directorio(membresia_id=1, despues=1000),
+    'serie_ingresos_30_dias': lambda: serie_ingresos(date.today() - timedelta(days=29), date.today()),
+    'asistencias_hoy_resumen': lambda: ResumenAsistenciaDiaria.query.filter_by(fecha=date.today()).all(),
+    'recuento_asistencia_clase_dia': lambda: actualizar_resumen_asistencia({(1, date.today())}),
+    'exportar_pagos_mes': lambda: db.session.execute(consulta_pagos(date.today().replace(day=1), date.today(),
+                                                                    concepto='Mensualidad')).all(),
+    'exportar_asistencias_rango': lambda: db.session.execute(consulta_asistencias(date.today() - timedelta(days=30),
+                                                                                  date.today())).all(),
+    'tareas_vencidas': lambda: vencidas(datetime.now(), 2),
+    'recordatorios_candidatos': lambda: seleccionar(datetime.now()),
+    'importar_recibos_existentes': lambda: _recibos_existentes({'R-000001', 'R-000002'}),
+}
+
+def capturar_planes(funcion):
+    """
+    Ejecuta funcion() y retorna [(sql, [lineas_del_plan])] de cada sentencia
+    que emitió. Todo corre dentro de una transacción que se revierte.
+    """
+    capturadas = []
+
+    def al_ejecutar(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith('EXPLAIN'):
+            capturadas.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', al_ejecutar)
+    try:
+        funcion()
+    finally:
+        event.remove(engine, 'before_cursor_execute', al_ejecutar)
+
+    resultado = []
+    conexion = db.session.connection()
+    for statement, parameters in capturadas:
+        filas = conexion.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        resultado.append((statement, [fila[-1] for fila in filas]))
+
+    db.session.rollback()
+    return resultado
+
+def verificar_planes(consultas=None):
+    """
+    Retorna {nombre: [(sql, plan, tablas_escaneadas)]} para TODAS las
+    consultas críticas; una consulta falla si tablas_escaneadas no está vacío.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('La verificación de planes solo está disponible para SQLite.')
+
+    reporte = {}
+    for nombre, funcion in (consultas or CONSULTAS_CRITICAS).items():
+        reporte[nombre] = []
+        for statement, plan in capturar_planes(funcion):
+            escaneadas = [m.group(2) for m in map(PATRON_SCAN.match, plan) if m]
+            reporte[nombre].append((statement, plan, escaneadas))
+    return reporte
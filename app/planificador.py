@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app import db
+
+# --- TAREAS EN SEGUNDO PLANO (barridos, reconstrucciones, recordatorios) ---
+#
+# Las tareas viven en la tabla 'tarea': recurrentes (expresión cron de 5
+# campos, hora local) o de una sola vez (programar()). Cada proceso de la app
+# arranca, con su primera petición, un hilo que cada PLANIFICADOR_INTERVALO
+# segundos busca tareas vencidas y las corre en un pool de PLANIFICADOR_HILOS
+# hilos. Para que un solo proceso corra cada tarea, se "reclama" con un UPDATE
+# condicionado que pone un candado con vencimiento (bloqueada_hasta): si el
+# proceso muere a media tarea, otro la retoma cuando el candado vence.
+#
+# Las funciones se registran por nombre con @tarea('grupo.accion'); la tabla
+# guarda el nombre, no una ruta de importación.
+
+log = logging.getLogger(__name__)
+
+_funciones = {}   # nombre registrado -> función(**argumentos)
+
+# Recurrentes que siempre existen (se crean al arrancar si faltan; el admin
+# puede pausarlas). nombre -> (función, cron)
+TAREAS_RECURRENTES = {
+    'estatus.barrer': ('estatus.barrer', '5 0 * * *'),
+    'horarios.reconciliar': ('horarios.reconciliar', '45 3 * * *'),
+    'resumenes.reconstruir': ('resumenes.reconstruir', '30 3 * * 0'),
+    'asistencia.purgar_claves': ('asistencia.purgar_claves', '0 4 * * *'),
+    'tareas.purgar': ('tareas.purgar', '10 4 * * *'),
+    'sqlite.optimizar': ('sqlite.optimizar', '15 4 * * *'),
+    'sqlite.checkpoint': ('sqlite.checkpoint', '*/30 * * * *'),
+    'recordatorios.enviar': ('recordatorios.enviar', '0 10 * * *'),
+}
+
+def tarea(nombre):
+    """ Registra una función como tarea: @tarea('estatus.barrer') """
+    def decorador(f):
+        _funciones[nombre] = f
+        return f
+    return decorador
+
+# --- EXPRESIONES CRON ('min hora día_mes mes día_semana') ---
+
+_RANGOS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+def _campo(texto, minimo, maximo):
+    """ '*', '5', '1-5', '*/15', '8-18/2' y listas con comas -> set de valores """
+    valores = set()
+    for parte in texto.split(','):
+        base, _, paso = parte.partition('/')
+        paso = int(paso) if paso else 1
+        if base == '*':
+            inicio, fin = minimo, maximo
+        elif '-' in base:
+            inicio, fin = (int(valor) for valor in base.split('-', 1))
+        else:
+            inicio = int(base)
+            fin = maximo if paso > 1 else inicio
+        if not minimo <= inicio <= fin <= maximo or paso < 1:
+            raise ValueError(f'Campo cron fuera de rango: {parte!r}')
+        valores.update(range(inicio, fin + 1, paso))
+    return valores
+
+class Cron:
+    """ Expresión cron clásica; día de la semana 0 (o 7) = domingo """
+
+    def __init__(self, expresion):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f'Expresión cron inválida: {expresion!r} (se esperan 5 campos)')
+        try:
+            self.minutos, self.horas, self.dias, self.meses, semana = (
+                _campo(texto, *rango) for texto, rango in zip(campos, _RANGOS))
+        except ValueError as error:
+            raise ValueError(f'Expresión cron inválida: {expresion!r} ({error})')
+        self.dias_semana = {dia % 7 for dia in semana}
+        # Como en cron: si se restringen día del mes Y de la semana, basta con uno
+        self.dia_libre, self.semana_libre = campos[2] == '*', campos[4] == '*'
+
+    def _dia_valido(self, momento):
+        del_mes = momento.day in self.dias
+        de_semana = (momento.weekday() + 1) % 7 in self.dias_semana
+        if self.dia_libre or self.semana_libre:
+            return del_mes and de_semana
+        return del_mes or de_semana
+
+    def siguiente(self, desde):
+        """ Primer minuto DESPUÉS de 'desde' que cumple la expresión """
+        momento = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                momento = (momento.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia_valido(momento):
+                momento = momento.replace(hour=0, minute=0) + timedelta(days=1)
+            elif momento.hour not in self.horas:
+                momento = momento.replace(minute=0) + timedelta(hours=1)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError('La expresión cron nunca se cumple')
+
+# --- TABLA DE TAREAS ---
+
+def programar(funcion, cuando=None, max_intentos=3, **argumentos):
+    """
+    Encola una ejecución única de 'funcion' con 'argumentos' (JSON) para
+    'cuando' (hora local; por defecto ya). Retorna la Tarea. No hace commit.
+    """
+    from app.models import Tarea
+
+    if funcion not in _funciones:
+        raise ValueError(f'Tarea no registrada: {funcion}')
+    nueva = Tarea(nombre=f'{funcion}:{uuid.uuid4().hex[:12]}', funcion=funcion,
+                  argumentos=json.dumps(argumentos, default=str) if argumentos else None,
+                  proxima=cuando or datetime.now(), max_intentos=max_intentos)
+    db.session.add(nueva)
+    return nueva
+
+def sincronizar_recurrentes(ahora=None):
+    """ Crea las TAREAS_RECURRENTES que falten (no toca las existentes). Hace commit. """
+    from app.models import Tarea, _insert_con_conflicto
+
+    ahora = ahora or datetime.now()
+    filas = [{'nombre': nombre, 'funcion': funcion, 'cron': cron, 'proxima': Cron(cron).siguiente(ahora),
+              'activa': True, 'estado': 'pendiente', 'intentos': 0, 'max_intentos': 0, 'ejecuciones': 0,
+              'fallos': 0, 'creada': datetime.utcnow()}
+             for nombre, (funcion, cron) in TAREAS_RECURRENTES.items()]
+    db.session.execute(_insert_con_conflicto(Tarea).values(filas).on_conflict_do_nothing(index_elements=['nombre']))
+    db.session.commit()
+
+def vencidas(ahora, limite):
+    """ IDs de tareas activas cuya hora ya llegó y sin candado vigente, la más atrasada primero """
+    from app.models import Tarea
+
+    return [tarea_id for (tarea_id,) in db.session.query(Tarea.id).filter(
+        Tarea.activa == True, Tarea.proxima <= ahora,
+        db.or_(Tarea.bloqueada_hasta == None, Tarea.bloqueada_hasta < ahora)
+    ).order_by(Tarea.proxima).limit(limite)]
+
+def reclamar(tarea_id, identidad, ahora, segundos_candado):
+    """ Toma el candado de la tarea si nadie más lo tiene. Retorna True si fue este proceso. Hace commit. """
+    from app.models import Tarea
+
+    tomadas = Tarea.query.filter(
+        Tarea.id == tarea_id, Tarea.activa == True, Tarea.proxima <= ahora,
+        db.or_(Tarea.bloqueada_hasta == None, Tarea.bloqueada_hasta < ahora)
+    ).update({Tarea.bloqueada_por: identidad, Tarea.bloqueada_hasta: ahora + timedelta(seconds=segundos_candado),
+              Tarea.estado: 'corriendo'}, synchronize_session=False)
+    db.session.commit()
+    return tomadas == 1
+
+def ejecutar(tarea_id, identidad):
+    """
+    Corre una tarea ya reclamada y guarda su resultado. Las recurrentes pasan
+    a su siguiente hora; las de una sola vez se desactivan o, si fallan, se
+    reintentan con espera creciente hasta max_intentos.
+    """
+    from app.models import Tarea
+
+    tarea_bd = db.session.get(Tarea, tarea_id)
+    if tarea_bd is None:
+        return
+    nombre, funcion, cron = tarea_bd.nombre, tarea_bd.funcion, tarea_bd.cron
+    argumentos = json.loads(tarea_bd.argumentos) if tarea_bd.argumentos else {}
+    db.session.rollback()
+
+    inicio_reloj, inicio = datetime.now(), time.perf_counter()
+    error = None
+    try:
+        if funcion not in _funciones:
+            raise LookupError(f'Tarea no registrada en este proceso: {funcion}')
+        _funciones[funcion](**argumentos)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        log.exception('La tarea %s falló', nombre)
+    duracion = time.perf_counter() - inicio
+    registro_local.registrar(funcion, duracion, error is not None)
+
+    tarea_bd = db.session.get(Tarea, tarea_id)
+    if tarea_bd is None or tarea_bd.bloqueada_por != identidad:
+        # Se borró, o el candado venció y otro proceso la retomó
+        db.session.rollback()
+        return
+
+    ahora = datetime.now()
+    tarea_bd.ultima_ejecucion = inicio_reloj
+    tarea_bd.ultima_duracion = duracion
+    tarea_bd.ejecuciones += 1
+    tarea_bd.bloqueada_por = tarea_bd.bloqueada_hasta = None
+    if error:
+        tarea_bd.fallos += 1
+        tarea_bd.intentos += 1
+        tarea_bd.ultimo_error = error[-4000:]
+        tarea_bd.estado = 'error'
+    else:
+        tarea_bd.intentos = 0
+        tarea_bd.estado = 'ok'
+
+    if cron:
+        tarea_bd.proxima = Cron(cron).siguiente(ahora)
+    elif error and tarea_bd.intentos < tarea_bd.max_intentos:
+        tarea_bd.proxima = ahora + timedelta(minutes=2 ** (tarea_bd.intentos - 1))
+        tarea_bd.estado = 'pendiente'
+    else:
+        tarea_bd.activa = False
+    db.session.commit()
+
+# --- MÉTRICAS POR PROCESO ---
+
+class RegistroLocal:
+    def __init__(self):
+        self.por_funcion = {}   # funcion -> [ejecuciones, fallos, suma_segundos, ultima_segundos]
+        self._lock = threading.Lock()
+
+    def registrar(self, funcion, duracion, fallo):
+        with self._lock:
+            datos = self.por_funcion.setdefault(funcion, [0, 0, 0.0, 0.0])
+            datos[0] += 1
+            datos[1] += fallo
+            datos[2] += duracion
+            datos[3] = duracion
+
+registro_local = RegistroLocal()
+
+def lineas_prometheus():
+    """ Colector para app/metricas.py """
+    lineas = [
+        '# HELP swimmers_tareas_ejecuciones_total Tareas corridas por este proceso.',
+        '# TYPE swimmers_tareas_ejecuciones_total counter',
+    ]
+    datos = sorted(registro_local.por_funcion.items())
+    lineas += [f'swimmers_tareas_ejecuciones_total{{tarea="{funcion}"}} {d[0]}' for funcion, d in datos]
+    lineas += ['# HELP swimmers_tareas_fallos_total Tareas que terminaron en error.',
+               '# TYPE swimmers_tareas_fallos_total counter']
+    lineas += [f'swimmers_tareas_fallos_total{{tarea="{funcion}"}} {d[1]}' for funcion, d in datos]
+    lineas += ['# HELP swimmers_tareas_segundos_total Tiempo total corriendo cada tarea.',
+               '# TYPE swimmers_tareas_segundos_total counter']
+    lineas += [f'swimmers_tareas_segundos_total{{tarea="{funcion}"}} {d[2]:.6f}' for funcion, d in datos]
+    lineas += ['# HELP swimmers_tareas_ultima_duracion_segundos Duración de la última corrida.',
+               '# TYPE swimmers_tareas_ultima_duracion_segundos gauge']
+    lineas += [f'swimmers_tareas_ultima_duracion_segundos{{tarea="{funcion}"}} {d[3]:.6f}' for funcion, d in datos]
+    return lineas
+
+# --- HILO DEL PLANIFICADOR ---
+
+class Planificador:
+    def __init__(self, app):
+        self.app = app
+        self.hilos = app.config.get('PLANIFICADOR_HILOS', 2)
+        self.intervalo = app.config.get('PLANIFICADOR_INTERVALO', 15)
+        self.segundos_candado = app.config.get('PLANIFICADOR_CANDADO_SEGUNDOS', 600)
+        self.identidad = f'{socket.gethostname()}:{os.getpid()}'
+        self.en_curso = set()
+        self.detener = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='tarea')
+        self._hilo = threading.Thread(target=self._bucle, name='planificador', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _bucle(self):
+        sincronizada = False
+        while not self.detener.is_set():
+            try:
+                with self.app.app_context():
+                    if not sincronizada:
+                        sincronizar_recurrentes()
+                        sincronizada = True
+                    self.revisar()
+            except (OperationalError, ProgrammingError) as error:
+                # Tabla aún sin migrar, BD ocupada, etc.: se reintenta en la siguiente vuelta
+                log.warning('Planificador: %s', error.orig)
+            except Exception:
+                log.exception('Error en el planificador')
+            self.detener.wait(self.intervalo)
+
+    def revisar(self):
+        """ Reclama y lanza tantas tareas vencidas como hilos libres haya """
+        with self._lock:
+            libres = self.hilos - len(self.en_curso)
+        if libres <= 0:
+            return
+        ahora = datetime.now()
+        for tarea_id in vencidas(ahora, libres):
+            if reclamar(tarea_id, self.identidad, ahora, self.segundos_candado):
+                with self._lock:
+                    self.en_curso.add(tarea_id)
+                self._pool.submit(self._correr, tarea_id)
+
+    def _correr(self, tarea_id):
+        try:
+            with self.app.app_context():
+                ejecutar(tarea_id, self.identidad)
+        except Exception:
+            log.exception('No se pudo guardar el resultado de la tarea %s', tarea_id)
+        finally:
+            with self._lock:
+                self.en_curso.discard(tarea_id)
+
+    def parar(self, esperar=True):
+        self.detener.set()
+        self._pool.shutdown(wait=esperar)
+
+# Uno por proceso (los hilos no sobreviven a un fork: se arranca en la primera petición)
+_activo = {'pid': None, 'planificador': None}
+_lock_arranque = threading.Lock()
+
+def iniciar(app):
+    """ Arranca el planificador de este proceso si aún no corre. Retorna el Planificador. """
+    with _lock_arranque:
+        if _activo['pid'] != os.getpid():
+            _activo['planificador'] = Planificador(app).iniciar()
+            _activo['pid'] = os.getpid()
+        return _activo['planificador']
+
+# --- TAREAS DE MANTENIMIENTO ---
+
+@tarea('estatus.barrer')
+def _barrer_estatus():
+    from app.models import barrer_estatus_vencidos
+    log.info('Socios pasados a vencido: %s', barrer_estatus_vencidos())
+
+@tarea('horarios.reconciliar')
+def _reconciliar_horarios():
+    from app.models import reconciliar_ocupados, reconciliar_agendas
+    desfasados = reconciliar_ocupados(reparar=True)
+    if desfasados:
+        log.warning('Horarios con ocupados desfasado corregidos: %s', [h for h, _, _ in desfasados])
+    agendas = reconciliar_agendas(reparar=True)
+    if agendas:
+        log.warning('Agendas de socio desfasadas corregidas: %s', [s for s, _, _ in agendas])
+
+@tarea('resumenes.reconstruir')
+def _reconstruir_resumenes():
+    from app.models import reconstruir_resumenes
+    reconstruir_resumenes()
+
+@tarea('asistencia.purgar_claves')
+def _purgar_claves(dias=30):
+    from app.models import purgar_claves_procesadas
+    purgar_claves_procesadas(dias)
+
+@tarea('tareas.purgar')
+def _purgar_tareas(dias=30):
+    """ Borra las tareas de una sola vez ya terminadas hace más de 'dias' """
+    from app.models import Tarea
+    Tarea.query.filter(Tarea.cron == None, Tarea.activa == False,
+                       Tarea.ultima_ejecucion < datetime.now() - timedelta(days=dias)).delete(synchronize_session=False)
+
+@tarea('sqlite.optimizar')
+def _optimizar_sqlite():
+    from app import perfil_sqlite
+    if db.engine.dialect.name == 'sqlite':
+        perfil_sqlite.optimizar()
+
+@tarea('sqlite.checkpoint')
+def _checkpoint_sqlite():
+    from app import perfil_sqlite
+    if db.engine.dialect.name == 'sqlite':
+        perfil_sqlite.checkpoint('PASSIVE')
+
+@tarea('recordatorios.enviar')
+def _enviar_recordatorios():
+    from app.recordatorios import enviar_recordatorios
+    enviar_recordatorios()
+
+def init_app(app):
+    from app import metricas
+    if lineas_prometheus not in metricas.registro.colectores:
+        metricas.registro.colectores.append(lineas_prometheus)
+
+    if not app.config.get('PLANIFICADOR_HABILITADO') or app.testing:
+        return
+
+    # En la primera petición de cada proceso (no en 'flask db upgrade' ni en el padre de gunicorn)
+    @app.before_request
+    def arrancar_planificador():
+        if _activo['pid'] != os.getpid():
+            iniciar(app)
@@ -0,0 +1,388 @@
+import json
+import logging
+import smtplib
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from app import db
+
+# --- RECORDATORIOS DE PAGO (selección, plantillas y envío por lotes) ---
+#
+# Tres etapas, sin consultar el estatus socio por socio:
+#   1. seleccionar(): UNA consulta sobre la foto 'estatus_socio' (la misma que
+#      mantiene cada cobro) con los vencimientos de mensualidad o anualidad
+#      dentro de la ventana [-RECORDATORIOS_DIAS_VENCIDO, +RECORDATORIOS_DIAS_AVISO]
+#      días, sin los que ya se avisaron (tabla 'recordatorio').
+#   2. renderizar(): las plantillas de templates/recordatorios se compilan una
+#      vez y se llenan en memoria (la tarifa sale de app/catalogos.py).
+#   3. despachar(): un pool de RECORDATORIOS_HILOS hilos manda los mensajes
+#      por el transporte configurado (SMTP o webhook para WhatsApp/SMS),
+#      limitado a RECORDATORIOS_POR_SEGUNDO y con reintentos ante errores
+#      temporales. El resultado de cada lote se guarda antes de pasar al
+#      siguiente: si el proceso muere, a lo más se repite un lote.
+#
+# Cada vencimiento se avisa una vez antes ('por_vencer') y una vez después
+# ('vencido'). Los fallos temporales se reintentan en la siguiente corrida
+# hasta RECORDATORIOS_MAX_INTENTOS; los rechazos definitivos (buzón inexistente,
+# 4xx del webhook) no.
+
+log = logging.getLogger(__name__)
+
+Candidato = namedtuple('Candidato', 'socio_id nombre folio nivel membresia_id destino concepto vence motivo')
+Mensaje = namedtuple('Mensaje', 'clave destino asunto cuerpo')  # clave = (socio_id, concepto, vence, motivo)
+Resultado = namedtuple('Resultado', 'mensaje estado intentos error')
+
+class ErrorEnvio(Exception):
+    """ Falla al entregar un mensaje; 'permanente' = no tiene caso reintentar """
+
+    def __init__(self, mensaje, permanente=False):
+        super().__init__(mensaje)
+        self.permanente = permanente
+
+# --- ETAPA 1: SELECCIÓN ---
+
+def _candidatos_de(concepto, vence, ahora, desde, hasta, destino, max_intentos):
+    from app.models import EstatusSocio, Socio, Recordatorio
+
+    motivo = db.case((vence > ahora, 'por_vencer'), else_='vencido')
+    ya_avisado = db.select(Recordatorio.socio_id).where(
+        Recordatorio.socio_id == EstatusSocio.socio_id,
+        Recordatorio.concepto == concepto,
+        Recordatorio.vence == vence,
+        Recordatorio.motivo == motivo,
+        db.or_(Recordatorio.estado.in_(('enviado', 'rechazado')), Recordatorio.intentos >= max_intentos)
+    ).exists()
+
+    return db.select(
+        EstatusSocio.socio_id, Socio.nombre_completo, Socio.folio, Socio.nivel, Socio.membresia_id,
+        destino.label('destino'), db.literal(concepto).label('concepto'), vence.label('vence'), motivo.label('motivo')
+    ).join(Socio, Socio.id == EstatusSocio.socio_id)\
+     .where(vence > desde, vence <= hasta, destino.isnot(None), destino != '', ~ya_avisado)
+
+def seleccionar(ahora=None, dias_aviso=3, dias_vencido=30, campo_destino='email', max_intentos=3):
+    """
+    Socios con mensualidad o anualidad por vencer (próximos 'dias_aviso' días)
+    o vencida hace menos de 'dias_vencido' días que aún no tienen su aviso.
+    Una sola consulta (UNION ALL por índice de cada vencimiento). Retorna [Candidato].
+    """
+    from app.models import EstatusSocio, Socio
+
+    ahora = ahora or datetime.now()
+    desde, hasta = ahora - timedelta(days=dias_vencido), ahora + timedelta(days=dias_aviso)
+    destino = getattr(Socio, campo_destino)
+
+    consulta = db.union_all(
+        _candidatos_de('Mensualidad', EstatusSocio.vence_mensualidad, ahora, desde, hasta, destino, max_intentos),
+        _candidatos_de('Anualidad', EstatusSocio.vence_anualidad, ahora, desde, hasta, destino, max_intentos),
+    )
+    return [Candidato(*fila) for fila in db.session.execute(consulta)]
+
+# --- ETAPA 2: PLANTILLAS ---
+
+ASUNTOS = {
+    'por_vencer': 'Tu {concepto} vence el {vence:%d/%m/%Y}',
+    'vencido': 'Tu {concepto} está vencida desde el {vence:%d/%m/%Y}',
+}
+
+def renderizar(candidatos, plantilla='recordatorios/correo.txt', ahora=None):
+    """ Llena la plantilla (compilada una vez) para cada candidato. Retorna [Mensaje]. """
+    from app import catalogos
+
+    ahora = ahora or datetime.now()
+    compilada = current_app.jinja_env.get_template(plantilla)
+    tarifas = catalogos.obtener().tarifas
+
+    mensajes = []
+    for c in candidatos:
+        tarifa = tarifas.get((c.membresia_id, c.nivel))
+        monto = None
+        if tarifa:
+            monto = tarifa.costo_mensual if c.concepto == 'Mensualidad' else tarifa.costo_anualidad
+        contexto = dict(c._asdict(), concepto=c.concepto.lower(), monto=monto, dias=abs((c.vence - ahora).days))
+        mensajes.append(Mensaje(clave=(c.socio_id, c.concepto, c.vence, c.motivo), destino=c.destino,
+                                asunto=ASUNTOS[c.motivo].format(**contexto), cuerpo=compilada.render(**contexto)))
+    return mensajes
+
+# --- ETAPA 3: TRANSPORTES ---
+
+class TransporteSMTP:
+    """ Correo por SMTP; una conexión abierta por hilo (se reabre si el servidor la cierra) """
+    canal = 'correo'
+    campo_destino = 'email'
+    plantilla = 'recordatorios/correo.txt'
+
+    def __init__(self, host, puerto=25, usuario=None, password=None, tls=False, remitente=None, timeout=10):
+        self.host, self.puerto, self.timeout = host, puerto, timeout
+        self.usuario, self.password, self.tls = usuario, password, tls
+        self.remitente = remitente or f'no-responder@{host}'
+        self._local = threading.local()
+        self._abiertas = []
+        self._lock = threading.Lock()
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = smtplib.SMTP(self.host, self.puerto, timeout=self.timeout)
+            if self.tls:
+                conexion.starttls()
+            if self.usuario:
+                conexion.login(self.usuario, self.password)
+            self._local.conexion = conexion
+            with self._lock:
+                self._abiertas.append(conexion)
+        return conexion
+
+    def _descartar(self):
+        conexion = getattr(self._local, 'conexion', None)
+        self._local.conexion = None
+        if conexion is not None:
+            with self._lock:
+                if conexion in self._abiertas:
+                    self._abiertas.remove(conexion)
+            try:
+                conexion.close()
+            except OSError:
+                pass
+
+    def enviar(self, mensaje):
+        correo = EmailMessage()
+        correo['From'] = self.remitente
+        correo['To'] = mensaje.destino
+        correo['Subject'] = mensaje.asunto
+        correo.set_content(mensaje.cuerpo)
+        try:
+            self._conexion().send_message(correo)
+        except smtplib.SMTPRecipientsRefused as error:
+            codigos = [codigo for codigo, _ in error.recipients.values()]
+            raise ErrorEnvio(f'Destinatario rechazado: {error.recipients}', permanente=min(codigos) >= 500)
+        except smtplib.SMTPResponseException as error:
+            if error.smtp_code == 421:  # El servidor va a cerrar la conexión
+                self._descartar()
+            raise ErrorEnvio(f'SMTP {error.smtp_code}: {error.smtp_error!r}', permanente=error.smtp_code >= 500)
+        except (smtplib.SMTPServerDisconnected, OSError) as error:
+            self._descartar()
+            raise ErrorEnvio(f'Conexión SMTP: {error}')
+
+    def cerrar(self):
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for conexion in abiertas:
+            try:
+                conexion.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+class TransporteWebhook:
+    """ POST JSON {telefono, mensaje, clave} a una pasarela de WhatsApp/SMS """
+    canal = 'webhook'
+    campo_destino = 'telefono'
+    plantilla = 'recordatorios/mensaje.txt'
+
+    def __init__(self, url, token=None, timeout=10):
+        self.url, self.token, self.timeout = url, token, timeout
+
+    def enviar(self, mensaje):
+        socio_id, concepto, vence, motivo = mensaje.clave
+        cuerpo = json.dumps({'telefono': mensaje.destino, 'mensaje': mensaje.cuerpo,
+                             'clave': f'{socio_id}:{concepto}:{vence:%Y%m%d}:{motivo}'}).encode()
+        encabezados = {'Content-Type': 'application/json'}
+        if self.token:
+            encabezados['Authorization'] = f'Bearer {self.token}'
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url, cuerpo, encabezados),
+                                        timeout=self.timeout) as respuesta:
+                respuesta.read()
+        except urllib.error.HTTPError as error:
+            # 429 y 5xx son pasajeros; cualquier otro 4xx no cambiará al reintentar
+            raise ErrorEnvio(f'Webhook HTTP {error.code}', permanente=error.code < 500 and error.code != 429)
+        except (urllib.error.URLError, OSError) as error:
+            raise ErrorEnvio(f'Webhook: {error}')
+
+    def cerrar(self):
+        pass
+
+class TransporteRegistro:
+    """ No envía nada: escribe en el log y guarda los mensajes (desarrollo) """
+    canal = 'registro'
+    campo_destino = 'email'
+    plantilla = 'recordatorios/correo.txt'
+
+    def __init__(self):
+        self.enviados = []
+        self._lock = threading.Lock()
+
+    def enviar(self, mensaje):
+        log.info('Recordatorio para %s: %s', mensaje.destino, mensaje.asunto)
+        with self._lock:
+            self.enviados.append(mensaje)
+
+    def cerrar(self):
+        pass
+
+def crear_transporte(config, nombre=None):
+    """ Transporte según RECORDATORIOS_TRANSPORTE (o 'nombre'); None si no hay ninguno configurado """
+    nombre = nombre or config.get('RECORDATORIOS_TRANSPORTE')
+    if not nombre:
+        return None
+    if nombre == 'smtp':
+        return TransporteSMTP(config['SMTP_HOST'], config.get('SMTP_PUERTO', 25), config.get('SMTP_USUARIO'),
+                              config.get('SMTP_PASSWORD'), config.get('SMTP_TLS', False), config.get('SMTP_REMITENTE'))
+    if nombre == 'webhook':
+        return TransporteWebhook(config['RECORDATORIOS_WEBHOOK_URL'], config.get('RECORDATORIOS_WEBHOOK_TOKEN'))
+    if nombre == 'registro':
+        return TransporteRegistro()
+    raise ValueError(f'Transporte de recordatorios desconocido: {nombre}')
+
+# --- ETAPA 3: DESPACHO ---
+
+class LimiteTasa:
+    """ Cubeta de fichas compartida por los hilos: 'por_segundo' envíos sostenidos, ráfagas de 'rafaga' """
+
+    def __init__(self, por_segundo, rafaga=None):
+        self.por_segundo = por_segundo
+        self.rafaga = rafaga or max(1, int(por_segundo))
+        self.fichas = float(self.rafaga)
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        if not self.por_segundo:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.fichas = min(self.rafaga, self.fichas + (ahora - self.ultimo) * self.por_segundo)
+                self.ultimo = ahora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                falta = (1 - self.fichas) / self.por_segundo
+            time.sleep(falta)
+
+def _entregar(transporte, limite, mensaje, reintentos, espera_base):
+    for intento in range(1, reintentos + 2):
+        limite.esperar()
+        try:
+            transporte.enviar(mensaje)
+            return Resultado(mensaje, 'enviado', intento, None)
+        except ErrorEnvio as error:
+            if error.permanente:
+                return Resultado(mensaje, 'rechazado', intento, str(error))
+            if intento > reintentos:
+                return Resultado(mensaje, 'fallido', intento, str(error))
+            time.sleep(espera_base * 2 ** (intento - 1))
+        except Exception as error:
+            log.exception('Error inesperado enviando a %s', mensaje.destino)
+            return Resultado(mensaje, 'fallido', intento, repr(error))
+
+def despachar(mensajes, transporte, pool, limite, reintentos=2, espera_base=0.5):
+    """ Envía los mensajes en paralelo. Retorna [Resultado] en el mismo orden. """
+    return list(pool.map(lambda mensaje: _entregar(transporte, limite, mensaje, reintentos, espera_base), mensajes))
+
+def registrar(resultados, canal):
+    """ Guarda el resultado de cada aviso (upsert: los intentos se acumulan). No hace commit. """
+    from app.models import Recordatorio, _insert_con_conflicto
+
+    if not resultados:
+        return
+    ahora = datetime.utcnow()
+    filas = [{'socio_id': r.mensaje.clave[0], 'concepto': r.mensaje.clave[1], 'vence': r.mensaje.clave[2],
+              'motivo': r.mensaje.clave[3], 'canal': canal, 'destino': r.mensaje.destino, 'estado': r.estado,
+              'intentos': r.intentos, 'ultimo_error': r.error, 'actualizado': ahora} for r in resultados]
+    stmt = _insert_con_conflicto(Recordatorio)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['socio_id', 'concepto', 'vence', 'motivo'],
+        set_={'canal': stmt.excluded.canal, 'destino': stmt.excluded.destino, 'estado': stmt.excluded.estado,
+              'intentos': Recordatorio.intentos + stmt.excluded.intentos,
+              'ultimo_error': stmt.excluded.ultimo_error, 'actualizado': stmt.excluded.actualizado}
+    )
+    db.session.execute(stmt, filas)
+
+# --- MÉTRICAS POR PROCESO ---
+
+class Estadisticas:
+    def __init__(self):
+        self.por_estado = {}   # (canal, estado) -> mensajes
+        self._lock = threading.Lock()
+
+    def registrar(self, canal, resultados):
+        with self._lock:
+            for r in resultados:
+                self.por_estado[(canal, r.estado)] = self.por_estado.get((canal, r.estado), 0) + 1
+
+estadisticas = Estadisticas()
+
+def lineas_prometheus():
+    """ Colector para app/metricas.py """
+    lineas = [
+        '# HELP swimmers_recordatorios_total Recordatorios de pago procesados por este proceso.',
+        '# TYPE swimmers_recordatorios_total counter',
+    ]
+    lineas += [f'swimmers_recordatorios_total{{canal="{canal}",estado="{estado}"}} {total}'
+               for (canal, estado), total in sorted(estadisticas.por_estado.items())]
+    return lineas
+
+# --- PUNTO DE ENTRADA ---
+
+def enviar_recordatorios(ahora=None, transporte=None, simular=False, progreso=None):
+    """
+    Corre las tres etapas por lotes de RECORDATORIOS_LOTE y hace commit de la
+    bitácora después de cada lote. Con simular=True solo selecciona y
+    renderiza. Retorna {'candidatos', 'enviado', 'fallido', 'rechazado', 'segundos'}
+    o None si no hay transporte configurado.
+    """
+    config = current_app.config
+    transporte = transporte or crear_transporte(config)
+    if transporte is None:
+        log.info('Recordatorios sin transporte (RECORDATORIOS_TRANSPORTE vacío): no se envía nada')
+        return None
+
+    inicio = time.perf_counter()
+    ahora = ahora or datetime.now()
+    candidatos = seleccionar(ahora, config.get('RECORDATORIOS_DIAS_AVISO', 3),
+                             config.get('RECORDATORIOS_DIAS_VENCIDO', 30), transporte.campo_destino,
+                             config.get('RECORDATORIOS_MAX_INTENTOS', 3))
+    db.session.rollback()  # No retener la lectura mientras se envía
+
+    resumen = {'candidatos': len(candidatos), 'enviado': 0, 'fallido': 0, 'rechazado': 0}
+    tamano_lote = config.get('RECORDATORIOS_LOTE', 500)
+    limite = LimiteTasa(config.get('RECORDATORIOS_POR_SEGUNDO', 0))
+
+    with ThreadPoolExecutor(max_workers=config.get('RECORDATORIOS_HILOS', 8),
+                            thread_name_prefix='recordatorio') as pool:
+        try:
+            for i in range(0, len(candidatos), tamano_lote):
+                mensajes = renderizar(candidatos[i:i + tamano_lote], transporte.plantilla, ahora)
+                if simular:
+                    if progreso:
+                        progreso(mensajes)
+                    continue
+
+                resultados = despachar(mensajes, transporte, pool, limite, config.get('RECORDATORIOS_REINTENTOS', 2),
+                                       config.get('RECORDATORIOS_ESPERA_BASE', 0.5))
+                registrar(resultados, transporte.canal)
+                db.session.commit()
+
+                estadisticas.registrar(transporte.canal, resultados)
+                for r in resultados:
+                    resumen[r.estado] += 1
+                if progreso:
+                    progreso(resultados)
+        finally:
+            transporte.cerrar()
+
+    resumen['segundos'] = time.perf_counter() - inicio
+    if not simular:
+        log.info('Recordatorios: %s', resumen)
+    return resumen
+
+def init_app(app):
+    from app import metricas
+    if lineas_prometheus not in metricas.registro.colectores:
+        metricas.registro.colectores.append(lineas_prometheus)
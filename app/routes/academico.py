@@ -1,10 +1,17 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, flash, request
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Socio, Horario, Inscripcion
+from app.models import (Socio, Horario, Inscripcion, AgendaSocio, DIAS_SEMANA, estatus_financiero_bulk,
+                        inscribir_socio, liberar_dia_de_agenda, reconciliar_agendas)
+from app.instrumentacion import presupuesto_consultas
+from app.cache import agenda_cache, fragmento
 from flask_login import login_required
 
 academico_bp = Blueprint('academico', __name__, url_prefix='/academico')
 
+log = logging.getLogger(__name__)
+
 # --- FUNCIONES DE AYUDA (VALIDACIONES) ---
 
 def validar_reglas_dia(socio_id, nuevo_horario):
@@ -12,29 +19,76 @@ def validar_reglas_dia(socio_id, nuevo_horario):
     Valida que el socio no tenga YA una clase ese mismo día.
     Retorna: (True, "OK") o (False, "Mensaje de Error")
     """
-    # Obtenemos todas las clases activas del socio
-    inscripciones_activas = Inscripcion.query.filter_by(socio_id=socio_id, activo=True).all()
-    
-    for insc in inscripciones_activas:
-        existente = insc.horario
-        
-        # --- NUEVA LÓGICA ESTRICTA ---
-        # Si el día de la nueva clase es igual al día de una clase que ya tiene...
-        if existente.dia_semana == nuevo_horario.dia_semana:
-            # ... Bloqueamos la inscripción inmediatamente.
-            return False, f"El socio ya tiene una clase registrada los {existente.dia_semana} ({existente.hora_inicio.strftime('%H:%M')}). Debe darla de baja primero si desea cambiar el horario."
+    # Buscamos directamente una clase activa del socio ese mismo día (una sola consulta)
+    existente = Horario.query.join(Inscripcion, Inscripcion.horario_id == Horario.id)\
+        .filter(Inscripcion.socio_id == socio_id, Inscripcion.activo == True,
+                Horario.dia_semana == nuevo_horario.dia_semana).first()
+
+    # --- NUEVA LÓGICA ESTRICTA ---
+    # Si ya tiene una clase ese día, bloqueamos la inscripción inmediatamente.
+    if existente:
+        return False, f"El socio ya tiene una clase registrada los {existente.dia_semana} ({existente.hora_inicio.strftime('%H:%M')}). Debe darla de baja primero si desea cambiar el horario."
             
     return True, "OK"
 
+def sugerir_alternativas(agenda, agenda_socio, horario_id, limite=3):
+    """
+    Mejores clases del nivel para quien no pudo entrar a 'horario_id' (llena
+    o en un día ya ocupado): con cupo, en días libres del socio, primero las
+    de más lugares libres y, a igual cupo, las más cercanas en hora.
+    Solo usa la agenda cacheada y el bitmap del socio (sin consultas).
+    """
+    pedido = next((h for horarios in agenda.values() for h in horarios if h['id'] == horario_id), None)
+
+    def minutos(hora):
+        return hora.hour * 60 + hora.minute
+
+    candidatos = []
+    for dia, horarios in agenda.items():
+        if agenda_socio is not None and agenda_socio.tiene_dia(dia):
+            continue
+        for h in horarios:
+            if h['id'] != horario_id and h['disponibles'] > 0:
+                distancia = abs(minutos(h['hora_inicio']) - minutos(pedido['hora_inicio'])) if pedido else 0
+                candidatos.append((-h['disponibles'], distancia, DIAS_SEMANA.index(dia), dict(h, dia_semana=dia)))
+
+    candidatos.sort(key=lambda c: c[:3])
+    return [c[3] for c in candidatos[:limite]]
+
 # --- RUTAS ---
 
+def agenda_de_nivel(nivel):
+    """
+    Horarios de un nivel agrupados por día con su cupo. Son datos planos
+    (no objetos del ORM) para poder compartirlos entre peticiones.
+    """
+    def calcular():
+        # Filtramos: Solo horarios del nivel del socio (Niño vs Adulto)
+        horarios_disponibles = Horario.query.filter_by(nivel=nivel).order_by(Horario.hora_inicio).all()
+
+        # Agrupar por día
+        agenda = {dia: [] for dia in DIAS_SEMANA}
+
+        for h in horarios_disponibles:
+            if h.dia_semana in agenda:
+                agenda[h.dia_semana].append({
+                    'id': h.id,
+                    'hora_inicio': h.hora_inicio,
+                    'hora_fin': h.hora_fin,
+                    'disponibles': h.cupos_disponibles()
+                })
+        return agenda
+
+    return fragmento(agenda_cache, 'agenda', ('inscribir', nivel), calcular)
+
 @academico_bp.route('/inscribir/<int:socio_id>', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(10)
 def inscribir(socio_id):
-    socio = Socio.query.get_or_404(socio_id)
+    socio = Socio.query.options(joinedload(Socio.membresia)).get_or_404(socio_id)
     
     # --- NUEVA VALIDACIÓN DE ESTATUS ---
-    es_activo, mensaje_estatus, _ = socio.get_estatus_financiero()
+    es_activo, mensaje_estatus, _ = estatus_financiero_bulk([socio.id])[socio.id]
 
     # PROCESAR INSCRIPCIÓN (POST)
     if request.method == 'POST':
@@ -42,30 +96,35 @@ def inscribir(socio_id):
         if not es_activo:
             flash(f'⛔ BLOQUEO: No se puede inscribir. {mensaje_estatus}.', 'danger')
             return redirect(url_for('academico.inscribir', socio_id=socio.id))
-        horario_id = request.form.get('horario_id')
-        horario = Horario.query.get(horario_id)
-        
-        # 1. Validar Cupo
-        if horario.cupos_disponibles() <= 0:
-            flash('Error: La clase seleccionada ya está llena.', 'danger')
-            return redirect(url_for('academico.inscribir', socio_id=socio.id))
+        horario_id = request.form.get('horario_id', type=int)
 
-        # 2. Validar Membresía (Límite de clases)
-        clases_actuales = Inscripcion.query.filter_by(socio_id=socio.id, activo=True).count()
-        if clases_actuales >= socio.membresia.clases_por_semana:
-            flash(f'Error: El plan {socio.membresia.nombre} solo permite {socio.membresia.clases_por_semana} clases.', 'warning')
-            return redirect(url_for('academico.inscribir', socio_id=socio.id))
-
-        # 3. Validar Regla de "Una clase por día"
-        es_valido, msg = validar_reglas_dia(socio.id, horario) # <--- Usar la nueva función
-        
-        if not es_valido:
-            flash(f'Error: {msg}', 'danger')
-            return redirect(url_for('academico.inscribir', socio_id=socio.id))
+        # Cupo, límite del plan y "una clase por día" se validan dentro del
+        # mismo INSERT/UPDATE condicionado (sin lecturas previas que puedan
+        # quedar viejas si otra recepción inscribe al mismo tiempo)
+        plan, limite = socio.membresia.nombre, socio.membresia.clases_por_semana
+        resultado = inscribir_socio(socio.id, horario_id, limite)
+        if resultado != 'ok':
+            db.session.rollback()
+            if resultado == 'inexistente':
+                flash('Error: La clase seleccionada no existe.', 'danger')
+            elif resultado == 'lleno':
+                flash('Error: La clase seleccionada ya está llena.', 'danger')
+            elif resultado == 'limite':
+                flash(f'Error: El plan {plan} solo permite {limite} clases.', 'warning')
+            else:
+                libre, msg = validar_reglas_dia(socio_id, Horario.query.get(horario_id))
+                if libre:
+                    # El bitmap marcaba el día ocupado sin una clase activa que lo respalde
+                    desfasada = reconciliar_agendas(reparar=True, socio_ids=[socio_id])
+                    db.session.commit()
+                    log.warning('Agenda desfasada del socio %s corregida al inscribir: %s', socio_id, desfasada)
+                    msg = 'La agenda del socio estaba desfasada y ya se corrigió. Intenta inscribirlo de nuevo.'
+                flash(f'Error: {msg}', 'danger')
+            if resultado in ('lleno', 'mismo_dia'):
+                # La página muestra las mejores clases alternativas a la pedida
+                return redirect(url_for('academico.inscribir', socio_id=socio_id, alternativas_a=horario_id))
+            return redirect(url_for('academico.inscribir', socio_id=socio_id))
 
-        # SI PASA TODO -> GUARDAR
-        nueva_inscripcion = Inscripcion(socio_id=socio.id, horario_id=horario.id)
-        db.session.add(nueva_inscripcion)
         db.session.commit()
         
         flash('Inscripción realizada correctamente.', 'success')
@@ -73,28 +132,38 @@ def inscribir(socio_id):
 
     # MOSTRAR CALENDARIO DE SELECCIÓN (GET)
     # 1. Obtener clases actuales ACTIVAS para mostrarlas arriba
-    clases_actuales = Inscripcion.query.filter_by(socio_id=socio.id, activo=True).all()
+    clases_actuales = Inscripcion.query.filter_by(socio_id=socio.id, activo=True)\
+        .options(joinedload(Inscripcion.horario)).all()
 
-    # Filtramos: Solo horarios del nivel del socio (Niño vs Adulto)
-    horarios_disponibles = Horario.query.filter_by(nivel=socio.nivel).order_by(Horario.hora_inicio).all()
-    
-    # Agrupar por día (similar al paso 5, pero filtrado)
-    orden_dias = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
-    agenda = {dia: [] for dia in orden_dias}
-    
-    for h in horarios_disponibles:
-        if h.dia_semana in agenda:
-            agenda[h.dia_semana].append(h)
-            
-    return render_template('academico/inscribir.html', socio=socio, agenda=agenda, clases_actuales=clases_actuales)
+    # 2. Agenda del nivel del socio (cacheada por versión de horarios/inscripciones)
+    agenda = agenda_de_nivel(socio.nivel)
+
+    # 3. Días ocupados y clases del socio (bitmap) para marcar la agenda y sugerir
+    agenda_socio = db.session.get(AgendaSocio, socio.id)
+    dias_ocupados = agenda_socio.dias_ocupados() if agenda_socio else []
+    total_clases = agenda_socio.clases if agenda_socio else 0
+
+    alternativas_a = request.args.get('alternativas_a', type=int)
+    alternativas = []
+    if alternativas_a and total_clases < socio.membresia.clases_por_semana:
+        alternativas = sugerir_alternativas(agenda, agenda_socio, alternativas_a)
+
+    return render_template('academico/inscribir.html', socio=socio, agenda=agenda, clases_actuales=clases_actuales,
+                           dias_ocupados=dias_ocupados, total_clases=total_clases,
+                           alternativas_a=alternativas_a, alternativas=alternativas)
 
 @academico_bp.route('/baja/<int:inscripcion_id>')
 @login_required
+@presupuesto_consultas(7)
 def baja(inscripcion_id):
     inscripcion = Inscripcion.query.get_or_404(inscripcion_id)
     
-    # Marcamos como inactivo (libera cupo inmediatamente gracias a la lógica de modelos)
-    inscripcion.activo = False
+    # Marcamos como inactivo SOLO si seguía activa (evita liberar dos veces con doble clic)
+    dada_de_baja = Inscripcion.query.filter_by(id=inscripcion.id, activo=True)\
+        .update({Inscripcion.activo: False}, synchronize_session=False)
+    if dada_de_baja:
+        Horario.liberar_lugar(inscripcion.horario_id)
+        liberar_dia_de_agenda(inscripcion.socio_id, inscripcion.horario_id)
     db.session.commit()
     
     flash('Clase cancelada. El cupo ha sido liberado.', 'info')
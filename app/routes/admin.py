@@ -1,9 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app, abort, Response
 from flask_login import login_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Horario, Tarifa, User, Membresia, Nivel
+from app.models import Horario, Tarifa, User, Membresia, Nivel, Tarea
 from app.forms import HorarioForm, TarifaForm, MembresiaForm, NivelForm
 from app.decorators import admin_required
+from app.instrumentacion import presupuesto_consultas
+from app.metricas import registro as registro_metricas
+from app.cache import agenda_cache, fragmento
+from app import catalogos
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -11,22 +18,66 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 @admin_bp.route('/')
 @login_required
 @admin_required
+@presupuesto_consultas(1)
 def dashboard():
     return render_template('admin/dashboard.html')
 
+# --- MÉTRICAS (Prometheus) ---
+@admin_bp.route('/metricas')
+@login_required
+@admin_required
+@presupuesto_consultas(1)
+def metricas():
+    if not current_app.config.get('METRICAS_HABILITADAS'):
+        abort(404)
+    return Response(registro_metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- TAREAS EN SEGUNDO PLANO (ver app/planificador.py) ---
+@admin_bp.route('/tareas')
+@login_required
+@admin_required
+@presupuesto_consultas(2)
+def tareas():
+    # Recurrentes primero, luego las de una sola vez (las 100 más recientes en total)
+    lista = Tarea.query.order_by(Tarea.cron == None, Tarea.activa.desc(), Tarea.proxima.desc()).limit(100).all()
+    return render_template('admin/tareas_lista.html', tareas=lista, ahora=datetime.now())
+
+@admin_bp.route('/tareas/<int:id>/ejecutar', methods=['POST'])
+@login_required
+@admin_required
+@presupuesto_consultas(3)
+def ejecutar_tarea(id):
+    # No corre aquí: se adelanta su hora y la toma el planificador en su siguiente revisión
+    tarea = Tarea.query.get_or_404(id)
+    nombre = tarea.nombre  # Leído antes del commit (después el objeto expira)
+    tarea.proxima = datetime.now()
+    tarea.activa = True
+    db.session.commit()
+    flash(f'La tarea {nombre} correrá en la siguiente revisión del planificador.', 'info')
+    return redirect(url_for('admin.tareas'))
+
+@admin_bp.route('/tareas/<int:id>/pausar', methods=['POST'])
+@login_required
+@admin_required
+@presupuesto_consultas(3)
+def pausar_tarea(id):
+    tarea = Tarea.query.get_or_404(id)
+    nombre, activa = tarea.nombre, not tarea.activa
+    tarea.activa = activa
+    db.session.commit()
+    flash(f"Tarea {nombre} {'reanudada' if activa else 'pausada'}.", 'info')
+    return redirect(url_for('admin.tareas'))
+
 # --- GESTIÓN DE HORARIOS ---
 @admin_bp.route('/horarios', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(4)
 def horarios():
-    # Lista de horarios existentes
-    lista_horarios = Horario.query.order_by(Horario.dia_semana, Horario.hora_inicio).all()
-    
     # Formulario para crear nuevo
     form = HorarioForm()
     # --- CARGA DINÁMICA DE NIVELES ---
-    niveles_db = Nivel.query.order_by(Nivel.orden).all()
-    form.nivel.choices = [(n.nombre, n.nombre) for n in niveles_db]
+    form.nivel.choices = catalogos.opciones_niveles()
     # ---------------------------------
     if form.validate_on_submit():
         h = Horario(
@@ -41,11 +92,18 @@ def horarios():
         flash('Nuevo horario agregado correctamente.', 'success')
         return redirect(url_for('admin.horarios'))
         
-    return render_template('admin/horarios.html', horarios=lista_horarios, form=form)
+    # Lista de horarios existentes (tabla cacheada por versión de la agenda)
+    tabla_html = fragmento(agenda_cache, 'agenda', 'admin_horarios', lambda: render_template(
+        'admin/_tabla_horarios.html',
+        horarios=Horario.query.order_by(Horario.dia_semana, Horario.hora_inicio).all()
+    ))
+
+    return render_template('admin/horarios.html', tabla_html=tabla_html, form=form)
 
 @admin_bp.route('/horarios/borrar/<int:id>')
 @login_required
 @admin_required
+@presupuesto_consultas(7, cargas_perezosas=1) # El ORM revisa 'asistencias' antes de borrar
 def borrar_horario(id):
     h = Horario.query.get_or_404(id)
     
@@ -64,46 +122,52 @@ def borrar_horario(id):
 @admin_bp.route('/tarifas')
 @login_required
 @admin_required
+@presupuesto_consultas(2)
 def tarifas():
     # Mostrar todas las tarifas
-    lista_tarifas = Tarifa.query.all()
+    lista_tarifas = Tarifa.query.options(joinedload(Tarifa.membresia)).all()
     return render_template('admin/tarifas_lista.html', tarifas=lista_tarifas)
 
 @admin_bp.route('/tarifas/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(6)
 def editar_tarifa(id):
-    tarifa = Tarifa.query.get_or_404(id)
+    tarifa = Tarifa.query.options(joinedload(Tarifa.membresia)).get_or_404(id)
     form = TarifaForm(obj=tarifa) # Pre-llenar datos
 
     # --- CARGA DINÁMICA DE NIVELES ---
-    niveles_db = Nivel.query.order_by(Nivel.orden).all()
-    form.nivel.choices = [(n.nombre, n.nombre) for n in niveles_db]
+    form.nivel.choices = catalogos.opciones_niveles()
     # ---------------------------------
 
-    form.membresia_id.choices = [(m.id, m.nombre) for m in Membresia.query.all()]
+    form.membresia_id.choices = catalogos.opciones_membresias()
     
     if form.validate_on_submit():
         form.populate_obj(tarifa) # Guardar cambios
-        db.session.commit()
-        flash('Precios actualizados.', 'success')
-        return redirect(url_for('admin.tarifas'))
+        try:
+            db.session.commit()
+            flash('Precios actualizados.', 'success')
+            return redirect(url_for('admin.tarifas'))
+        except IntegrityError:
+            # Índice único (membresia_id, nivel): ya existe otra tarifa igual
+            db.session.rollback()
+            flash(f'Error: Ya existe una tarifa para {form.nivel.data} en ese plan.', 'danger')
         
     return render_template('admin/tarifa_editar.html', form=form, tarifa=tarifa)
 
 @admin_bp.route('/tarifas/nueva', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(5)
 def nueva_tarifa():
     form = TarifaForm()
 
     # --- CARGA DINÁMICA DE NIVELES ---
-    niveles_db = Nivel.query.order_by(Nivel.orden).all()
-    form.nivel.choices = [(n.nombre, n.nombre) for n in niveles_db]
+    form.nivel.choices = catalogos.opciones_niveles()
     # ---------------------------------
     
     # Cargar las membresías en el select dinámicamente
-    form.membresia_id.choices = [(m.id, m.nombre) for m in Membresia.query.all()]
+    form.membresia_id.choices = catalogos.opciones_membresias()
     
     if form.validate_on_submit():
         # 1. VALIDACIÓN DE DUPLICADOS
@@ -136,6 +200,7 @@ def nueva_tarifa():
 @admin_bp.route('/membresias')
 @login_required
 @admin_required
+@presupuesto_consultas(2)
 def membresias():
     lista = Membresia.query.order_by(Membresia.clases_por_semana).all()
     return render_template('admin/membresias_lista.html', membresias=lista)
@@ -143,6 +208,7 @@ def membresias():
 @admin_bp.route('/membresias/nueva', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def nueva_membresia():
     form = MembresiaForm()
     if form.validate_on_submit():
@@ -160,6 +226,7 @@ def nueva_membresia():
 @admin_bp.route('/membresias/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(4)
 def editar_membresia(id):
     plan = Membresia.query.get_or_404(id)
     form = MembresiaForm(obj=plan)
@@ -177,6 +244,7 @@ def editar_membresia(id):
 @admin_bp.route('/niveles')
 @login_required
 @admin_required
+@presupuesto_consultas(2)
 def niveles():
     lista = Nivel.query.order_by(Nivel.orden).all()
     return render_template('admin/niveles_lista.html', niveles=lista)
@@ -184,6 +252,7 @@ def niveles():
 @admin_bp.route('/niveles/nuevo', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def nuevo_nivel():
     form = NivelForm()
     if form.validate_on_submit():
@@ -197,6 +266,7 @@ def nuevo_nivel():
 @admin_bp.route('/niveles/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(8)
 def editar_nivel(id):
     nivel_obj = Nivel.query.get_or_404(id)
     nombre_original = nivel_obj.nombre # Guardamos el nombre viejo
@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, request, jsonify
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Horario, Asistencia, Inscripcion, Socio
-from datetime import datetime
+from app.models import (Horario, Asistencia, Inscripcion, MarcaProcesada, estatus_financiero_bulk,
+                        upsert_asistencias, registrar_claves_procesadas)
+from datetime import datetime, date, timezone
+from app.instrumentacion import presupuesto_consultas
 from flask_login import login_required
 
 asistencia_bp = Blueprint('asistencia', __name__, url_prefix='/asistencia')
@@ -17,6 +20,7 @@ def obtener_dia_actual_espanol():
 # --- VISTA 1: DASHBOARD (Clases del día) ---
 @asistencia_bp.route('/')
 @login_required
+@presupuesto_consultas(2)
 def hoy():
     dia_hoy = obtener_dia_actual_espanol()
     
@@ -31,11 +35,13 @@ def hoy():
 # --- VISTA 2: LISTA DE ALUMNOS (Para marcar) ---
 @asistencia_bp.route('/clase/<int:horario_id>')
 @login_required
+@presupuesto_consultas(5)
 def tomar_lista(horario_id):
     horario = Horario.query.get_or_404(horario_id)
     
     # 1. Obtener alumnos inscritos activos
-    inscripciones = horario.inscripciones.filter_by(activo=True).all()
+    inscripciones = horario.inscripciones.filter_by(activo=True)\
+        .options(joinedload(Inscripcion.socio)).all()
     
     # 2. Saber quién ya tiene asistencia HOY (Para deshabilitar el botón)
     fecha_hoy = datetime.now().date()
@@ -46,58 +52,324 @@ def tomar_lista(horario_id):
     
     # Crear un set de IDs de socios que ya vinieron
     socios_presentes_ids = {a.socio_id for a in asistencias_hoy}
+
+    # 3. Estatus financiero de TODO el grupo en una sola consulta
+    estatus = estatus_financiero_bulk(insc.socio_id for insc in inscripciones)
     
     return render_template('asistencia/tomar_lista.html', 
                            horario=horario, 
                            inscripciones=inscripciones,
                            presentes=socios_presentes_ids,
-                           asistencias_hoy=asistencias_hoy)
+                           asistencias_hoy=asistencias_hoy,
+                           estatus=estatus)
+
+# Estados válidos que puede recibir la API
+ESTADOS_ASISTENCIA = ('Presente', 'Falta', 'Justificado')
+
+MAX_MARCAS_POR_LOTE = 500
+
+# --- REGLAS COMUNES (marcar, marcar_lote y sincronizar) ---
+
+def _inscritos(pares):
+    """ De los pares {(socio_id, horario_id)}, los que tienen inscripción activa (1 consulta) """
+    if not pares:
+        return set()
+    return {(socio_id, horario_id) for socio_id, horario_id in db.session.query(
+        Inscripcion.socio_id, Inscripcion.horario_id
+    ).filter(db.tuple_(Inscripcion.socio_id, Inscripcion.horario_id).in_(pares), Inscripcion.activo == True)}
+
+def _rechazo(inscrito, estatus_socio):
+    """ Mensaje si la marca de un socio en una clase existente no procede; None si procede """
+    if not inscrito:
+        return 'No está inscrito en esta clase'
+    es_activo, mensaje_estatus, _ = estatus_socio
+    if not es_activo:
+        return f'⛔ DEUDOR: {mensaje_estatus}'
+    return None
+
+def _registrar_marcas(horario_id, marcas, fecha):
+    """
+    Registra o corrige en una sola transacción las marcas [(socio_id, estado)]
+    de una clase que ya existe. Retorna un resultado por socio, en el mismo
+    orden: success, obsoleta (trae el estado guardado) o error.
+    """
+    socio_ids = [socio_id for socio_id, _ in marcas]
+
+    # Inscripciones, estatus financiero y asistencias de hoy de todo el lote (1 consulta c/u)
+    inscritos = _inscritos({(socio_id, horario_id) for socio_id in socio_ids})
+    estatus = estatus_financiero_bulk(socio_ids)
+    existentes = {socio_id: (timestamp, estado) for socio_id, timestamp, estado in db.session.query(
+        Asistencia.socio_id, Asistencia.timestamp, Asistencia.estado
+    ).filter(
+        Asistencia.horario_id == horario_id,
+        Asistencia.fecha == fecha,
+        Asistencia.socio_id.in_(socio_ids)
+    )}
+
+    resultados, filas = [], []
+    ahora = datetime.utcnow()
+    for socio_id, estado in marcas:
+        rechazo = _rechazo((socio_id, horario_id) in inscritos, estatus[socio_id])
+        if rechazo:
+            resultados.append({'socio_id': socio_id, 'status': 'error', 'msg': rechazo})
+            continue
+
+        # El upsert (last-write-wins) no pisa una marca con timestamp posterior
+        # (ej. sincronizada desde un celular con el reloj adelantado)
+        guardado, estado_guardado = existentes.get(socio_id, (None, None))
+        if guardado is not None and guardado >= ahora:
+            resultados.append({'socio_id': socio_id, 'status': 'obsoleta',
+                               'msg': 'Había una marca más reciente', 'estado': estado_guardado})
+            continue
+
+        # SI YA EXISTE: se corrige el estado; si no, se crea
+        msg = 'Actualizado' if socio_id in existentes else 'Registrado'
+        filas.append({'socio_id': socio_id, 'horario_id': horario_id, 'fecha': fecha,
+                      'estado': estado, 'timestamp': ahora})
+        resultados.append({'socio_id': socio_id, 'status': 'success', 'msg': msg, 'estado': estado})
+
+    # Altas y correcciones en un solo upsert (executemany)
+    upsert_asistencias(filas)
+    db.session.commit()
+    return resultados
+
+def _leer_id(valor):
+    """ int(valor) o None si no es un id válido """
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
 
 # --- API: PROCESAR EL CLIC (AJAX) ---
 @asistencia_bp.route('/api/marcar', methods=['POST'])
 @login_required
+@presupuesto_consultas(7)
 def marcar_asistencia():
-    data = request.get_json()
-    socio_id = data.get('socio_id')
-    horario_id = data.get('horario_id')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'msg': 'Se esperaba {socio_id, horario_id}.'}), 400
+    socio_id, horario_id = _leer_id(data.get('socio_id')), _leer_id(data.get('horario_id'))
+    if socio_id is None or horario_id is None:
+        return jsonify({'status': 'error', 'msg': 'socio_id y horario_id deben ser números.'}), 400
 
-    # 1. Obtener socio
-    socio = Socio.query.get(socio_id)
-    
-    # 2. VALIDAR ESTATUS FINANCIERO
-    es_activo, mensaje_estatus, _ = socio.get_estatus_financiero()
-    
-    if not es_activo:
-        # Retornamos error 403 (Forbidden) con el mensaje
-        return jsonify({'status': 'error', 'msg': f'⛔ DEUDOR: {mensaje_estatus}'}), 403
-    
     # Recibimos el estado (si no viene, asumimos Presente)
     nuevo_estado = data.get('estado', 'Presente')
+    if nuevo_estado not in ESTADOS_ASISTENCIA:
+        return jsonify({'status': 'error', 'msg': f'Estado inválido: {nuevo_estado}'}), 400
 
-    fecha_hoy = datetime.now().date()
+    if db.session.get(Horario, horario_id) is None:
+        return jsonify({'status': 'error', 'msg': 'La clase no existe'}), 404
+    resultado = _registrar_marcas(horario_id, [(socio_id, nuevo_estado)], datetime.now().date())[0]
 
-    # 1. Buscar si ya existe registro hoy
-    asistencia = Asistencia.query.filter_by(
-        socio_id=socio_id, 
-        horario_id=horario_id, 
-        fecha=fecha_hoy
-    ).first()
-    
-    if asistencia:
-        # SI YA EXISTE: Actualizamos el estado (Corregir error)
-        asistencia.estado = nuevo_estado
-        msg = 'Actualizado'
-    else:
-        # SI NO EXISTE: Creamos uno nuevo
-        asistencia = Asistencia(
-            socio_id=socio_id,
-            horario_id=horario_id,
-            fecha=fecha_hoy,
-            estado=nuevo_estado
-        )
-        db.session.add(asistencia)
-        msg = 'Registrado'
-    
+    if resultado['status'] == 'error':
+        # No inscrito o deudor: 403 (Forbidden) con el mensaje
+        return jsonify({'status': 'error', 'msg': resultado['msg']}), 403
+
+    # 'obsoleta' trae el estado que quedó guardado
+    return jsonify({'status': resultado['status'], 'msg': resultado['msg'], 'estado': resultado['estado']}), 200
+
+# --- API: MARCAR TODA LA CLASE EN UNA PETICIÓN ---
+@asistencia_bp.route('/api/marcar_lote', methods=['POST'])
+@login_required
+@presupuesto_consultas(7)
+def marcar_lote():
+    """
+    Recibe {horario_id, marcas: [{socio_id, estado}]} y responde con el
+    resultado de cada alumno. Los rechazos (deudor, no inscrito, estado
+    inválido) no impiden guardar al resto del grupo.
+    """
+    data = request.get_json(silent=True)
+    marcas = data.get('marcas') if isinstance(data, dict) else None
+    if not isinstance(marcas, list) or not marcas:
+        return jsonify({'status': 'error', 'msg': 'Se esperaba una lista de marcas.'}), 400
+    if len(marcas) > MAX_MARCAS_POR_LOTE:
+        return jsonify({'status': 'error', 'msg': f'Máximo {MAX_MARCAS_POR_LOTE} marcas por lote.'}), 413
+
+    horario_id = _leer_id(data.get('horario_id'))
+    if horario_id is None:
+        return jsonify({'status': 'error', 'msg': 'horario_id debe ser un número.'}), 400
+
+    # Si el mismo alumno viene dos veces gana la última marca
+    por_socio = {}
+    for marca in marcas:
+        socio_id = _leer_id(marca.get('socio_id')) if isinstance(marca, dict) else None
+        if socio_id is None:
+            return jsonify({'status': 'error', 'msg': f'Marca inválida: {marca}'}), 400
+        por_socio[socio_id] = marca.get('estado', 'Presente')
+
+    if db.session.get(Horario, horario_id) is None:
+        return jsonify({'status': 'error', 'msg': 'La clase no existe'}), 404
+
+    validas = [(socio_id, estado) for socio_id, estado in por_socio.items() if estado in ESTADOS_ASISTENCIA]
+    procesadas = {}
+    if validas:
+        procesadas = {r['socio_id']: r for r in _registrar_marcas(horario_id, validas, datetime.now().date())}
+
+    resultados = [procesadas.get(socio_id) or {'socio_id': socio_id, 'status': 'error',
+                                                'msg': f'Estado inválido: {estado}'}
+                  for socio_id, estado in por_socio.items()]
+
+    return jsonify({
+        'status': 'success',
+        'resultados': resultados,
+        'guardados': sum(1 for r in resultados if r['status'] == 'success'),
+        'rechazados': sum(1 for r in resultados if r['status'] == 'error')
+    }), 200
+
+# --- SINCRONIZACIÓN FUERA DE LÍNEA ---
+#
+# El celular del instructor encola las marcas (con una llave de idempotencia
+# generada en el dispositivo) y las envía en lotes cuando hay red. Reenviar
+# un lote es inofensivo: las llaves ya procesadas se ignoran y, entre marcas
+# del mismo socio/clase/día, gana la de timestamp más reciente.
+
+def _leer_timestamp(valor):
+    """ ISO 8601 del dispositivo -> datetime UTC sin zona (como se guarda en BD) """
+    momento = datetime.fromisoformat(valor)
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento
+
+@asistencia_bp.route('/api/sincronizar', methods=['POST'])
+@login_required
+@presupuesto_consultas(9)
+def sincronizar():
+    """
+    Recibe {marcas: [{clave, socio_id, horario_id, fecha, estado, timestamp}]}.
+    Cada marca se responde como aplicada, obsoleta (había una más reciente;
+    trae el estado guardado), duplicada (la llave ya se procesó) o error (no
+    se reintenta).
+    """
+    data = request.get_json(silent=True)
+    marcas = data.get('marcas') if isinstance(data, dict) else None
+    if not isinstance(marcas, list) or not marcas:
+        return jsonify({'status': 'error', 'msg': 'Se esperaba una lista de marcas.'}), 400
+    if len(marcas) > MAX_MARCAS_POR_LOTE:
+        return jsonify({'status': 'error', 'msg': f'Máximo {MAX_MARCAS_POR_LOTE} marcas por lote.'}), 413
+
+    # 1. Validar forma de cada marca
+    resultados, validas = {}, []
+    for marca in marcas:
+        clave = str(marca.get('clave') or '')[:64] if isinstance(marca, dict) else ''
+        if not clave:
+            return jsonify({'status': 'error', 'msg': 'Cada marca necesita una clave.'}), 400
+        if clave in resultados:
+            continue
+        try:
+            fila = {
+                'clave': clave,
+                'socio_id': int(marca['socio_id']),
+                'horario_id': int(marca['horario_id']),
+                'fecha': date.fromisoformat(marca['fecha']),
+                'estado': marca.get('estado', 'Presente'),
+                'timestamp': _leer_timestamp(marca['timestamp'])
+            }
+        except (KeyError, TypeError, ValueError):
+            resultados[clave] = {'clave': clave, 'status': 'error', 'msg': 'Marca mal formada'}
+            continue
+
+        if fila['estado'] not in ESTADOS_ASISTENCIA:
+            resultados[clave] = {'clave': clave, 'status': 'error', 'msg': f'Estado inválido: {fila["estado"]}'}
+            continue
+
+        resultados[clave] = None
+        validas.append(fila)
+
+    # 2. Entregas repetidas: la llave ya se había procesado
+    claves = [fila['clave'] for fila in validas]
+    if claves:
+        repetidas = {clave for (clave,) in db.session.query(MarcaProcesada.clave)
+                     .filter(MarcaProcesada.clave.in_(claves))}
+        for clave in repetidas:
+            resultados[clave] = {'clave': clave, 'status': 'duplicada', 'msg': 'Ya estaba sincronizada'}
+        validas = [fila for fila in validas if fila['clave'] not in repetidas]
+
+    # 3. Clases existentes, inscripciones activas y estatus financiero del lote (1 consulta c/u)
+    if validas:
+        horarios = {horario_id for (horario_id,) in db.session.query(Horario.id)
+                    .filter(Horario.id.in_({fila['horario_id'] for fila in validas}))}
+        inscritos = _inscritos({(fila['socio_id'], fila['horario_id']) for fila in validas})
+        estatus = estatus_financiero_bulk(fila['socio_id'] for fila in validas)
+
+        # Timestamp y estado guardados de cada (socio, clase, día) para reportar obsoletas
+        llaves = {(fila['socio_id'], fila['horario_id'], fila['fecha']) for fila in validas}
+        guardados = {(a.socio_id, a.horario_id, a.fecha): (a.timestamp, a.estado) for a in db.session.query(
+            Asistencia.socio_id, Asistencia.horario_id, Asistencia.fecha, Asistencia.timestamp, Asistencia.estado
+        ).filter(db.tuple_(Asistencia.socio_id, Asistencia.horario_id, Asistencia.fecha).in_(llaves))}
+
+    # 4. Last-write-wins por (socio, clase, día)
+    aplicar, procesadas = [], []
+    for fila in validas:
+        clave = fila.pop('clave')
+        llave = (fila['socio_id'], fila['horario_id'], fila['fecha'])
+        guardado, estado_guardado = guardados.get(llave, (None, None))
+
+        if fila['horario_id'] not in horarios:
+            rechazo = 'La clase no existe'
+        else:
+            rechazo = _rechazo((fila['socio_id'], fila['horario_id']) in inscritos, estatus[fila['socio_id']])
+        if rechazo:
+            resultado = {'clave': clave, 'status': 'error', 'msg': rechazo}
+        elif guardado is not None and guardado >= fila['timestamp']:
+            resultado = {'clave': clave, 'status': 'obsoleta', 'msg': 'Había una marca más reciente',
+                         'estado': estado_guardado}
+        else:
+            guardados[llave] = (fila['timestamp'], fila['estado'])
+            aplicar.append(fila)
+            resultado = {'clave': clave, 'status': 'aplicada', 'msg': fila['estado']}
+
+        resultados[clave] = resultado
+        procesadas.append({'clave': clave, 'socio_id': fila['socio_id'], 'horario_id': fila['horario_id'],
+                           'fecha': fila['fecha'], 'resultado': resultado['status']})
+
+    # 5. Upsert + llaves en la misma transacción
+    upsert_asistencias(aplicar)
+    registrar_claves_procesadas(procesadas)
     db.session.commit()
-    
-    return jsonify({'status': 'success', 'msg': msg, 'estado': nuevo_estado}), 200
\ No newline at end of file
+
+    resultados = list(resultados.values())
+    return jsonify({
+        'status': 'success',
+        'resultados': resultados,
+        'aplicadas': sum(1 for r in resultados if r['status'] == 'aplicada')
+    }), 200
+
+@asistencia_bp.route('/api/clase/<int:horario_id>/foto')
+@login_required
+@presupuesto_consultas(5)
+def foto_clase(horario_id):
+    """ Lista del grupo + estatus financiero + marcas de hoy, para trabajar sin red """
+    horario = Horario.query.get_or_404(horario_id)
+
+    inscripciones = horario.inscripciones.filter_by(activo=True)\
+        .options(joinedload(Inscripcion.socio)).all()
+    estatus = estatus_financiero_bulk(insc.socio_id for insc in inscripciones)
+
+    fecha_hoy = datetime.now().date()
+    marcas = Asistencia.query.filter_by(horario_id=horario.id, fecha=fecha_hoy).all()
+
+    alumnos = []
+    for insc in inscripciones:
+        es_activo, mensaje_estatus, _ = estatus[insc.socio_id]
+        alumnos.append({
+            'socio_id': insc.socio_id,
+            'nombre': insc.socio.nombre_completo,
+            'folio': insc.socio.folio,
+            'activo': es_activo,
+            'estatus': mensaje_estatus
+        })
+
+    return jsonify({
+        'horario': {
+            'id': horario.id,
+            'dia': horario.dia_semana,
+            'hora_inicio': horario.hora_inicio.strftime('%H:%M'),
+            'nivel': horario.nivel
+        },
+        'fecha': fecha_hoy.isoformat(),
+        'generado': datetime.utcnow().isoformat() + 'Z',
+        'alumnos': alumnos,
+        'marcas': {str(a.socio_id): {'estado': a.estado,
+                                     'timestamp': a.timestamp.isoformat() + 'Z' if a.timestamp else None}
+                   for a in marcas}
+    }), 200
@@ -1,12 +1,14 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import current_user, login_user, logout_user, login_required
 from app.models import User
+from app.instrumentacion import presupuesto_consultas
 from app.forms import LoginForm
 from urllib.parse import urlsplit
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@presupuesto_consultas(2)
 def login():
     # Si ya está logueado, mandarlo al dashboard según su rol
     if current_user.is_authenticated:
@@ -41,6 +43,7 @@ def login():
     return render_template('auth/login.html', form=form)
 
 @auth_bp.route('/logout')
+@presupuesto_consultas(1)
 def logout():
     logout_user()
     return redirect(url_for('auth.login'))
\ No newline at end of file
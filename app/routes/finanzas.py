@@ -1,14 +1,58 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from app import db
-from app.models import Socio, Pago, Tarifa
+from app.models import Socio, Pago, registrar_pago_en_estatus, acumular_ingreso
+from app import catalogos, folios
 from datetime import datetime
+from sqlalchemy.orm import joinedload
+from app.instrumentacion import presupuesto_consultas
 from flask_login import login_required
 
 finanzas_bp = Blueprint('finanzas', __name__, url_prefix='/finanzas')
 
+# --- COTIZACIÓN (tarifas desde el catálogo en memoria) ---
+
+# Concepto -> columna de la Tarifa
+COLUMNA_POR_CONCEPTO = {
+    'Mensualidad': 'costo_mensual',
+    'Anualidad': 'costo_anualidad',
+    'Inscripción': 'costo_inscripcion',
+}
+
+MAX_SOCIOS_POR_COTIZACION = 1000
+# Sin repetidos solo hay tantos conceptos útiles como columnas de tarifa
+MAX_CONCEPTOS_POR_COTIZACION = len(COLUMNA_POR_CONCEPTO)
+
+def detalle_sugerido(concepto, ahora):
+    if concepto == 'Mensualidad':
+        # Sugerir mes actual: "Diciembre 2025"
+        return ahora.strftime("%B %Y")
+    if concepto == 'Anualidad':
+        return f"Anualidad {ahora.year}"
+    return "Inscripción Nuevo Ingreso"
+
+def cotizar(membresia_id, nivel, concepto, ahora=None):
+    """
+    Precio y detalle sugeridos para una combinación Membresía + Nivel.
+    Retorna {'precio', 'detalle'} o {'error', 'codigo'} si no se puede cotizar.
+    """
+    if concepto not in COLUMNA_POR_CONCEPTO:
+        return {'error': f'El concepto "{concepto}" no tiene tarifa.', 'codigo': 'concepto_invalido'}
+    if membresia_id is None:
+        return {'error': 'El socio no tiene membresía asignada.', 'codigo': 'sin_membresia'}
+
+    tarifa = catalogos.tarifa_de(membresia_id, nivel)
+    if tarifa is None:
+        return {'error': f'No hay tarifa registrada para el nivel {nivel} en este plan.', 'codigo': 'sin_tarifa'}
+
+    return {
+        'precio': getattr(tarifa, COLUMNA_POR_CONCEPTO[concepto]),
+        'detalle': detalle_sugerido(concepto, ahora or datetime.now())
+    }
+
 # --- API INTERNA (Para que el JavaScript consulte precios) ---
 @finanzas_bp.route('/api/consultar_precio', methods=['POST'])
 @login_required
+@presupuesto_consultas(2)
 def consultar_precio():
     data = request.get_json()
     socio_id = data.get('socio_id')
@@ -18,43 +62,91 @@ def consultar_precio():
     if not socio:
         return jsonify({'error': 'Socio no encontrado'}), 404
 
-    # Buscar la tarifa correspondiente a su membresía y nivel
-    tarifa = Tarifa.query.filter_by(
-        membresia_id=socio.membresia_id, 
-        nivel=socio.nivel
-    ).first()
-
-    precio = 0
-    detalle_sugerido = ""
-
-    if tarifa:
-        if concepto == 'Mensualidad':
-            precio = tarifa.costo_mensual
-            # Sugerir mes actual: "Diciembre 2025"
-            detalle_sugerido = datetime.now().strftime("%B %Y")
-        elif concepto == 'Anualidad':
-            precio = tarifa.costo_anualidad
-            detalle_sugerido = f"Anualidad {datetime.now().year}"
-        elif concepto == 'Inscripción':
-            precio = tarifa.costo_inscripcion
-            detalle_sugerido = "Inscripción Nuevo Ingreso"
+    # Buscar la tarifa correspondiente a su membresía y nivel (catálogo en memoria)
+    cotizacion = cotizar(socio.membresia_id, socio.nivel, concepto)
+    if 'error' in cotizacion:
+        return jsonify(cotizacion), 422
+
+    return jsonify({
+        'precio_sugerido': cotizacion['precio'],
+        'detalle_sugerido': cotizacion['detalle']
+    })
+
+@finanzas_bp.route('/api/cotizar_lote', methods=['POST'])
+@login_required
+@presupuesto_consultas(2)
+def cotizar_lote():
+    """
+    Recibe {socio_ids: [...], conceptos: [...]} y cotiza cada concepto para
+    cada socio con UNA consulta de socios; las tarifas salen de memoria.
+    Las combinaciones sin tarifa se reportan con 'error' y 'codigo'.
+    """
+    data = request.get_json(silent=True) or {}
+    conceptos = data.get('conceptos') or ['Mensualidad']
+    if not isinstance(conceptos, list) or not all(isinstance(concepto, str) for concepto in conceptos):
+        return jsonify({'error': 'conceptos debe ser una lista de textos.'}), 400
+    conceptos = list(dict.fromkeys(conceptos))
+    if len(conceptos) > MAX_CONCEPTOS_POR_COTIZACION:
+        return jsonify({'error': f'Máximo {MAX_CONCEPTOS_POR_COTIZACION} conceptos por cotización.'}), 413
+    try:
+        socio_ids = data.get('socio_ids') or []
+        if not isinstance(socio_ids, list):
+            raise TypeError
+        socio_ids = list(dict.fromkeys(int(socio_id) for socio_id in socio_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'socio_ids debe ser una lista de números.'}), 400
+
+    if not socio_ids:
+        return jsonify({'error': 'Se esperaba una lista de socio_ids.'}), 400
+    if len(socio_ids) > MAX_SOCIOS_POR_COTIZACION:
+        return jsonify({'error': f'Máximo {MAX_SOCIOS_POR_COTIZACION} socios por cotización.'}), 413
+
+    socios = {fila.id: fila for fila in db.session.query(
+        Socio.id, Socio.folio, Socio.nombre_completo, Socio.membresia_id, Socio.nivel
+    ).filter(Socio.id.in_(socio_ids))}
+
+    ahora = datetime.now()
+    cotizaciones, total, con_error = [], 0.0, 0
+    for socio_id in socio_ids:
+        socio = socios.get(socio_id)
+        for concepto in conceptos:
+            if socio is None:
+                cotizacion = {'error': 'Socio no encontrado', 'codigo': 'socio_inexistente'}
+            else:
+                cotizacion = cotizar(socio.membresia_id, socio.nivel, concepto, ahora)
+
+            if 'error' in cotizacion:
+                con_error += 1
+            else:
+                total += cotizacion['precio']
+
+            cotizacion.update({
+                'socio_id': socio_id,
+                'folio': socio.folio if socio else None,
+                'nombre': socio.nombre_completo if socio else None,
+                'concepto': concepto
+            })
+            cotizaciones.append(cotizacion)
 
     return jsonify({
-        'precio_sugerido': precio,
-        'detalle_sugerido': detalle_sugerido
+        'cotizaciones': cotizaciones,
+        'total': round(total, 2),
+        'con_error': con_error
     })
 
 # --- RUTA DE INTERFAZ ---
 @finanzas_bp.route('/cobrar/<int:socio_id>', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(6)
 def cobrar(socio_id):
-    socio = Socio.query.get_or_404(socio_id)
+    socio = Socio.query.options(joinedload(Socio.membresia)).get_or_404(socio_id)
     
     if request.method == 'POST':
         # Recibir datos del formulario
         nuevo_pago = Pago(
-            folio_recibo=f"REC-{int(datetime.now().timestamp())}", # Generar folio simple basado en tiempo
+            folio_recibo=folios.siguiente('recibo'), # Consecutivo único (ver app/folios.py)
             socio_id=socio.id,
+            fecha_pago=datetime.utcnow(),
             concepto_tipo=request.form.get('concepto'),
             detalle_concepto=request.form.get('detalle'),
             monto_base=float(request.form.get('monto')),
@@ -64,6 +156,9 @@ def cobrar(socio_id):
         )
         
         db.session.add(nuevo_pago)
+        # Actualizar la foto de estatus en la MISMA transacción del pago
+        registrar_pago_en_estatus(nuevo_pago)
+        acumular_ingreso(nuevo_pago)
         db.session.commit()
         
         flash('Pago registrado correctamente.', 'success')
@@ -73,7 +168,8 @@ def cobrar(socio_id):
 
 @finanzas_bp.route('/recibo/<int:id>')
 @login_required
+@presupuesto_consultas(2)
 def ver_recibo(id):
-    pago = Pago.query.get_or_404(id)
+    pago = Pago.query.options(joinedload(Pago.socio)).get_or_404(id)
     # Renderizamos una plantilla dedicada EXCLUSIVA para impresión
     return render_template('finanzas/recibo_print.html', pago=pago)
\ No newline at end of file
@@ -1,13 +1,15 @@
 from flask import Blueprint, render_template
-from app.models import Horario, Inscripcion
+from sqlalchemy.orm import joinedload
+from app.models import Horario, Inscripcion, Socio
+from app.instrumentacion import presupuesto_consultas
+from app.cache import agenda_cache, fragmento
 from flask_login import login_required
 
 # Definir el Blueprint
 horarios_bp = Blueprint('horarios', __name__, url_prefix='/horarios')
 
-@horarios_bp.route('/')
-@login_required
-def calendario():
+def _render_agenda_semanal():
+    """ HTML del bloque de la agenda semanal (se guarda en agenda_cache) """
     # 1. Obtener todos los horarios de la base de datos
     todos_horarios = Horario.query.all()
     
@@ -31,15 +33,26 @@ def calendario():
     for dia in agenda_semanal:
         agenda_semanal[dia].sort(key=lambda x: x['objeto'].hora_inicio)
 
-    return render_template('horarios/calendario.html', agenda=agenda_semanal)
+    return render_template('horarios/_agenda_semanal.html', agenda=agenda_semanal)
+
+@horarios_bp.route('/')
+@login_required
+@presupuesto_consultas(3)
+def calendario():
+    # Se reconstruye solo cuando cambian horarios o inscripciones
+    agenda_html = fragmento(agenda_cache, 'agenda', 'calendario', _render_agenda_semanal)
+    return render_template('horarios/calendario.html', agenda_html=agenda_html)
 
 @horarios_bp.route('/detalle/<int:id>')
+@presupuesto_consultas(3)
 def detalle_clase(id):
     # 1. Obtener la clase (horario)
     horario = Horario.query.get_or_404(id)
     
     # 2. Obtener los alumnos inscritos (Solo los ACTIVOS)
     # Usamos la relación 'inscripciones' definida en el modelo Horario
-    inscritos = horario.inscripciones.filter_by(activo=True).all()
+    # (Socio y su Membresía en la misma consulta: evita N+1 en la plantilla)
+    inscritos = horario.inscripciones.filter_by(activo=True)\
+        .options(joinedload(Inscripcion.socio).joinedload(Socio.membresia)).all()
     
     return render_template('horarios/detalle.html', horario=horario, alumnos=inscritos)
\ No newline at end of file
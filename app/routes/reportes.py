@@ -1,43 +1,67 @@
-from flask import Blueprint, render_template
+from flask import (Blueprint, render_template, request, abort, Response, stream_with_context,
+                   flash, redirect, url_for, jsonify)
 from flask_login import login_required
 from app import db
-from app.models import Pago, Asistencia, Socio, Horario
-from sqlalchemy import func, case
-from datetime import date, datetime, timedelta
+from app import analitica
+from app import exportador
+from app.decorators import admin_required
+from app.models import Pago, Horario, Socio, EstatusSocio, ResumenIngresoDiario, ResumenAsistenciaDiaria
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from app.instrumentacion import presupuesto_consultas
+from datetime import date, timedelta
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
+# Rangos permitidos para la gráfica de ingresos (días)
+RANGOS_GRAFICA = (7, 30, 90, 365)
+
+def serie_ingresos(desde, hasta):
+    """
+    Lee SOLO el resumen diario. Retorna (serie, por_concepto): serie es
+    [(fecha, total)] con un punto por día (0 si no hubo cobros).
+    """
+    filas = db.session.query(
+        ResumenIngresoDiario.fecha, ResumenIngresoDiario.concepto, ResumenIngresoDiario.total
+    ).filter(ResumenIngresoDiario.fecha.between(desde, hasta)).all()
+
+    por_dia, por_concepto = {}, {}
+    for fecha, concepto, total in filas:
+        por_dia[fecha] = por_dia.get(fecha, 0.0) + total
+        por_concepto[concepto] = por_concepto.get(concepto, 0.0) + total
+
+    dias = (hasta - desde).days + 1
+    serie = [(desde + timedelta(days=i), por_dia.get(desde + timedelta(days=i), 0.0)) for i in range(dias)]
+    return serie, sorted(por_concepto.items(), key=lambda item: item[1], reverse=True)
+
 @reportes_bp.route('/dashboard')
 @login_required
+@presupuesto_consultas(6)
 def dashboard():
     hoy = date.today()
-    
-    # 1. KPIs PRINCIPALES (Tarjetas Superiores)
-    
-    # A. Ingresos de HOY
-    ingresos_hoy = db.session.query(func.sum(Pago.total_cobrado))\
-        .filter(func.date(Pago.fecha_pago) == hoy).scalar() or 0
-        
+
+    dias = request.args.get('dias', 7, type=int)
+    if dias not in RANGOS_GRAFICA:
+        dias = 7
+
+    # 1. GRÁFICA DE INGRESOS (desde el resumen diario, con ceros)
+    serie, ingresos_por_concepto = serie_ingresos(hoy - timedelta(days=dias - 1), hoy)
+
+    formato = '%d/%m' if dias <= 90 else '%d/%m/%y'
+    chart_labels = [fecha.strftime(formato) for fecha, _ in serie]
+    chart_values = [round(total, 2) for _, total in serie]
+
+    # 2. KPIs PRINCIPALES (Tarjetas Superiores)
+
+    # A. Ingresos de HOY (último punto de la serie)
+    ingresos_hoy = serie[-1][1]
+
     # B. Asistencias de HOY
-    asistencias_hoy = Asistencia.query.filter_by(fecha=hoy).count()
-    
-    # C. Alumnos Activos (Total)
-    total_alumnos = Socio.query.count() # O filtra por estatus si implementaste soft delete
+    asistencias_hoy = db.session.query(func.coalesce(func.sum(ResumenAsistenciaDiaria.total), 0))\
+        .filter(ResumenAsistenciaDiaria.fecha == hoy).scalar()
 
-    # 2. GRÁFICA DE INGRESOS (Últimos 7 días)
-    fecha_inicio_semana = hoy - timedelta(days=6)
-    
-    # Consulta agrupada por fecha
-    datos_semana = db.session.query(
-        func.date(Pago.fecha_pago), func.sum(Pago.total_cobrado)
-    ).filter(func.date(Pago.fecha_pago) >= fecha_inicio_semana)\
-     .group_by(func.date(Pago.fecha_pago)).all()
-     
-    # Formatear para Chart.js ([Labels], [Data])
-    # Rellenar con 0 los días que no hubo ventas es ideal, pero simplificaremos:
-    # chart_labels = [d[0].strftime('%d/%m') for d in datos_semana]
-    chart_labels = [datetime.strptime(d[0], '%Y-%m-%d').strftime('%d/%m') for d in datos_semana]
-    chart_values = [float(d[1]) for d in datos_semana]
+    # C. Alumnos Activos (Conteo indexado sobre la foto de estatus)
+    total_alumnos = EstatusSocio.query.filter_by(estado='activo').count()
 
     # 3. PRÓXIMAS CLASES (Del día de hoy)
     # Traducir día
@@ -48,7 +72,8 @@ def dashboard():
         .order_by(Horario.hora_inicio).all()
 
     # 4. ÚLTIMOS 5 PAGOS (Tabla rápida)
-    ultimos_pagos = Pago.query.order_by(Pago.fecha_pago.desc()).limit(5).all()
+    ultimos_pagos = Pago.query.options(joinedload(Pago.socio))\
+        .order_by(Pago.fecha_pago.desc()).limit(5).all()
 
     return render_template('reportes/dashboard.html',
                            ingresos_hoy=ingresos_hoy,
@@ -56,6 +81,115 @@ def dashboard():
                            total_alumnos=total_alumnos,
                            chart_labels=chart_labels,
                            chart_values=chart_values,
+                           dias=dias,
+                           rangos=RANGOS_GRAFICA,
+                           ingresos_por_concepto=ingresos_por_concepto,
+                           total_rango=sum(chart_values),
                            clases_hoy=clases_hoy,
                            ultimos_pagos=ultimos_pagos,
-                           dia_actual=dia_nombre)
\ No newline at end of file
+                           dia_actual=dia_nombre)
+
+# --- EXPORTACIONES (CSV / NDJSON en flujo) ---
+
+def _parametros_exportacion():
+    """ (formato, desde, hasta) de la query string; por defecto el mes en curso en CSV """
+    formato = request.args.get('formato', 'csv')
+    if formato not in exportador.FORMATOS:
+        abort(400, 'Formato no soportado (csv o ndjson).')
+
+    hoy = date.today()
+    try:
+        desde = date.fromisoformat(request.args.get('desde') or hoy.replace(day=1).isoformat())
+        hasta = date.fromisoformat(request.args.get('hasta') or hoy.isoformat())
+    except ValueError:
+        abort(400, 'Fechas inválidas (use AAAA-MM-DD).')
+    if desde > hasta:
+        abort(400, 'La fecha inicial es posterior a la final.')
+    return formato, desde, hasta
+
+def _respuesta_exportacion(nombre, formato, desde, hasta, stmt, columnas):
+    # Las filas se leen mientras se envían: la consulta corre fuera del presupuesto de la vista
+    archivo = f'{nombre}_{desde.isoformat()}_{hasta.isoformat()}.{formato}'
+    return Response(stream_with_context(exportador.generar(formato, stmt, columnas)),
+                    content_type=exportador.FORMATOS[formato],
+                    headers={'Content-Disposition': f'attachment; filename="{archivo}"'})
+
+@reportes_bp.route('/exportar/pagos')
+@login_required
+@admin_required
+@presupuesto_consultas(1)
+def exportar_pagos():
+    """ ?desde=&hasta=&concepto=&metodo_pago=&factura=1&formato=csv|ndjson """
+    formato, desde, hasta = _parametros_exportacion()
+    stmt = exportador.consulta_pagos(desde, hasta,
+                                     concepto=request.args.get('concepto') or None,
+                                     metodo_pago=request.args.get('metodo_pago') or None,
+                                     solo_factura=request.args.get('factura') == '1')
+    return _respuesta_exportacion('pagos', formato, desde, hasta, stmt, exportador.COLUMNAS_PAGOS)
+
+@reportes_bp.route('/exportar/asistencias')
+@login_required
+@admin_required
+@presupuesto_consultas(1)
+def exportar_asistencias():
+    """ ?desde=&hasta=&horario_id=&formato=csv|ndjson """
+    formato, desde, hasta = _parametros_exportacion()
+    stmt = exportador.consulta_asistencias(desde, hasta, horario_id=request.args.get('horario_id', type=int))
+    return _respuesta_exportacion('asistencias', formato, desde, hasta, stmt, exportador.COLUMNAS_ASISTENCIAS)
+
+# --- ANALÍTICA DE ASISTENCIA (app/analitica.py) ---
+
+# Semanas completas que cubre el reporte si no se indica ?desde=
+SEMANAS_ANALITICA = 12
+
+def _rango_analitica():
+    """ (desde, hasta) de la query string; por defecto las últimas SEMANAS_ANALITICA semanas """
+    hoy = date.today()
+    try:
+        hasta = date.fromisoformat(request.args.get('hasta') or hoy.isoformat())
+        desde = date.fromisoformat(request.args.get('desde') or
+                                   (hasta - timedelta(days=hasta.weekday(), weeks=SEMANAS_ANALITICA - 1)).isoformat())
+    except ValueError:
+        abort(400, 'Fechas inválidas (use AAAA-MM-DD).')
+    if desde > hasta:
+        abort(400, 'La fecha inicial es posterior a la final.')
+    return desde, hasta
+
+def _reporte_asistencia(limite):
+    """ Reporte del rango pedido con el nombre de cada socio listado (1 consulta) """
+    desde, hasta = _rango_analitica()
+    try:
+        datos = analitica.reporte(desde, hasta, limite)
+    except ValueError as e:
+        abort(400, str(e))
+
+    ids = [fila['socio_id'] for fila in datos['socios_mas_ausentes']]
+    nombres = dict(db.session.query(Socio.id, Socio.nombre_completo).filter(Socio.id.in_(ids))) if ids else {}
+    for fila in datos['socios_mas_ausentes']:
+        fila['nombre'] = nombres.get(fila['socio_id'], '')
+    return datos
+
+@reportes_bp.route('/asistencia')
+@login_required
+@admin_required
+@presupuesto_consultas(2)
+def asistencia():
+    """ ?desde=&hasta= (AAAA-MM-DD) """
+    try:
+        datos = _reporte_asistencia(20)
+    except RuntimeError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('reportes.dashboard'))
+    return render_template('reportes/asistencia.html', datos=datos)
+
+@reportes_bp.route('/asistencia.json')
+@login_required
+@admin_required
+@presupuesto_consultas(2)
+def asistencia_json():
+    """ ?desde=&hasta=&limite= (socios con más ausencias, máx. 1000) """
+    try:
+        datos = _reporte_asistencia(min(max(request.args.get('limite', 100, type=int), 0), 1000))
+    except RuntimeError as e:
+        return jsonify({'status': 'error', 'msg': str(e)}), 503
+    return jsonify(datos)
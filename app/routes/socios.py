@@ -1,47 +1,88 @@
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Socio, Membresia, Pago, Asistencia, Nivel
+from app.models import Socio, Membresia, Pago, Asistencia, Horario, estatus_financiero_bulk
+from app import catalogos, folios
 from app.forms import SocioForm
+from app.instrumentacion import presupuesto_consultas
 from flask_login import login_required
 
 
 # Definir el "Blueprint" (agrupador de rutas)
 socios_bp = Blueprint('socios', __name__, url_prefix='/socios')
 
+POR_PAGINA_DEFAULT = 50
+POR_PAGINA_MAXIMO = 200
+
+def consulta_directorio(nivel=None, membresia_id=None, despues=None, limite=POR_PAGINA_DEFAULT):
+    """
+    Página del directorio: solo las columnas que pinta la tabla + nombre del
+    plan, en UNA consulta. Los filtros usan los índices (nivel, id) y
+    (membresia_id, id), así el costo no crece con el total de socios.
+    """
+    consulta = db.session.query(
+        Socio.id, Socio.folio, Socio.nombre_completo, Socio.nivel,
+        Membresia.nombre.label('membresia')
+    ).outerjoin(Membresia, Socio.membresia_id == Membresia.id)
+
+    if nivel:
+        consulta = consulta.filter(Socio.nivel == nivel)
+    if membresia_id:
+        consulta = consulta.filter(Socio.membresia_id == membresia_id)
+    if despues:
+        consulta = consulta.filter(Socio.id < despues)
+
+    return consulta.order_by(Socio.id.desc()).limit(limite).all()
+
 @socios_bp.route('/')
 @login_required
+@presupuesto_consultas(4)
 def lista():
-    # Obtener todos los socios ordenados por ID reciente
-    socios = Socio.query.order_by(Socio.id.desc()).all()
-    return render_template('socios/lista.html', socios=socios)
+    # Paginación por llave (keyset) sobre el ID: ?despues=<ultimo_id>&por_pagina=50
+    despues = request.args.get('despues', type=int)
+    por_pagina = min(max(request.args.get('por_pagina', POR_PAGINA_DEFAULT, type=int), 1), POR_PAGINA_MAXIMO)
+    nivel = request.args.get('nivel') or None
+    membresia_id = request.args.get('membresia_id', type=int)
+
+    # Pedimos uno extra para saber si hay página siguiente
+    socios = consulta_directorio(nivel, membresia_id, despues, por_pagina + 1)
+    hay_siguiente = len(socios) > por_pagina
+    socios = socios[:por_pagina]
+
+    siguiente = None
+    if hay_siguiente:
+        siguiente = url_for('socios.lista', despues=socios[-1].id, por_pagina=por_pagina,
+                            nivel=nivel, membresia_id=membresia_id)
+
+    return render_template('socios/lista.html',
+                           socios=socios,
+                           siguiente=siguiente,
+                           es_primera=not despues,
+                           por_pagina=por_pagina,
+                           filtro_nivel=nivel,
+                           filtro_membresia=membresia_id,
+                           niveles=catalogos.niveles(),
+                           membresias=catalogos.membresias())
 
 @socios_bp.route('/nuevo', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(5)
 def crear():
     form = SocioForm()
 
     # --- CARGA DINÁMICA DE NIVELES ---
-    niveles_db = Nivel.query.order_by(Nivel.orden).all()
-    form.nivel.choices = [(n.nombre, n.nombre) for n in niveles_db]
+    form.nivel.choices = catalogos.opciones_niveles()
     # ---------------------------------
     
     # Llenar el select de membresías dinámicamente desde la BD
-    form.membresia_id.choices = [(m.id, m.nombre) for m in Membresia.query.all()]
+    form.membresia_id.choices = catalogos.opciones_membresias()
 
     if form.validate_on_submit():
-        # --- LÓGICA DE FOLIO CONSECUTIVO ---
-        ultimo_socio = Socio.query.order_by(Socio.id.desc()).first()
-        if ultimo_socio:
-            # Extraer el número del último folio (SW0005 -> 5) y sumar 1
-            # O usar el ID directamente si confías en el autoincrement
-            nuevo_id = ultimo_socio.id + 1
-        else:
-            nuevo_id = 1
-            
-        # Generar string SW0001
-        folio_generado = f"SW{nuevo_id:04d}" 
+        # --- FOLIO CONSECUTIVO (bloque reservado por proceso, sin consultar el último socio) ---
+        folio_generado = folios.siguiente('socio')
 
         # Crear objeto
         nuevo_socio = Socio(
@@ -66,17 +107,17 @@ def crear():
 
 @socios_bp.route('/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(5)
 def editar(id):
     socio = Socio.query.get_or_404(id)
     form = SocioForm(obj=socio) # Pre-llenar formulario con datos existentes
     
     # --- CARGA DINÁMICA DE NIVELES ---
-    niveles_db = Nivel.query.order_by(Nivel.orden).all()
-    form.nivel.choices = [(n.nombre, n.nombre) for n in niveles_db]
+    form.nivel.choices = catalogos.opciones_niveles()
     # ---------------------------------
     
     # Llenar el select de membresías dinámicamente desde la BD
-    form.membresia_id.choices = [(m.id, m.nombre) for m in Membresia.query.all()]
+    form.membresia_id.choices = catalogos.opciones_membresias()
 
     if form.validate_on_submit():
         form.populate_obj(socio) # Actualizar objeto con datos del form
@@ -88,40 +129,157 @@ def editar(id):
 
 @socios_bp.route('/perfil/<int:id>')
 @login_required
+@presupuesto_consultas(3)
 def perfil(id):
-    socio = Socio.query.get_or_404(id)
-    
-    # 1. Obtener Historial de Pagos (Más recientes primero)
-    pagos = socio.pagos.order_by(Pago.fecha_pago.desc()).all()
-    
-    # 2. Obtener Historial de Asistencia (Últimos 50 registros)
-    asistencias = socio.asistencias.order_by(Asistencia.fecha.desc()).limit(50).all()
-    
-    # 3. CÁLCULO DE ESTATUS (Lógica de Negocio)
-    # Buscamos el último pago de mensualidad
-    ultimo_pago_mes = Pago.query.filter_by(socio_id=socio.id, concepto_tipo='Mensualidad')\
-        .order_by(Pago.fecha_pago.desc()).first()
-    
-    estatus = "Nuevo / Sin Pagos"
-    color_estatus = "secondary"
-    
-    if ultimo_pago_mes:
-        # Calculamos días desde el último pago
-        dias_transcurridos = (datetime.now() - ultimo_pago_mes.fecha_pago).days
-        
-        if dias_transcurridos <= 31:
-            estatus = "Al Corriente"
-            color_estatus = "success"
-        elif dias_transcurridos <= 45:
-            estatus = f"Pago Pendiente ({dias_transcurridos} días)"
-            color_estatus = "warning"
-        else:
-            estatus = "MOROSO"
-            color_estatus = "danger"
+    socio = Socio.query.options(joinedload(Socio.membresia)).get_or_404(id)
+
+    # ESTATUS (Lectura directa de la foto 'estatus_socio')
+    _, estatus, color_estatus = estatus_financiero_bulk([socio.id])[socio.id]
 
-    return render_template('socios/perfil.html', 
-                           socio=socio, 
-                           pagos=pagos, 
-                           asistencias=asistencias,
+    # Resumen e historiales se cargan por JavaScript (api_resumen / api_pagos / api_asistencias)
+    return render_template('socios/perfil.html',
+                           socio=socio,
                            estatus=estatus,
-                           color_estatus=color_estatus)
\ No newline at end of file
+                           color_estatus=color_estatus,
+                           rangos_asistencia=RANGOS_ASISTENCIA,
+                           historial_por_pagina=HISTORIAL_POR_PAGINA)
+
+# --- HISTORIAL DEL SOCIO (JSON paginado por llave) ---
+#
+# El cursor 'despues' es "<fecha ISO>_<id>" del último elemento recibido: la
+# siguiente página es lo estrictamente anterior a ese par (fecha DESC, id DESC),
+# así cada página cuesta lo mismo sin importar cuántos años de historial haya.
+
+HISTORIAL_POR_PAGINA = 20
+HISTORIAL_MAXIMO = 100
+RANGOS_ASISTENCIA = (30, 90)
+
+def _cursor(fecha, id):
+    return f'{fecha.isoformat()}_{id}'
+
+def _leer_cursor(valor, convertir):
+    """ (fecha, id) del cursor o None; ValueError si viene mal formado """
+    if not valor:
+        return None
+    fecha, _, id = valor.rpartition('_')
+    return convertir(fecha), int(id)
+
+def _limite_historial():
+    return min(max(request.args.get('limite', HISTORIAL_POR_PAGINA, type=int), 1), HISTORIAL_MAXIMO)
+
+def historial_pagos(socio_id, despues=None, limite=HISTORIAL_POR_PAGINA):
+    """ Pagos del socio (más recientes primero) por ix_pago_socio_fecha """
+    consulta = db.session.query(
+        Pago.id, Pago.fecha_pago, Pago.concepto_tipo, Pago.detalle_concepto, Pago.total_cobrado
+    ).filter(Pago.socio_id == socio_id)
+
+    if despues:
+        consulta = consulta.filter(db.tuple_(Pago.fecha_pago, Pago.id) < despues)
+
+    return consulta.order_by(Pago.fecha_pago.desc(), Pago.id.desc()).limit(limite).all()
+
+def historial_asistencias(socio_id, despues=None, limite=HISTORIAL_POR_PAGINA):
+    """ Asistencias del socio (más recientes primero) por ix_asistencia_socio_fecha """
+    consulta = db.session.query(
+        Asistencia.id, Asistencia.fecha, Asistencia.estado, Horario.dia_semana, Horario.hora_inicio
+    ).join(Horario, Horario.id == Asistencia.horario_id)\
+     .filter(Asistencia.socio_id == socio_id)
+
+    if despues:
+        consulta = consulta.filter(db.tuple_(Asistencia.fecha, Asistencia.id) < despues)
+
+    return consulta.order_by(Asistencia.fecha.desc(), Asistencia.id.desc()).limit(limite).all()
+
+def resumen_socio(socio_id, dias):
+    """
+    UNA consulta (UNION ALL): una fila por concepto de pago con total, número
+    y último pago, más una fila con las marcas de asistencia de los últimos
+    'dias'. Retorna (por_concepto, asistencia).
+    """
+    desde = date.today() - timedelta(days=dias - 1)
+    pagos = db.select(
+        db.literal('pago'), Pago.concepto_tipo, func.coalesce(func.sum(Pago.total_cobrado), 0.0),
+        func.count(Pago.id), func.max(Pago.fecha_pago)
+    ).where(Pago.socio_id == socio_id).group_by(Pago.concepto_tipo)
+    asistencia = db.select(
+        db.literal('asistencia'), db.literal(None),
+        func.coalesce(func.sum(db.case((Asistencia.estado == 'Presente', 1), else_=0)), 0),
+        func.count(Asistencia.id), func.max(Asistencia.fecha)
+    ).where(Asistencia.socio_id == socio_id, Asistencia.fecha >= desde)
+
+    por_concepto, marcas = [], {'presentes': 0, 'marcas': 0, 'ultima': None}
+    for tipo, concepto, suma, conteo, ultima in db.session.execute(db.union_all(pagos, asistencia)):
+        if tipo == 'pago':
+            por_concepto.append({'concepto': concepto or 'Otro', 'total': float(suma), 'pagos': conteo,
+                                 'ultimo_pago': str(ultima) if ultima else None})
+        else:
+            marcas = {'presentes': int(suma), 'marcas': conteo, 'ultima': str(ultima)[:10] if ultima else None}
+
+    por_concepto.sort(key=lambda fila: fila['ultimo_pago'] or '', reverse=True)
+    marcas['tasa'] = round(100 * marcas['presentes'] / marcas['marcas'], 1) if marcas['marcas'] else None
+    marcas['dias'] = dias
+    return por_concepto, marcas
+
+@socios_bp.route('/api/<int:id>/pagos')
+@login_required
+@presupuesto_consultas(2)
+def api_pagos(id):
+    """ ?despues=<cursor>&limite=20 """
+    try:
+        despues = _leer_cursor(request.args.get('despues'), datetime.fromisoformat)
+    except ValueError:
+        return jsonify({'error': 'Cursor inválido.'}), 400
+    limite = _limite_historial()
+
+    filas = historial_pagos(id, despues, limite + 1)
+    siguiente = _cursor(filas[limite - 1].fecha_pago, filas[limite - 1].id) if len(filas) > limite else None
+
+    return jsonify({
+        'pagos': [{
+            'id': p.id,
+            'fecha': p.fecha_pago.isoformat(),
+            'fecha_texto': p.fecha_pago.strftime('%d/%m/%Y'),
+            'concepto': p.concepto_tipo,
+            'detalle': p.detalle_concepto,
+            'total': p.total_cobrado
+        } for p in filas[:limite]],
+        'siguiente': siguiente
+    })
+
+@socios_bp.route('/api/<int:id>/asistencias')
+@login_required
+@presupuesto_consultas(2)
+def api_asistencias(id):
+    """ ?despues=<cursor>&limite=20 """
+    try:
+        despues = _leer_cursor(request.args.get('despues'), date.fromisoformat)
+    except ValueError:
+        return jsonify({'error': 'Cursor inválido.'}), 400
+    limite = _limite_historial()
+
+    filas = historial_asistencias(id, despues, limite + 1)
+    siguiente = _cursor(filas[limite - 1].fecha, filas[limite - 1].id) if len(filas) > limite else None
+
+    return jsonify({
+        'asistencias': [{
+            'id': a.id,
+            'fecha': a.fecha.isoformat(),
+            'fecha_texto': a.fecha.strftime('%d/%m/%Y'),
+            'dia_semana': a.dia_semana,
+            'hora': a.hora_inicio.strftime('%H:%M'),
+            'estado': a.estado
+        } for a in filas[:limite]],
+        'siguiente': siguiente
+    })
+
+@socios_bp.route('/api/<int:id>/resumen')
+@login_required
+@presupuesto_consultas(2)
+def api_resumen(id):
+    """ ?dias=30|90: totales por concepto, últimos pagos y tasa de asistencia """
+    dias = request.args.get('dias', RANGOS_ASISTENCIA[0], type=int)
+    if dias not in RANGOS_ASISTENCIA:
+        dias = RANGOS_ASISTENCIA[0]
+
+    por_concepto, asistencia = resumen_socio(id, dias)
+    return jsonify({'por_concepto': por_concepto, 'asistencia': asistencia})
\ No newline at end of file
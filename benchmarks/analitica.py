@@ -0,0 +1,144 @@
+"""
+Analítica de asistencia (app/analitica.py) sobre millones de marcas.
+
+Parte de la base de app/generador.py y le agrega historia sintética: cada
+inscripción activa recibe una marca por semana hacia atrás hasta juntar
+--filas marcas (~12% de las sesiones quedan sin marca, ~10% son faltas y
+~3% justificadas). La base ampliada se guarda en benchmarks/.datos/.
+
+Mide por separado:
+  - carga en frío: la lectura columnar desde SQLite (limitada por el driver),
+  - cálculo: todas las agrupaciones vectorizadas,
+  - reporte en caliente: /reportes/asistencia.json servido desde la carga vigente.
+
+Uso:
+    python benchmarks/analitica.py [--filas 10000000] [--socios 10000] [--max-carga 30] [--max-calculo 5]
+
+Sale con código 1 si la carga o el cálculo rebasan su límite o si los
+totales no cuadran con un COUNT(*) en SQL.
+"""
+import argparse
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app import analitica
+from app.models import DIAS_SEMANA, Asistencia
+from endpoints import ConfigBenchmark, preparar_datos
+
+def ampliar(pristina, filas, hoy):
+    """ Copia de la base con ~filas marcas de asistencia; se reutiliza si ya existe """
+    ruta = pristina.replace('.db', f'_asistencia_{filas}.db')
+    if os.path.exists(ruta):
+        return ruta
+
+    shutil.copyfile(pristina, ruta + '.tmp')
+    con = sqlite3.connect(ruta + '.tmp')
+    activas = con.execute('SELECT COUNT(*) FROM inscripcion WHERE activo = 1').fetchone()[0]
+    semanas = math.ceil(filas / max(activas, 1) / 0.88)
+    lunes = hoy - timedelta(days=hoy.weekday())
+    dia = 'CASE h.dia_semana ' + ' '.join(f"WHEN '{d}' THEN {i}" for i, d in enumerate(DIAS_SEMANA)) + ' END'
+
+    print(f'Agregando ~{filas:,} marcas ({activas:,} inscripciones x {semanas} semanas)...')
+    inicio = time.perf_counter()
+    con.execute(f"""
+        INSERT OR IGNORE INTO asistencia (socio_id, horario_id, fecha, estado)
+        SELECT socio_id, horario_id, fecha,
+               CASE WHEN azar < 22 THEN 'Falta' WHEN azar < 25 THEN 'Justificado' ELSE 'Presente' END
+        FROM (
+            WITH RECURSIVE semana(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM semana WHERE n < {semanas - 1})
+            SELECT i.socio_id, i.horario_id,
+                   date(:lunes, ({dia} - 7 * semana.n) || ' days') AS fecha,
+                   (i.id * 2654435761 + semana.n * 40503) % 100 AS azar
+            FROM semana JOIN inscripcion i ON i.activo = 1 JOIN horario h ON h.id = i.horario_id
+        )
+        WHERE azar >= 12 AND fecha <= :hoy
+        ORDER BY fecha
+    """, {'lunes': lunes.isoformat(), 'hoy': hoy.isoformat()})
+    # Las inscripciones cubren toda la historia generada
+    con.execute('UPDATE inscripcion SET fecha_alta = (SELECT MIN(fecha) FROM asistencia) WHERE activo = 1')
+    con.commit()
+    con.execute('ANALYZE')
+    con.close()
+    os.replace(ruta + '.tmp', ruta)
+    print(f'Base ampliada en {time.perf_counter() - inicio:.1f}s: {ruta}')
+    return ruta
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filas', type=int, default=10_000_000)
+    parser.add_argument('--socios', type=int, default=10000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--max-carga', type=float, default=30.0, help='Segundos para la carga en frío')
+    parser.add_argument('--max-calculo', type=float, default=5.0, help='Segundos para las agrupaciones')
+    args = parser.parse_args()
+
+    hoy = date.today()
+    ampliada = ampliar(preparar_datos(args.socios, args.semilla, hoy), args.filas, hoy)
+    directorio = tempfile.mkdtemp(prefix='analitica_')
+    ruta = os.path.join(directorio, 'bench.db')
+    shutil.copyfile(ampliada, ruta)
+
+    class ConfigAnalitica(ConfigBenchmark):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + ruta
+
+    fallas = []
+    try:
+        app = create_app(ConfigAnalitica)
+        with app.app_context():
+            desde = db.session.query(db.func.min(Asistencia.fecha)).scalar()
+            en_sql = db.session.query(Asistencia.estado, db.func.count()).group_by(Asistencia.estado).all()
+
+            datos = analitica.datos_de(desde, hoy)
+            metricas = analitica.calcular(datos)
+            reporte = analitica.reporte(desde, hoy)
+            db.engine.dispose()
+
+        cliente = app.test_client()
+        cliente.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        inicio = time.perf_counter()
+        respuesta = cliente.get(f'/reportes/asistencia.json?desde={desde.isoformat()}&hasta={hoy.isoformat()}')
+        caliente = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    marcas = len(datos.socio)
+    memoria = sum(getattr(datos, c).nbytes for c in ('socio', 'clase', 'dia', 'estado'))
+    carga, calculo = datos.segundos_carga, metricas['segundos_calculo']
+    print(f'Marcas: {marcas:,} de {desde} a {hoy} ({datos.dias} días, {len(datos.horarios)} clases, '
+          f'{len(datos.insc_socio):,} inscripciones); columnas: {memoria / 2**20:.0f} MB')
+    print(f'Carga en frío: {carga:.2f} s ({marcas / max(carga, 1e-9):,.0f} marcas/s)')
+    print(f'Cálculo vectorizado: {calculo:.2f} s ({marcas / max(calculo, 1e-9):,.0f} marcas/s)')
+    print(f'Reporte en caliente (HTTP): {caliente * 1000:.0f} ms, status {respuesta.status_code}')
+    totales = reporte['totales']
+    print(f"Tasa {totales['tasa']:.1%}; {totales['faltas']:,} faltas, {totales['sin_marca']:,} sin marca "
+          f"en {totales['sesiones']:,} sesiones")
+
+    conteo = dict(en_sql)
+    if (totales['presentes'], totales['faltas'], totales['justificados']) != (
+            conteo.get('Presente', 0), conteo.get('Falta', 0), conteo.get('Justificado', 0)):
+        fallas.append(f'Los totales no cuadran con SQL: {conteo}')
+    if respuesta.status_code != 200:
+        fallas.append(f'/reportes/asistencia.json respondió {respuesta.status_code}')
+    if carga > args.max_carga:
+        fallas.append(f'Carga {carga:.1f} s > {args.max_carga:.0f} s')
+    if calculo > args.max_calculo:
+        fallas.append(f'Cálculo {calculo:.1f} s > {args.max_calculo:.0f} s')
+
+    for falla in fallas:
+        print(f'❌ {falla}')
+    if fallas:
+        return 1
+    print('✅ Totales iguales a SQL y tiempos dentro de los límites.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
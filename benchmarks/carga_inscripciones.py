@@ -0,0 +1,165 @@
+"""
+Prueba de carga de inscripciones concurrentes.
+
+Simula varias recepciones inscribiendo al mismo tiempo en las clases más
+solicitadas (sábado) y verifica al final que:
+  - ningún horario rebasa su capacidad_maxima,
+  - el contador 'ocupados' coincide con las inscripciones activas,
+  - ningún socio rebasa el límite de su plan ni tiene dos clases el mismo día,
+  - el rendimiento no baja del mínimo pedido (--min-por-segundo).
+
+Uso:
+    python benchmarks/carga_inscripciones.py [--hilos 12] [--socios 300]
+    python benchmarks/carga_inscripciones.py --url postgresql://.../prueba_vacia
+
+Con --url usa esa base (debe estar VACÍA: se crean las tablas con create_all).
+Sin --url trabaja sobre un archivo SQLite temporal. Sale con código 1 si falla.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as hora
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app import create_app, db
+from app.models import Membresia, Horario, Socio, Inscripcion, inscribir_socio, reconciliar_ocupados
+
+LIMITE_PLAN = 2
+
+def preparar(app, socios, capacidad):
+    """ Crea el plan, las clases en disputa y los socios. Retorna (ids_socios, ids_horarios) """
+    with app.app_context():
+        db.create_all()
+        plan = Membresia(nombre='Plan Carga', clases_por_semana=LIMITE_PLAN)
+        db.session.add(plan)
+        db.session.flush()
+
+        # Tres clases de sábado (una sola por socio) y dos entre semana
+        clases = [('Sábado', 8), ('Sábado', 9), ('Sábado', 10), ('Lunes', 17), ('Miércoles', 17)]
+        horarios = [Horario(dia_semana=dia, hora_inicio=hora(h), hora_fin=hora(h + 1), nivel='Niños',
+                            capacidad_maxima=capacidad, ocupados=0) for dia, h in clases]
+        db.session.add_all(horarios)
+        db.session.add_all([Socio(folio=f'CARGA{i:05d}', nombre_completo=f'Socio Carga {i}', nivel='Niños',
+                                  membresia_id=plan.id) for i in range(socios)])
+        db.session.commit()
+        return [s.id for s in Socio.query.all()], [h.id for h in horarios]
+
+def intentos_de(socio_ids, horario_ids, semilla):
+    """ Cada socio pide dos clases de sábado (dos recepciones a la vez) y las dos entre semana """
+    azar = random.Random(semilla)
+    sabados, entre_semana = horario_ids[:3], horario_ids[3:]
+    intentos = []
+    for socio_id in socio_ids:
+        intentos += [(socio_id, azar.choice(sabados)), (socio_id, azar.choice(sabados))]
+        intentos += [(socio_id, horario_id) for horario_id in entre_semana]
+    azar.shuffle(intentos)
+    return intentos
+
+def inscribir(app, socio_id, horario_id):
+    """ Misma transacción que academico.inscribir """
+    with app.app_context():
+        try:
+            resultado = inscribir_socio(socio_id, horario_id, LIMITE_PLAN)
+            if resultado == 'ok':
+                db.session.commit()
+            else:
+                db.session.rollback()
+            return resultado
+        except OperationalError:
+            db.session.rollback()
+            return 'error_bd'
+
+def verificar(app):
+    """ Retorna la lista de violaciones encontradas (vacía si todo está bien) """
+    fallas = []
+    with app.app_context():
+        for h in Horario.query.all():
+            if h.ocupados > h.capacidad_maxima:
+                fallas.append(f'Horario {h.id} sobrevendido: {h.ocupados}/{h.capacidad_maxima}')
+
+        for horario_id, guardado, real in reconciliar_ocupados():
+            fallas.append(f'Horario {horario_id}: ocupados={guardado} pero hay {real} inscripciones activas')
+
+        activas = db.session.query(Inscripcion.socio_id, Horario.dia_semana)\
+            .join(Horario, Horario.id == Inscripcion.horario_id).filter(Inscripcion.activo == True).all()
+        por_socio = Counter(socio_id for socio_id, _ in activas)
+        por_dia = Counter(activas)
+        fallas += [f'Socio {s} con {n} clases (límite {LIMITE_PLAN})' for s, n in por_socio.items() if n > LIMITE_PLAN]
+        fallas += [f'Socio {s} con {n} clases el {dia}' for (s, dia), n in por_dia.items() if n > 1]
+    return fallas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Base de datos vacía a usar (por defecto SQLite temporal)')
+    parser.add_argument('--hilos', type=int, default=12)
+    parser.add_argument('--socios', type=int, default=300)
+    parser.add_argument('--capacidad', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--min-por-segundo', type=float, default=100.0,
+                        help='Inscripciones intentadas por segundo por debajo de las cuales se falla')
+    args = parser.parse_args()
+
+    temporal = None
+    if not args.url:
+        temporal = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        temporal.close()
+
+    class ConfigCarga(Config):
+        SQLALCHEMY_DATABASE_URI = args.url or 'sqlite:///' + temporal.name
+        # Un hilo por recepción: cada uno necesita su conexión
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': args.hilos, 'max_overflow': 0}
+
+    try:
+        app = create_app(ConfigCarga)
+        socio_ids, horario_ids = preparar(app, args.socios, args.capacidad)
+        intentos = intentos_de(socio_ids, horario_ids, args.semilla)
+
+        # Todas las recepciones arrancan a la vez
+        salida = threading.Barrier(args.hilos)
+        def trabajador(lote):
+            salida.wait()
+            return [inscribir(app, socio_id, horario_id) for socio_id, horario_id in lote]
+
+        lotes = [intentos[i::args.hilos] for i in range(args.hilos)]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+            resultados = Counter(r for lote in pool.map(trabajador, lotes) for r in lote)
+        duracion = time.perf_counter() - inicio
+
+        por_segundo = len(intentos) / duracion
+        print(f'{len(intentos)} intentos en {duracion:.2f}s con {args.hilos} hilos ({por_segundo:.0f}/s)')
+        for resultado, total in sorted(resultados.items()):
+            print(f'  {resultado:<12} {total}')
+
+        fallas = verificar(app)
+        if resultados.get('error_bd'):
+            fallas.append(f"{resultados['error_bd']} intentos fallaron por bloqueo de la base de datos")
+        if por_segundo < args.min_por_segundo:
+            fallas.append(f'Rendimiento {por_segundo:.0f}/s menor al mínimo {args.min_por_segundo:.0f}/s')
+
+        with app.app_context():
+            ocupados = db.session.query(func.sum(Horario.ocupados)).scalar()
+        print(f'Lugares ocupados: {ocupados} de {len(horario_ids) * args.capacidad}')
+
+        for falla in fallas:
+            print(f'❌ {falla}')
+        if fallas:
+            return 1
+        print('✅ Sin sobrecupo ni reglas violadas.')
+        return 0
+    finally:
+        if temporal:
+            os.remove(temporal.name)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Lecturas contra escrituras concurrentes en SQLite: diario clásico contra WAL.
+
+Un proceso escribe lotes de asistencias sin parar (como una importación o
+varias tabletas sincronizando) mientras otros procesos leen la lista de una
+clase (como tomar_lista en recepción). Se corre con el diario por defecto
+(DELETE) y con el perfil de config.SQLITE_PRAGMAS y se compara la latencia de
+las lecturas, los errores "database is locked" y las escrituras logradas.
+
+Uso:
+    python benchmarks/concurrencia_sqlite.py [--segundos 5] [--lectores 4] [--filas-por-escritura 2000]
+
+Sale con código 1 si con el perfil WAL alguna lectura falla o su p99 pasa de
+--max-lectura-ms. Lectores y escritor son procesos aparte (como los workers
+del servidor); con menos núcleos que procesos parte de la latencia que queda
+es el reparto de CPU del sistema operativo, no candados de SQLite.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app import create_app, db
+from app.models import Asistencia, Inscripcion, upsert_asistencias
+
+HOY = date.today()
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))] if ordenados else 0.0
+
+def _app(ruta, pragmas):
+    class ConfigConcurrencia(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + ruta
+        SQLITE_PRAGMAS = pragmas
+        SQLITE_ESCRITURA_MAX_MS = None
+    return create_app(ConfigConcurrencia)
+
+def escritor(ruta, pragmas, filas_por_escritura, inicio, alto, salida):
+    """ Proceso que escribe lotes de asistencias (un día distinto cada lote) hasta que le avisen """
+    app = _app(ruta, pragmas)
+    escrituras = errores = 0
+    with app.app_context():
+        inscripciones = [(i.socio_id, i.horario_id)
+                         for i in Inscripcion.query.filter_by(activo=True).limit(filas_por_escritura)]
+        db.session.rollback()
+        inicio.wait()
+        while not alto.is_set():
+            fecha = HOY - timedelta(days=30 + escrituras + errores + 1)
+            filas = [{'socio_id': s, 'horario_id': h, 'fecha': fecha, 'estado': 'Presente', 'timestamp': None}
+                     for s, h in inscripciones]
+            try:
+                upsert_asistencias(filas)
+                db.session.commit()
+                escrituras += 1
+            except OperationalError:
+                db.session.rollback()
+                errores += 1
+    salida.put(('escritor', escrituras, errores))
+
+def lector(ruta, pragmas, horario_id, inicio, alto, salida):
+    """ Proceso que lee la lista de una clase (lo que hace tomar_lista) en bucle """
+    app = _app(ruta, pragmas)
+    latencias, errores = [], 0
+    with app.app_context():
+        inicio.wait()
+        while not alto.is_set():
+            antes = time.perf_counter()
+            try:
+                Inscripcion.query.filter_by(horario_id=horario_id, activo=True).all()
+                Asistencia.query.filter_by(horario_id=horario_id, fecha=HOY).all()
+                db.session.rollback()  # Terminar la lectura como al cerrar la petición
+                latencias.append((time.perf_counter() - antes) * 1000)
+            except OperationalError:
+                db.session.rollback()
+                errores += 1
+    salida.put(('lector', latencias, errores))
+
+def correr(nombre, pragmas, args):
+    temporal = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    temporal.close()
+
+    try:
+        app = _app(temporal.name, pragmas)
+        with app.app_context():
+            from app.generador import generar
+            generar(socios=args.socios, semanas_asistencia=4, hasta=HOY, semilla=args.semilla)
+            horario_id = db.session.query(Inscripcion.horario_id).group_by(Inscripcion.horario_id)\
+                .order_by(db.func.count().desc()).limit(1).scalar()
+            modo = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+            db.session.remove()
+            db.engine.dispose()
+
+        # Procesos (como los workers de gunicorn): sin GIL compartido entre lectores y escritor
+        contexto = multiprocessing.get_context('spawn')
+        inicio, alto, salida = contexto.Barrier(args.lectores + 2), contexto.Event(), contexto.Queue()
+        procesos = [contexto.Process(target=escritor, args=(temporal.name, pragmas, args.filas_por_escritura,
+                                                              inicio, alto, salida))]
+        procesos += [contexto.Process(target=lector, args=(temporal.name, pragmas, horario_id, inicio, alto, salida))
+                     for _ in range(args.lectores)]
+        for proceso in procesos:
+            proceso.start()
+        inicio.wait()
+        time.sleep(args.segundos)
+        alto.set()
+
+        latencias, errores_lectura = [], 0
+        escrituras = errores_escritura = 0
+        for _ in procesos:
+            tipo, datos, errores = salida.get()
+            if tipo == 'escritor':
+                escrituras, errores_escritura = datos, errores
+            else:
+                latencias += datos
+                errores_lectura += errores
+        for proceso in procesos:
+            proceso.join()
+
+        resultado = {
+            'perfil': nombre, 'journal_mode': modo, 'lecturas': len(latencias), 'errores_lectura': errores_lectura,
+            'p50': statistics.median(latencias) if latencias else 0.0, 'p99': _percentil(latencias, 99),
+            'max': max(latencias, default=0.0), 'escrituras': escrituras, 'errores_escritura': errores_escritura,
+        }
+        print(f"{nombre:<8} {modo:<7} {resultado['lecturas']:>9} {resultado['p50']:>8.2f} {resultado['p99']:>8.2f} "
+              f"{resultado['max']:>9.2f} {resultado['errores_lectura']:>7} {resultado['escrituras']:>11} "
+              f"{resultado['errores_escritura']:>7}")
+        return resultado
+    finally:
+        for sufijo in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(temporal.name + sufijo):
+                os.remove(temporal.name + sufijo)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--socios', type=int, default=2000)
+    parser.add_argument('--filas-por-escritura', type=int, default=2000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--max-lectura-ms', type=float, default=50.0,
+                        help='p99 de lectura permitido con el perfil WAL')
+    args = parser.parse_args()
+
+    print(f"{'perfil':<8} {'diario':<7} {'lecturas':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>9} "
+          f"{'errores':>7} {'escrituras':>11} {'errores':>7}")
+    clasico = correr('clásico', {'journal_mode': 'DELETE'}, args)
+    wal = correr('wal', Config.SQLITE_PRAGMAS, args)
+
+    fallas = []
+    if wal['errores_lectura']:
+        fallas.append(f"{wal['errores_lectura']} lecturas fallaron con WAL")
+    if wal['p99'] > args.max_lectura_ms:
+        fallas.append(f"p99 de lectura con WAL {wal['p99']:.1f} ms > {args.max_lectura_ms:.0f} ms")
+    if not wal['escrituras']:
+        fallas.append('El escritor no logró ninguna escritura con WAL')
+
+    if clasico['p99']:
+        print(f"p99 de lectura: {clasico['p99']:.1f} ms -> {wal['p99']:.1f} ms "
+              f"({clasico['p99'] / max(wal['p99'], 0.001):.1f}x); "
+              f"lecturas completadas: {clasico['lecturas']} -> {wal['lecturas']}")
+    for falla in fallas:
+        print(f'❌ {falla}')
+    if fallas:
+        return 1
+    print('✅ Con WAL las lecturas no esperan a las escrituras.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
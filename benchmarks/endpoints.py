@@ -0,0 +1,326 @@
+"""
+Benchmark de las rutas más usadas contra un conjunto de datos generado.
+
+Genera (o reutiliza) una base sintética con app/generador.py, recorre cada
+ruta con el cliente de pruebas de Flask y registra por ruta:
+  - latencia (p50, p95, p99, media y máxima, en ms),
+  - consultas SQL por petición (encabezado X-DB-Consultas) y su presupuesto,
+  - memoria pico de Python durante la petición (tracemalloc, pasada aparte).
+
+Las rutas se recorren en --rondas vueltas intercaladas y de cada ruta se
+conserva la vuelta con menor p50 (el ruido de la máquina solo suma tiempo).
+
+Uso:
+    python benchmarks/endpoints.py [--socios 2000] [--iteraciones 50]
+    python benchmarks/endpoints.py --guardar benchmarks/baselines/socios_2000.json
+    python benchmarks/endpoints.py --comparar benchmarks/baselines/socios_2000.json [--umbral 0.25]
+    python benchmarks/endpoints.py --solo socios.perfil --solo academico.inscribir
+
+La base generada se guarda en benchmarks/.datos/ (una por tamaño, semilla,
+fecha y versión del esquema) y cada corrida trabaja sobre una copia. Con
+--comparar sale con código 1 si alguna ruta empeoró más allá del umbral.
+Corre con PRESUPUESTO_CONSULTAS_ESTRICTO: si una ruta rebasa su
+@presupuesto_consultas el benchmark se detiene con código 1.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import url_for
+from config import Config
+from app import create_app, db
+from app.instrumentacion import PresupuestoExcedido
+from app.models import Horario, Inscripcion, Pago, EstatusSocio, reconstruir_agendas
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.datos')
+
+# Diferencias de latencia menores a esto son ruido, aunque en % parezcan grandes
+PISO_LATENCIA_MS = 0.5
+
+class ConfigBenchmark(Config):
+    WTF_CSRF_ENABLED = False
+    INSTRUMENTACION_ENCABEZADOS = True
+    # Una ruta que rebasa su @presupuesto_consultas detiene el benchmark (no solo se anota)
+    PRESUPUESTO_CONSULTAS_ESTRICTO = True
+    PROPAGATE_EXCEPTIONS = True
+    PLANIFICADOR_HABILITADO = False  # Sin tareas de fondo compitiendo con las mediciones
+
+def huella_esquema():
+    """ 8 caracteres que cambian cuando cambian las tablas o columnas de app/models.py """
+    import app.models  # noqa: F401 (registra las tablas en db.metadata)
+    esquema = sorted((tabla.name, sorted((c.name, str(c.type)) for c in tabla.columns))
+                     for tabla in db.metadata.sorted_tables)
+    return hashlib.sha1(repr(esquema).encode()).hexdigest()[:8]
+
+def preparar_datos(socios, semilla, hasta):
+    """ Ruta de la base pristina para (socios, semilla, hasta, esquema); la genera si no existe """
+    os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_DATOS,
+                        f'socios_{socios}_s{semilla}_{hasta.isoformat()}_{huella_esquema()}.db')
+    if os.path.exists(ruta):
+        return ruta
+
+    from app.generador import generar
+
+    class ConfigGenerar(ConfigBenchmark):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + ruta + '.tmp'
+
+    print(f'Generando {socios} socios (semilla {semilla}, hasta {hasta})...')
+    inicio = time.perf_counter()
+    with create_app(ConfigGenerar).app_context():
+        generar(socios=socios, semilla=semilla, hasta=hasta)
+        db.engine.dispose()
+    os.replace(ruta + '.tmp', ruta)
+    print(f'Base generada en {time.perf_counter() - inicio:.1f}s: {ruta}')
+    return ruta
+
+def objetivos(app, cantidad):
+    """
+    IDs con los que se pega a cada ruta: la clase más llena, el socio con más
+    historial y 'cantidad' socios al corriente listos para inscribirse (se les
+    da de baja de una clase aquí, fuera de la medición, para que el POST
+    recorra el camino completo de alta y commit).
+    """
+    with app.app_context():
+        horario = Horario.query.order_by(Horario.ocupados.desc(), Horario.id).first()
+        alumnos = [socio_id for (socio_id,) in db.session.query(Inscripcion.socio_id)
+                   .join(EstatusSocio, EstatusSocio.socio_id == Inscripcion.socio_id)
+                   .filter(Inscripcion.horario_id == horario.id, Inscripcion.activo == True,
+                           EstatusSocio.estado == 'activo').order_by(Inscripcion.socio_id)]
+        socio_perfil = db.session.query(Pago.socio_id).group_by(Pago.socio_id)\
+            .order_by(db.func.count().desc(), Pago.socio_id).limit(1).scalar()
+
+        # Una inscripción activa por socio al corriente, excepto la clase de tomar_lista
+        candidatas = Inscripcion.query.join(EstatusSocio, EstatusSocio.socio_id == Inscripcion.socio_id)\
+            .filter(Inscripcion.activo == True, EstatusSocio.estado == 'activo',
+                    Inscripcion.horario_id != horario.id)\
+            .order_by(Inscripcion.id).all()
+        inscripciones, vistos = [], set()
+        for insc in candidatas:
+            if insc.socio_id not in vistos:
+                vistos.add(insc.socio_id)
+                inscripciones.append(insc)
+            if len(inscripciones) >= cantidad:
+                break
+        if len(inscripciones) < cantidad:
+            raise SystemExit(f'Solo hay {len(inscripciones)} socios para academico.inscribir; '
+                             f'use más --socios o menos --iteraciones.')
+
+        altas = []
+        for insc in inscripciones:
+            insc.activo = False
+            insc.horario.ocupados -= 1
+            altas.append((insc.socio_id, insc.horario_id))
+        db.session.commit()
+        reconstruir_agendas()  # Las bajas de arriba no pasaron por academico.baja
+        db.session.commit()
+
+        return {'horario': horario.id, 'alumnos': alumnos, 'perfil': socio_perfil, 'altas': altas}
+
+def casos(ids):
+    """ [(nombre, función(i) -> (método, endpoint, args de url_for, kwargs del cliente))] """
+    alumnos = ids['alumnos']
+    estados = ('Presente', 'Falta', 'Justificado')
+    return [
+        ('asistencia.tomar_lista', lambda i: ('get', 'asistencia.tomar_lista', {'horario_id': ids['horario']}, {})),
+        ('asistencia.marcar_asistencia', lambda i: (
+            'post', 'asistencia.marcar_asistencia', {},
+            {'json': {'socio_id': alumnos[i % len(alumnos)], 'horario_id': ids['horario'],
+                      'estado': estados[i % len(estados)]}})),
+        ('horarios.calendario', lambda i: ('get', 'horarios.calendario', {}, {})),
+        ('reportes.dashboard', lambda i: ('get', 'reportes.dashboard', {}, {})),
+        ('socios.lista', lambda i: ('get', 'socios.lista', {}, {})),
+        ('socios.perfil', lambda i: ('get', 'socios.perfil', {'id': ids['perfil']}, {})),
+        ('academico.inscribir', lambda i: (
+            'post', 'academico.inscribir', {'socio_id': ids['altas'][i][0]},
+            {'data': {'horario_id': ids['altas'][i][1]}})),
+        ('finanzas.consultar_precio', lambda i: (
+            'post', 'finanzas.consultar_precio', {},
+            {'json': {'socio_id': ids['perfil'], 'concepto': 'Mensualidad'}})),
+    ]
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+def medir(app, cliente, nombre, peticion, calentamiento, iteraciones, pasadas_memoria, desde=0):
+    """ Mide una ruta con las peticiones peticion(desde), peticion(desde + 1)... """
+    endpoint = peticion(0)[1]
+    with app.test_request_context():
+        urls = {i: url_for(peticion(desde + i)[1], **peticion(desde + i)[2])
+                for i in range(calentamiento + iteraciones + pasadas_memoria)}
+
+    def hacer(i):
+        metodo, _, _, kwargs = peticion(desde + i)
+        try:
+            respuesta = getattr(cliente, metodo)(urls[i], **kwargs)
+        except PresupuestoExcedido as error:
+            raise SystemExit(f'{nombre}: presupuesto de consultas excedido en {urls[i]}: {error}')
+        if respuesta.status_code >= 400:
+            raise SystemExit(f'{nombre}: HTTP {respuesta.status_code} en {urls[i]}\n{respuesta.get_data(as_text=True)[:500]}')
+        # Los errores de formulario hacen flash y redirigen a la misma página
+        if respuesta.status_code == 302 and metodo == 'post' and respuesta.location.endswith(urls[i]):
+            raise SystemExit(f'{nombre}: el POST a {urls[i]} fue rechazado (redirigió a sí mismo)')
+        return respuesta
+
+    gc.collect()
+
+    for i in range(calentamiento):
+        hacer(i)
+
+    latencias, consultas, tiempos_bd = [], [], []
+    for i in range(calentamiento, calentamiento + iteraciones):
+        inicio = time.perf_counter()
+        respuesta = hacer(i)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(int(respuesta.headers.get('X-DB-Consultas', 0)))
+        tiempos_bd.append(float(respuesta.headers.get('X-DB-Tiempo-Ms', 0)))
+
+    # tracemalloc hace lenta cada asignación: la memoria se mide aparte
+    picos = []
+    for i in range(calentamiento + iteraciones, calentamiento + iteraciones + pasadas_memoria):
+        tracemalloc.start()
+        hacer(i)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    presupuesto = getattr(app.view_functions[endpoint], 'presupuesto_consultas', (None, None))[0]
+    return {
+        'muestras': iteraciones,
+        'p50_ms': round(statistics.median(latencias), 3),
+        'p95_ms': round(_percentil(latencias, 95), 3),
+        'p99_ms': round(_percentil(latencias, 99), 3),
+        'media_ms': round(statistics.fmean(latencias), 3),
+        'max_ms': round(max(latencias), 3),
+        'bd_p50_ms': round(statistics.median(tiempos_bd), 3),
+        'consultas': max(consultas),
+        'presupuesto': presupuesto,
+        'memoria_pico_kb': round(max(picos) / 1024, 1) if picos else None,
+    }
+
+def comparar(actual, base, umbral):
+    """ Lista de regresiones (texto) de 'actual' contra la línea base """
+    regresiones = []
+    if actual['datos'] != base['datos']:
+        print(f"⚠️  La línea base usó otros datos ({base['datos']}); la comparación es orientativa.")
+
+    print(f"\n{'ruta':<30} {'p50 base':>9} {'p50':>9} {'Δ':>7} {'p95 base':>9} {'p95':>9} {'Δ':>7} "
+          f"{'consultas':>10} {'memoria KB':>16}")
+    for nombre, medida in actual['rutas'].items():
+        anterior = base['rutas'].get(nombre)
+        if anterior is None:
+            print(f'{nombre:<30} (sin línea base)')
+            continue
+
+        marcas = []
+        for campo in ('p50_ms', 'p95_ms'):
+            if medida[campo] > anterior[campo] * (1 + umbral) and medida[campo] - anterior[campo] > PISO_LATENCIA_MS:
+                marcas.append(f'{campo} {anterior[campo]:.2f} -> {medida[campo]:.2f}')
+        if medida['consultas'] > anterior['consultas']:
+            marcas.append(f"consultas {anterior['consultas']} -> {medida['consultas']}")
+        if medida['memoria_pico_kb'] and anterior.get('memoria_pico_kb') and \
+                medida['memoria_pico_kb'] > anterior['memoria_pico_kb'] * (1 + umbral):
+            marcas.append(f"memoria {anterior['memoria_pico_kb']:.0f}KB -> {medida['memoria_pico_kb']:.0f}KB")
+
+        delta = lambda campo: f'{(medida[campo] / anterior[campo] - 1) * 100:+.0f}%' if anterior[campo] else ''
+        print(f"{nombre:<30} {anterior['p50_ms']:>9.2f} {medida['p50_ms']:>9.2f} {delta('p50_ms'):>7} "
+              f"{anterior['p95_ms']:>9.2f} {medida['p95_ms']:>9.2f} {delta('p95_ms'):>7} "
+              f"{anterior['consultas']:>4} -> {medida['consultas']:<3} "
+              f"{anterior.get('memoria_pico_kb') or 0:>7.0f} -> {medida['memoria_pico_kb'] or 0:<7.0f}"
+              + ('  ❌' if marcas else ''))
+        regresiones += [f'{nombre}: {marca}' for marca in marcas]
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socios', type=int, default=2000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--hasta', type=date.fromisoformat, default=date.today(),
+                        help='Fecha final del historial generado (por defecto hoy: los estatus dependen de la fecha)')
+    parser.add_argument('--iteraciones', type=int, default=50)
+    parser.add_argument('--calentamiento', type=int, default=5)
+    parser.add_argument('--pasadas-memoria', type=int, default=3)
+    parser.add_argument('--rondas', type=int, default=3, help='Vueltas intercaladas; se conserva la de menor p50')
+    parser.add_argument('--solo', action='append', help='Medir solo esta ruta (se puede repetir)')
+    parser.add_argument('--guardar', help='Escribir los resultados como línea base JSON')
+    parser.add_argument('--comparar', help='Línea base JSON contra la que comparar')
+    parser.add_argument('--umbral', type=float, default=0.25,
+                        help='Empeoramiento relativo permitido en latencia y memoria (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    pristina = preparar_datos(args.socios, args.semilla, args.hasta)
+    temporal = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    temporal.close()
+    shutil.copyfile(pristina, temporal.name)
+
+    class ConfigCorrida(ConfigBenchmark):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + temporal.name
+
+    try:
+        app = create_app(ConfigCorrida)
+        por_ruta = args.calentamiento + args.iteraciones + args.pasadas_memoria
+        ids = objetivos(app, por_ruta * args.rondas)
+
+        cliente = app.test_client()
+        respuesta = cliente.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        if respuesta.status_code != 302:
+            raise SystemExit(f'No se pudo iniciar sesión (HTTP {respuesta.status_code})')
+
+        resultados = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'datos': {'socios': args.socios, 'semilla': args.semilla},
+            'iteraciones': args.iteraciones,
+            'rondas': args.rondas,
+            'rutas': {},
+        }
+        seleccion = [(nombre, peticion) for nombre, peticion in casos(ids) if not args.solo or nombre in args.solo]
+        for ronda in range(args.rondas):
+            for nombre, peticion in seleccion:
+                medida = medir(app, cliente, nombre, peticion, args.calentamiento, args.iteraciones,
+                               args.pasadas_memoria, desde=ronda * por_ruta)
+                anterior = resultados['rutas'].get(nombre)
+                if anterior is None or medida['p50_ms'] < anterior['p50_ms']:
+                    resultados['rutas'][nombre] = medida
+
+        print(f"{'ruta':<30} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'consultas':>10} {'memoria KB':>11}")
+        for nombre, medida in resultados['rutas'].items():
+            print(f"{nombre:<30} {medida['p50_ms']:>8.2f} {medida['p95_ms']:>8.2f} {medida['p99_ms']:>8.2f} "
+                  f"{medida['max_ms']:>8.2f} {medida['consultas']:>4}/{medida['presupuesto'] or '-':<5} "
+                  f"{medida['memoria_pico_kb'] or 0:>11.0f}")
+
+        if args.guardar:
+            os.makedirs(os.path.dirname(os.path.abspath(args.guardar)), exist_ok=True)
+            with open(args.guardar, 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+                archivo.write('\n')
+            print(f'Línea base guardada en {args.guardar}')
+
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as archivo:
+                base = json.load(archivo)
+            regresiones = comparar(resultados, base, args.umbral)
+            for regresion in regresiones:
+                print(f'❌ {regresion}')
+            if regresiones:
+                return 1
+            print(f'✅ Sin regresiones mayores a {args.umbral:.0%} contra {args.comparar}.')
+        return 0
+    finally:
+        os.remove(temporal.name)
+
+if __name__ == '__main__':
+    sys.exit(main())
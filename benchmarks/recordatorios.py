@@ -0,0 +1,167 @@
+"""
+Recordatorios de pago contra un servidor SMTP local de prueba.
+
+Levanta un SMTP mínimo en 127.0.0.1 (cuenta los mensajes; con --fallar-cada N
+contesta 451 a uno de cada N destinatarios y con --latencia-ms simula un
+proveedor lento), genera una base con app/generador.py y corre
+enviar_recordatorios() con el transporte SMTP. Verifica que:
+  - cada aviso marcado como enviado llegó al servidor exactamente una vez,
+  - los 451 se reintentaron y terminaron enviados,
+  - una segunda corrida no vuelve a enviar nada (bitácora 'recordatorio'),
+  - la corrida completa termina en menos de --max-segundos.
+
+Uso:
+    python benchmarks/recordatorios.py [--socios 10000] [--dias-vencido 400] [--hilos 8] [--fallar-cada 50]
+
+Sale con código 1 si alguna verificación falla.
+"""
+import argparse
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Recordatorio
+from app.recordatorios import TransporteSMTP, enviar_recordatorios
+from endpoints import ConfigBenchmark, preparar_datos
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    """ SMTP de juguete: acepta todo, guarda los destinatarios entregados """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fallar_cada=0, latencia_ms=0):
+        super().__init__(('127.0.0.1', 0), ManejadorSMTP)
+        self.fallar_cada, self.latencia = fallar_cada, latencia_ms / 1000
+        self.entregados = Counter()
+        self.rcpt = self.rechazados = 0
+        self.lock = threading.Lock()
+
+class ManejadorSMTP(socketserver.StreamRequestHandler):
+    def responder(self, linea):
+        self.wfile.write(linea.encode() + b'\r\n')
+
+    def handle(self):
+        servidor, destinatarios = self.server, []
+        self.responder('220 stub ESMTP')
+        for linea in self.rfile:
+            comando = linea.decode(errors='replace').strip()
+            verbo = comando[:4].upper()
+            if verbo in ('EHLO', 'HELO'):
+                self.responder('250 stub')
+            elif verbo == 'MAIL':
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                with servidor.lock:
+                    servidor.rcpt += 1
+                    falla = servidor.fallar_cada and servidor.rcpt % servidor.fallar_cada == 0
+                    servidor.rechazados += bool(falla)
+                if falla:
+                    self.responder('451 Intente más tarde')
+                else:
+                    destinatarios.append(comando.split(':', 1)[1].strip(' <>'))
+                    self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                for dato in self.rfile:
+                    if dato in (b'.\r\n', b'.\n'):
+                        break
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                with servidor.lock:
+                    servidor.entregados.update(destinatarios)
+                self.responder('250 OK en cola')
+            elif verbo == 'QUIT':
+                self.responder('221 Adiós')
+                break
+            else:  # RSET, NOOP
+                self.responder('250 OK')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socios', type=int, default=10000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--dias-vencido', type=int, default=400,
+                        help='Ventana de vencidos (amplia para tener miles de avisos)')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--por-segundo', type=float, default=0, help='Límite de envío; 0 = sin límite')
+    parser.add_argument('--fallar-cada', type=int, default=50, help='451 a uno de cada N destinatarios; 0 = nunca')
+    parser.add_argument('--latencia-ms', type=float, default=2.0, help='Demora del servidor por mensaje')
+    parser.add_argument('--max-segundos', type=float, default=30.0)
+    args = parser.parse_args()
+
+    pristina = preparar_datos(args.socios, args.semilla, date.today())
+    directorio = tempfile.mkdtemp(prefix='recordatorios_')
+    ruta = os.path.join(directorio, 'bench.db')
+    shutil.copyfile(pristina, ruta)
+
+    servidor = ServidorSMTP(args.fallar_cada, args.latencia_ms)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    class ConfigRecordatorios(ConfigBenchmark):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + ruta
+        RECORDATORIOS_DIAS_VENCIDO = args.dias_vencido
+        RECORDATORIOS_HILOS = args.hilos
+        RECORDATORIOS_POR_SEGUNDO = args.por_segundo
+        RECORDATORIOS_ESPERA_BASE = 0.01
+
+    def transporte():
+        return TransporteSMTP('127.0.0.1', servidor.server_address[1], remitente='cobranza@swimmers.test')
+
+    fallas = []
+    try:
+        app = create_app(ConfigRecordatorios)
+        with app.app_context():
+            primera = enviar_recordatorios(transporte=transporte())
+            segunda = enviar_recordatorios(transporte=transporte())
+            en_bitacora = Counter(estado for (estado,) in db.session.query(Recordatorio.estado))
+            esperados = Counter(destino for (destino,) in db.session.query(Recordatorio.destino)
+                                .filter(Recordatorio.estado == 'enviado'))
+            db.engine.dispose()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    segundos = primera['segundos']
+    print(f"Candidatos: {primera['candidatos']}, enviados: {primera['enviado']}, fallidos: {primera['fallido']}, "
+          f"rechazados: {primera['rechazado']} en {segundos:.2f} s "
+          f"({primera['enviado'] / max(segundos, 1e-9):,.0f} mensajes/s, {args.hilos} hilos)")
+    print(f'Servidor: {sum(servidor.entregados.values())} entregados, {servidor.rechazados} respuestas 451')
+    print(f"Segunda corrida: {segunda['candidatos']} candidatos; bitácora: {dict(en_bitacora)}")
+
+    # Un socio puede recibir dos avisos (mensualidad y anualidad): se compara contra la bitácora
+    repetidos = sum(1 for destino, total in servidor.entregados.items() if total > esperados[destino])
+    if primera['candidatos'] < 1000:
+        fallas.append(f"Solo {primera['candidatos']} candidatos (usar más --socios o --dias-vencido)")
+    if sum(servidor.entregados.values()) != primera['enviado'] or servidor.entregados != esperados:
+        fallas.append('Los enviados no coinciden con lo que recibió el servidor')
+    if repetidos:
+        fallas.append(f'{repetidos} destinatarios recibieron avisos repetidos')
+    if primera['fallido'] or primera['rechazado']:
+        fallas.append('Los 451 debieron reintentarse hasta entregarse')
+    if segunda['candidatos']:
+        fallas.append(f"La segunda corrida volvió a seleccionar {segunda['candidatos']} avisos")
+    if en_bitacora.get('enviado', 0) != primera['enviado']:
+        fallas.append('La bitácora no registra todos los envíos')
+    if segundos > args.max_segundos:
+        fallas.append(f'{segundos:.1f} s > {args.max_segundos:.0f} s')
+
+    for falla in fallas:
+        print(f'❌ {falla}')
+    if fallas:
+        return 1
+    print('✅ Cada aviso se entregó una sola vez y la segunda corrida no repitió nada.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,4 +7,66 @@ class Config:
     # Base de datos SQLite local llamada 'swimmers.db'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'swimmers.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Instrumentación SQL por petición (ver app/instrumentacion.py)
+    # Encabezados X-DB-Consultas / X-DB-Tiempo-Ms (por defecto solo en modo debug)
+    INSTRUMENTACION_ENCABEZADOS = os.environ.get('INSTRUMENTACION_ENCABEZADOS') == '1' or None
+    # En pruebas: fallar si una ruta rebasa su @presupuesto_consultas
+    PRESUPUESTO_CONSULTAS_ESTRICTO = False
+
+    # Métricas por endpoint en formato Prometheus (ver app/metricas.py)
+    METRICAS_HABILITADAS = os.environ.get('METRICAS_HABILITADAS') == '1'
+    METRICAS_VENTANA = 1024 # Muestras de latencia por endpoint para p50/p95/p99
+    METRICAS_TOP_SQL = 20   # Sentencias SQL más lentas que se conservan
+
+    # Caché de fragmentos (ver app/cache.py): entradas máximas por caché
+    CACHE_AGENDA_MAX = 256
+    # Catálogos en memoria (ver app/catalogos.py): cada cuánto revisar si otro proceso los cambió
+    CATALOGOS_REVALIDAR_SEGUNDOS = 30
+    # Analítica de asistencia (ver app/analitica.py): segundos que se reutiliza una carga por proceso
+    ANALITICA_VIGENCIA_SEGUNDOS = 300
+    # Folios (ver app/folios.py): números que cada proceso reserva de una vez
+    FOLIOS_TAMANO_BLOQUE = 20
+
+    # Perfil de SQLite (ver app/perfil_sqlite.py). {} deja los valores por defecto de SQLite.
+    SQLITE_PRAGMAS = {
+        'busy_timeout': 5000,           # ms que una escritura espera su turno antes de "database is locked"
+        'journal_mode': 'WAL',          # lectores no esperan a los escritores
+        'synchronous': 'NORMAL',        # en WAL: sin fsync por commit, solo en los checkpoints
+        'cache_size': -20000,           # ~20 MB de páginas por conexión
+        'mmap_size': 268435456,         # 256 MB leídos por mmap
+        'temp_store': 'MEMORY',         # ORDER BY / GROUP BY temporales en memoria
+        'wal_autocheckpoint': 1000,     # checkpoint automático cada ~4 MB de WAL
+        'journal_size_limit': 67108864, # el -wal se recorta a 64 MB tras un checkpoint
+    }
+    # Tiempo máximo que una transacción retiene el candado de escritura (se registra si lo pasa)
+    SQLITE_ESCRITURA_MAX_MS = 250
+    # En pruebas: hacer fallar el commit de la transacción que lo rebase
+    SQLITE_ESCRITURA_ESTRICTA = False
+
+    # Tareas en segundo plano (ver app/planificador.py). Apagar en los workers web si
+    # se corre aparte con 'flask tareas trabajar'.
+    PLANIFICADOR_HABILITADO = os.environ.get('PLANIFICADOR_HABILITADO', '1') == '1'
+    PLANIFICADOR_HILOS = 2               # tareas a la vez por proceso
+    PLANIFICADOR_INTERVALO = 15          # segundos entre revisiones de la tabla
+    PLANIFICADOR_CANDADO_SEGUNDOS = 600  # si el proceso muere, otro retoma la tarea tras esto
+
+    # Recordatorios de pago (ver app/recordatorios.py). Sin transporte no se envía nada.
+    RECORDATORIOS_TRANSPORTE = os.environ.get('RECORDATORIOS_TRANSPORTE')  # smtp, webhook, registro
+    RECORDATORIOS_DIAS_AVISO = 3       # avisar cuando falten estos días para el vencimiento
+    RECORDATORIOS_DIAS_VENCIDO = 30    # no avisar vencimientos más viejos que esto (bajas)
+    RECORDATORIOS_HILOS = 8            # envíos en paralelo
+    RECORDATORIOS_POR_SEGUNDO = 50     # tope del proveedor; 0 = sin límite
+    RECORDATORIOS_REINTENTOS = 2       # reintentos inmediatos ante errores temporales
+    RECORDATORIOS_ESPERA_BASE = 0.5    # segundos antes del primer reintento (luego se duplica)
+    RECORDATORIOS_MAX_INTENTOS = 9     # intentos acumulados entre corridas antes de rendirse
+    RECORDATORIOS_LOTE = 500           # mensajes por lote (se guarda la bitácora al terminar cada uno)
+    SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+    SMTP_PUERTO = int(os.environ.get('SMTP_PUERTO', 25))
+    SMTP_USUARIO = os.environ.get('SMTP_USUARIO')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_TLS = os.environ.get('SMTP_TLS') == '1'
+    SMTP_REMITENTE = os.environ.get('SMTP_REMITENTE')
+    RECORDATORIOS_WEBHOOK_URL = os.environ.get('RECORDATORIOS_WEBHOOK_URL')
+    RECORDATORIOS_WEBHOOK_TOKEN = os.environ.get('RECORDATORIOS_WEBHOOK_TOKEN')
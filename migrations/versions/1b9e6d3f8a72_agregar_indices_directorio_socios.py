@@ -0,0 +1,28 @@
+"""Agregar índices del directorio de socios
+
+Revision ID: 1b9e6d3f8a72
+Revises: c7d4a91e5f23
+Create Date: 2026-10-18 12:02:40.337190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b9e6d3f8a72'
+down_revision = 'c7d4a91e5f23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('socio', schema=None) as batch_op:
+        batch_op.create_index('ix_socio_nivel_id', ['nivel', 'id'], unique=False)
+        batch_op.create_index('ix_socio_membresia_id', ['membresia_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('socio', schema=None) as batch_op:
+        batch_op.drop_index('ix_socio_membresia_id')
+        batch_op.drop_index('ix_socio_nivel_id')
@@ -0,0 +1,26 @@
+"""Agregar índice (socio_id, fecha_pago) para el historial del perfil
+
+Revision ID: 2e8c4b7a9f15
+Revises: d7b1f4a9c362
+Create Date: 2026-10-18 17:58:06.442193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8c4b7a9f15'
+down_revision = 'd7b1f4a9c362'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.create_index('ix_pago_socio_fecha', ['socio_id', 'fecha_pago'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.drop_index('ix_pago_socio_fecha')
@@ -0,0 +1,56 @@
+"""Asistencia única por socio/clase/día y llaves de sincronización
+
+Revision ID: 4d8a2f6c1e93
+Revises: 1b9e6d3f8a72
+Create Date: 2026-10-18 14:10:05.912344
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8a2f6c1e93'
+down_revision = '1b9e6d3f8a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Quitar duplicados antes de la restricción: se conserva la marca más reciente
+    op.execute("""
+        DELETE FROM asistencia WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY socio_id, horario_id, fecha
+                    ORDER BY timestamp DESC, id DESC
+                ) AS orden
+                FROM asistencia
+            ) WHERE orden = 1
+        )
+    """)
+
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_asistencia_socio_horario_fecha', ['socio_id', 'horario_id', 'fecha'])
+
+    op.create_table('marca_procesada',
+    sa.Column('clave', sa.String(length=64), nullable=False),
+    sa.Column('socio_id', sa.Integer(), nullable=False),
+    sa.Column('horario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('resultado', sa.String(length=20), nullable=False),
+    sa.Column('procesada', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('clave')
+    )
+    with op.batch_alter_table('marca_procesada', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_marca_procesada_procesada'), ['procesada'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('marca_procesada', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_marca_procesada_procesada'))
+
+    op.drop_table('marca_procesada')
+
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_asistencia_socio_horario_fecha', type_='unique')
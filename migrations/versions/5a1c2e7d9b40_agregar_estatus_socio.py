@@ -0,0 +1,80 @@
+"""Agregar tabla estatus_socio
+
+Revision ID: 5a1c2e7d9b40
+Revises: b6ebbd5ab5f4
+Create Date: 2026-10-18 09:12:44.218301
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1c2e7d9b40'
+down_revision = 'b6ebbd5ab5f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    estatus_socio = op.create_table('estatus_socio',
+    sa.Column('socio_id', sa.Integer(), nullable=False),
+    sa.Column('ultima_anualidad', sa.DateTime(), nullable=True),
+    sa.Column('ultima_mensualidad', sa.DateTime(), nullable=True),
+    sa.Column('vence_anualidad', sa.DateTime(), nullable=True),
+    sa.Column('vence_mensualidad', sa.DateTime(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('actualizado', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['socio_id'], ['socio.id'], ),
+    sa.PrimaryKeyConstraint('socio_id')
+    )
+    with op.batch_alter_table('estatus_socio', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_estatus_socio_estado'), ['estado'], unique=False)
+
+    # --- Llenado inicial desde el historial de pagos ---
+    pago = sa.table('pago',
+        sa.column('socio_id', sa.Integer()),
+        sa.column('concepto_tipo', sa.String()),
+        sa.column('fecha_pago', sa.DateTime()))
+
+    filas = op.get_bind().execute(
+        sa.select(pago.c.socio_id, pago.c.concepto_tipo, sa.func.max(pago.c.fecha_pago))
+        .where(pago.c.concepto_tipo.in_(['Anualidad', 'Mensualidad']))
+        .group_by(pago.c.socio_id, pago.c.concepto_tipo)
+    ).all()
+
+    ultimos = {}
+    for socio_id, concepto, fecha in filas:
+        ultimos.setdefault(socio_id, {})[concepto] = fecha
+
+    ahora = datetime.now()
+    registros = []
+    for socio_id, fechas in ultimos.items():
+        anual, mes = fechas.get('Anualidad'), fechas.get('Mensualidad')
+        if anual and mes and (ahora - anual).days <= 365 and (ahora - mes).days <= 35:
+            estado = 'activo'
+        elif anual and mes:
+            estado = 'vencido'
+        else:
+            estado = 'sin_pago'
+        registros.append({
+            'socio_id': socio_id,
+            'ultima_anualidad': anual,
+            'ultima_mensualidad': mes,
+            'vence_anualidad': anual + timedelta(days=366) if anual else None,
+            'vence_mensualidad': mes + timedelta(days=36) if mes else None,
+            'estado': estado,
+            'actualizado': datetime.utcnow()
+        })
+
+    if registros:
+        op.bulk_insert(estatus_socio, registros)
+
+
+def downgrade():
+    with op.batch_alter_table('estatus_socio', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_estatus_socio_estado'))
+
+    op.drop_table('estatus_socio')
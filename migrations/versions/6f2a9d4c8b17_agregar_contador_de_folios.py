@@ -0,0 +1,43 @@
+"""Agregar tabla contador para folios de socios y recibos
+
+Revision ID: 6f2a9d4c8b17
+Revises: e1f3a8c6b254
+Create Date: 2026-10-18 16:05:12.503771
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2a9d4c8b17'
+down_revision = 'e1f3a8c6b254'
+branch_labels = None
+depends_on = None
+
+
+def _ultimo_numero(conexion, sql, prefijo):
+    # Se comparan como números: 'SW9999' < 'SW10000'
+    numeros = (folio[len(prefijo):] for (folio,) in conexion.execute(sa.text(sql)))
+    return max((int(numero) for numero in numeros if numero and numero.isdigit()), default=0)
+
+
+def upgrade():
+    contador = op.create_table('contador',
+    sa.Column('nombre', sa.String(length=30), nullable=False),
+    sa.Column('valor', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+
+    # Arrancar después de los folios ya emitidos
+    conexion = op.get_bind()
+    op.bulk_insert(contador, [
+        {'nombre': 'socio', 'valor': _ultimo_numero(
+            conexion, "SELECT folio FROM socio WHERE folio LIKE 'SW%'", 'SW')},
+        {'nombre': 'recibo', 'valor': _ultimo_numero(
+            conexion, "SELECT folio_recibo FROM pago WHERE folio_recibo LIKE 'REC-%'", 'REC-')},
+    ])
+
+
+def downgrade():
+    op.drop_table('contador')
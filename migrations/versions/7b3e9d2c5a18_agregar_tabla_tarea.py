@@ -0,0 +1,50 @@
+"""Agregar tabla tarea para el planificador en segundo plano
+
+Revision ID: 7b3e9d2c5a18
+Revises: 2e8c4b7a9f15
+Create Date: 2026-10-18 19:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9d2c5a18'
+down_revision = '2e8c4b7a9f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tarea',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=120), nullable=False),
+    sa.Column('funcion', sa.String(length=80), nullable=False),
+    sa.Column('argumentos', sa.Text(), nullable=True),
+    sa.Column('cron', sa.String(length=60), nullable=True),
+    sa.Column('proxima', sa.DateTime(), nullable=True),
+    sa.Column('activa', sa.Boolean(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('bloqueada_por', sa.String(length=80), nullable=True),
+    sa.Column('bloqueada_hasta', sa.DateTime(), nullable=True),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('max_intentos', sa.Integer(), nullable=False),
+    sa.Column('ejecuciones', sa.Integer(), nullable=False),
+    sa.Column('fallos', sa.Integer(), nullable=False),
+    sa.Column('ultima_ejecucion', sa.DateTime(), nullable=True),
+    sa.Column('ultima_duracion', sa.Float(), nullable=True),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('creada', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nombre')
+    )
+    with op.batch_alter_table('tarea', schema=None) as batch_op:
+        batch_op.create_index('ix_tarea_activa_proxima', ['activa', 'proxima'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tarea', schema=None) as batch_op:
+        batch_op.drop_index('ix_tarea_activa_proxima')
+
+    op.drop_table('tarea')
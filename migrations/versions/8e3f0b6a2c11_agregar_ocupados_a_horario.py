@@ -0,0 +1,38 @@
+"""Agregar contador ocupados a horario
+
+Revision ID: 8e3f0b6a2c11
+Revises: 5a1c2e7d9b40
+Create Date: 2026-10-18 10:03:27.551842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f0b6a2c11'
+down_revision = '5a1c2e7d9b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('horario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ocupados', sa.Integer(), nullable=False, server_default='0'))
+
+    # --- Llenado inicial con el conteo real de inscripciones activas ---
+    horario = sa.table('horario', sa.column('id', sa.Integer()), sa.column('ocupados', sa.Integer()))
+    inscripcion = sa.table('inscripcion',
+        sa.column('horario_id', sa.Integer()),
+        sa.column('activo', sa.Boolean()))
+
+    op.execute(horario.update().values(
+        ocupados=sa.select(sa.func.count())
+        .where(inscripcion.c.horario_id == horario.c.id, inscripcion.c.activo == sa.true())
+        .scalar_subquery()
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('horario', schema=None) as batch_op:
+        batch_op.drop_column('ocupados')
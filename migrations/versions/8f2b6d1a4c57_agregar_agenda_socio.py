@@ -0,0 +1,43 @@
+"""Agregar agenda_socio (bits de días con clase y clases activas por socio)
+
+Revision ID: 8f2b6d1a4c57
+Revises: 9c4f1e7b3d26
+Create Date: 2026-10-18 23:05:47.120936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2b6d1a4c57'
+down_revision = '9c4f1e7b3d26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('agenda_socio',
+    sa.Column('socio_id', sa.Integer(), nullable=False),
+    sa.Column('dias', sa.Integer(), nullable=False),
+    sa.Column('clases', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['socio_id'], ['socio.id'], ),
+    sa.PrimaryKeyConstraint('socio_id')
+    )
+
+    # Llenar desde las inscripciones activas (mismo cálculo que models.reconstruir_agendas)
+    op.execute("""
+        INSERT INTO agenda_socio (socio_id, dias, clases)
+        SELECT inscripcion.socio_id,
+               SUM(DISTINCT CASE horario.dia_semana
+                   WHEN 'Lunes' THEN 1 WHEN 'Martes' THEN 2 WHEN 'Miércoles' THEN 4 WHEN 'Jueves' THEN 8
+                   WHEN 'Viernes' THEN 16 WHEN 'Sábado' THEN 32 WHEN 'Domingo' THEN 64 ELSE 0 END),
+               COUNT(inscripcion.id)
+        FROM inscripcion JOIN horario ON horario.id = inscripcion.horario_id
+        WHERE inscripcion.activo = 1
+        GROUP BY inscripcion.socio_id
+    """)
+
+
+def downgrade():
+    op.drop_table('agenda_socio')
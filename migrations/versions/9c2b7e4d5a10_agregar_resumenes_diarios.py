@@ -0,0 +1,59 @@
+"""Agregar resúmenes diarios de ingresos y asistencia
+
+Revision ID: 9c2b7e4d5a10
+Revises: 4d8a2f6c1e93
+Create Date: 2026-10-18 14:48:21.605117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2b7e4d5a10'
+down_revision = '4d8a2f6c1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumen_ingreso_diario',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('concepto', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('pagos', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('fecha', 'concepto')
+    )
+    op.create_table('resumen_asistencia_diaria',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('horario_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('presentes', sa.Integer(), nullable=False),
+    sa.Column('faltas', sa.Integer(), nullable=False),
+    sa.Column('justificados', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['horario_id'], ['horario.id'], ),
+    sa.PrimaryKeyConstraint('fecha', 'horario_id')
+    )
+
+    # --- Llenado inicial desde pagos y asistencias ---
+    op.execute("""
+        INSERT INTO resumen_ingreso_diario (fecha, concepto, total, pagos)
+        SELECT date(fecha_pago), COALESCE(concepto_tipo, 'Otro'), COALESCE(SUM(total_cobrado), 0), COUNT(id)
+        FROM pago
+        WHERE fecha_pago IS NOT NULL
+        GROUP BY date(fecha_pago), COALESCE(concepto_tipo, 'Otro')
+    """)
+    op.execute("""
+        INSERT INTO resumen_asistencia_diaria (fecha, horario_id, total, presentes, faltas, justificados)
+        SELECT fecha, horario_id, COUNT(id),
+               SUM(CASE WHEN estado = 'Presente' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN estado = 'Falta' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN estado = 'Justificado' THEN 1 ELSE 0 END)
+        FROM asistencia
+        GROUP BY fecha, horario_id
+    """)
+
+
+def downgrade():
+    op.drop_table('resumen_asistencia_diaria')
+    op.drop_table('resumen_ingreso_diario')
@@ -0,0 +1,44 @@
+"""Agregar bitácora de recordatorios de pago e índices de vencimiento
+
+Revision ID: 9c4f1e7b3d26
+Revises: 7b3e9d2c5a18
+Create Date: 2026-10-18 21:40:12.551873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4f1e7b3d26'
+down_revision = '7b3e9d2c5a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recordatorio',
+    sa.Column('socio_id', sa.Integer(), nullable=False),
+    sa.Column('concepto', sa.String(length=20), nullable=False),
+    sa.Column('vence', sa.DateTime(), nullable=False),
+    sa.Column('motivo', sa.String(length=20), nullable=False),
+    sa.Column('canal', sa.String(length=20), nullable=False),
+    sa.Column('destino', sa.String(length=120), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('actualizado', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['socio_id'], ['socio.id'], ),
+    sa.PrimaryKeyConstraint('socio_id', 'concepto', 'vence', 'motivo')
+    )
+    with op.batch_alter_table('estatus_socio', schema=None) as batch_op:
+        batch_op.create_index('ix_estatus_socio_vence_mensualidad', ['vence_mensualidad'], unique=False)
+        batch_op.create_index('ix_estatus_socio_vence_anualidad', ['vence_anualidad'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('estatus_socio', schema=None) as batch_op:
+        batch_op.drop_index('ix_estatus_socio_vence_anualidad')
+        batch_op.drop_index('ix_estatus_socio_vence_mensualidad')
+
+    op.drop_table('recordatorio')
@@ -0,0 +1,34 @@
+"""Agregar tabla importacion_avance para importaciones reanudables
+
+Revision ID: a3c5e8f1d246
+Revises: 6f2a9d4c8b17
+Create Date: 2026-10-18 16:48:29.114032
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e8f1d246'
+down_revision = '6f2a9d4c8b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('importacion_avance',
+    sa.Column('clave', sa.String(length=80), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('archivo', sa.String(length=255), nullable=False),
+    sa.Column('filas_procesadas', sa.Integer(), nullable=False),
+    sa.Column('insertadas', sa.Integer(), nullable=False),
+    sa.Column('rechazadas', sa.Integer(), nullable=False),
+    sa.Column('completada', sa.Boolean(), nullable=False),
+    sa.Column('actualizada', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('clave')
+    )
+
+
+def downgrade():
+    op.drop_table('importacion_avance')
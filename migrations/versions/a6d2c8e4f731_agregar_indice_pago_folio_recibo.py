@@ -0,0 +1,26 @@
+"""Agregar índice de folio_recibo (la importación de pagos rechaza recibos repetidos)
+
+Revision ID: a6d2c8e4f731
+Revises: 8f2b6d1a4c57
+Create Date: 2026-10-19 10:12:31.508214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2c8e4f731'
+down_revision = '8f2b6d1a4c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.create_index('ix_pago_folio_recibo', ['folio_recibo'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.drop_index('ix_pago_folio_recibo')
@@ -0,0 +1,67 @@
+"""Agregar índices compuestos y parciales
+
+Revision ID: c7d4a91e5f23
+Revises: 8e3f0b6a2c11
+Create Date: 2026-10-18 11:21:05.904317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d4a91e5f23'
+down_revision = '8e3f0b6a2c11'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.create_index('ix_pago_socio_concepto_fecha', ['socio_id', 'concepto_tipo', 'fecha_pago'], unique=False)
+        batch_op.create_index('ix_pago_fecha_pago', ['fecha_pago'], unique=False)
+
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.create_index('ix_asistencia_horario_fecha', ['horario_id', 'fecha'], unique=False)
+        batch_op.create_index('ix_asistencia_socio_fecha', ['socio_id', 'fecha'], unique=False)
+
+    with op.batch_alter_table('inscripcion', schema=None) as batch_op:
+        batch_op.create_index('ix_inscripcion_socio_activo', ['socio_id', 'horario_id'], unique=False,
+                              sqlite_where=sa.text('activo = 1'))
+        batch_op.create_index('ix_inscripcion_horario_activo', ['horario_id', 'socio_id'], unique=False,
+                              sqlite_where=sa.text('activo = 1'))
+
+    with op.batch_alter_table('horario', schema=None) as batch_op:
+        batch_op.create_index('ix_horario_dia_hora', ['dia_semana', 'hora_inicio'], unique=False)
+        batch_op.create_index('ix_horario_nivel_hora', ['nivel', 'hora_inicio'], unique=False)
+
+    # Quitar tarifas repetidas antes del índice único: se conserva la más reciente (id mayor)
+    op.execute("""
+        DELETE FROM tarifa WHERE id NOT IN (
+            SELECT MAX(id) FROM tarifa GROUP BY membresia_id, nivel
+        )
+    """)
+
+    with op.batch_alter_table('tarifa', schema=None) as batch_op:
+        batch_op.create_index('uq_tarifa_membresia_nivel', ['membresia_id', 'nivel'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('tarifa', schema=None) as batch_op:
+        batch_op.drop_index('uq_tarifa_membresia_nivel')
+
+    with op.batch_alter_table('horario', schema=None) as batch_op:
+        batch_op.drop_index('ix_horario_nivel_hora')
+        batch_op.drop_index('ix_horario_dia_hora')
+
+    with op.batch_alter_table('inscripcion', schema=None) as batch_op:
+        batch_op.drop_index('ix_inscripcion_horario_activo', sqlite_where=sa.text('activo = 1'))
+        batch_op.drop_index('ix_inscripcion_socio_activo', sqlite_where=sa.text('activo = 1'))
+
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.drop_index('ix_asistencia_socio_fecha')
+        batch_op.drop_index('ix_asistencia_horario_fecha')
+
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.drop_index('ix_pago_fecha_pago')
+        batch_op.drop_index('ix_pago_socio_concepto_fecha')
@@ -0,0 +1,26 @@
+"""Agregar índice por fecha en asistencia para exportaciones
+
+Revision ID: d7b1f4a9c362
+Revises: a3c5e8f1d246
+Create Date: 2026-10-18 17:22:41.907315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b1f4a9c362'
+down_revision = 'a3c5e8f1d246'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.create_index('ix_asistencia_fecha', ['fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('asistencia', schema=None) as batch_op:
+        batch_op.drop_index('ix_asistencia_fecha')
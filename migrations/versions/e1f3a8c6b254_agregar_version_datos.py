@@ -0,0 +1,29 @@
+"""Agregar tabla version_datos para invalidar cachés
+
+Revision ID: e1f3a8c6b254
+Revises: 9c2b7e4d5a10
+Create Date: 2026-10-18 15:20:37.118420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f3a8c6b254'
+down_revision = '9c2b7e4d5a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    version_datos = op.create_table('version_datos',
+    sa.Column('nombre', sa.String(length=30), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+    op.bulk_insert(version_datos, [{'nombre': 'agenda', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('version_datos')
@@ -1,6 +1,8 @@
+import argparse
 from app import create_app, db
-from app.models import Membresia, Tarifa, Horario, Socio, Inscripcion, Pago, User, Nivel
-from datetime import time, datetime
+from app.models import Membresia, Horario, Socio, Pago, registrar_pago_en_estatus, acumular_ingreso
+from app import generador
+from datetime import date, datetime
 
 # Crear instancia de la app para acceder a la BD
 app = create_app()
@@ -11,57 +13,23 @@ def seed_database():
 
         # 1. LIMPIEZA TOTAL (Opcional: borra todo para empezar limpio)
         print("⚠️  Borrando datos antiguos...")
-        db.drop_all()
-        db.create_all()
-
-        # 2. MEMBRESÍAS
-        print("   Creando Membresías...")
-        plan_a = Membresia(nombre="Plan A (1 Clase/sem)", clases_por_semana=1)
-        plan_b = Membresia(nombre="Plan B (2 Clases/sem)", clases_por_semana=2)
-        plan_c = Membresia(nombre="Plan C (3 Clases/sem)", clases_por_semana=3)
-        plan_f = Membresia(nombre="Plan F (6 Clases/sem)", clases_por_semana=6)
-        
-        db.session.add_all([plan_a, plan_b, plan_c, plan_f])
-        db.session.commit() # Guardamos para obtener los IDs
-
-        # 3. TARIFAS (Relacionadas con Membresías)
-        print("   Creando Tarifas...")
-        # Tarifas Plan A
-        t1 = Tarifa(membresia_id=plan_a.id, nivel="Niños", costo_mensual=800, costo_anualidad=2000, costo_inscripcion=500)
-        t2 = Tarifa(membresia_id=plan_a.id, nivel="Adultos", costo_mensual=900, costo_anualidad=2000, costo_inscripcion=500)
-        
-        # Tarifas Plan B
-        t3 = Tarifa(membresia_id=plan_b.id, nivel="Niños", costo_mensual=1400, costo_anualidad=2000, costo_inscripcion=500)
-        t4 = Tarifa(membresia_id=plan_b.id, nivel="Adultos", costo_mensual=1600, costo_anualidad=2000, costo_inscripcion=500)
-
-        db.session.add_all([t1, t2, t3, t4])
-
-        # 4. HORARIOS (Generación masiva)
+        generador.reiniciar_esquema()
+
+        # 2. NIVELES, MEMBRESÍAS Y TARIFAS (una tarifa por plan y nivel)
+        print("   Creando Niveles, Membresías y Tarifas...")
+        planes, _ = generador.crear_catalogos()
+        plan_a = planes["Plan A (1 Clase/sem)"]
+        plan_b = planes["Plan B (2 Clases/sem)"]
+
+        # 3. HORARIOS (Lunes a Viernes, 4pm a 8pm, cupo estándar de 8)
         print("   Generando Horarios Semanales...")
-        dias = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
-        horas_clase = [
-            (time(16, 0), time(17, 0), "Niños"),  # 4pm a 5pm
-            (time(17, 0), time(18, 0), "Niños"),  # 5pm a 6pm
-            (time(18, 0), time(19, 0), "Adultos"), # 6pm a 7pm
-            (time(19, 0), time(20, 0), "Adultos"), # 7pm a 8pm
-        ]
-
-        for dia in dias:
-            for inicio, fin, nivel in horas_clase:
-                h = Horario(
-                    dia_semana=dia,
-                    hora_inicio=inicio,
-                    hora_fin=fin,
-                    nivel=nivel,
-                    capacidad_maxima=8 # Cupo estándar
-                )
-                db.session.add(h)
-        
+        filas = generador.filas_horarios(generador.HORAS_BASE, dias=generador.DIAS[:5])
+        db.session.add_all([Horario(**fila) for fila in filas])
         db.session.commit()
 
-        # 5. SOCIOS DE PRUEBA
+        # 4. SOCIOS DE PRUEBA
         print("   Registrando Socios Dummy...")
-        
+
         # Socio 1: Juanito (Niño, Plan B)
         juan = Socio(
             folio="SW0001",
@@ -85,9 +53,9 @@ def seed_database():
         db.session.add_all([juan, maria])
         db.session.commit()
 
-        # 6. PAGOS INICIALES (Para probar estado financiero)
+        # 5. PAGOS INICIALES (Para probar estado financiero)
         print("   Registrando Pagos...")
-        
+
         # Juan paga inscripción y anualidad
         pago1 = Pago(
             folio_recibo="REC-001",
@@ -98,34 +66,14 @@ def seed_database():
             total_cobrado=2000,
             metodo_pago="Efectivo"
         )
-        
+
         db.session.add(pago1)
+        registrar_pago_en_estatus(pago1)
+        acumular_ingreso(pago1)
         db.session.commit()
 
         print("   Creando Usuarios del Sistema...")
-        
-        # Usuario Administrador
-        admin = User(username='admin', role='admin')
-        admin.set_password('admin123') # Contraseña simple para pruebas
-        
-        # Usuario Recepción
-        recep = User(username='recepcion', role='recepcion')
-        recep.set_password('1234')
-        
-        # Usuario Instructor
-        profe = User(username='profe', role='instructor')
-        profe.set_password('1234')
-        
-        db.session.add_all([admin, recep, profe])
-        db.session.commit()
-
-        print("   Creando Niveles...")
-        n1 = Nivel(nombre="Bebés", orden=1)
-        n2 = Nivel(nombre="Niños", orden=2)
-        n3 = Nivel(nombre="Adultos", orden=3)
-
-        db.session.add_all([n1, n2, n3])
-        db.session.commit()
+        generador.crear_usuarios()
 
         print("✅ Base de datos sembrada con éxito.")
         print(f"   -> {Membresia.query.count()} Membresías")
@@ -133,5 +81,27 @@ def seed_database():
         print(f"   -> {Socio.query.count()} Socios")
         print("✅ Usuarios creados: admin / recepcion / profe")
 
+def seed_volumen(socios, anios, semanas, semilla, hasta):
+    """ Conjunto sintético grande (ver app/generador.py); igual que 'flask datos generar' """
+    with app.app_context():
+        print(f"🌱 Generando {socios} socios (semilla {semilla})...")
+        conteo = generador.generar(socios=socios, anios=anios, semanas_asistencia=semanas, hasta=hasta,
+                                   semilla=semilla, progreso=lambda texto: print(f"\r   {texto}", end=""))
+        print()
+        for tabla, filas in conteo.items():
+            print(f"   -> {filas:,} {tabla}")
+        print("✅ Usuarios creados: admin / recepcion / profe")
+
 if __name__ == '__main__':
-    seed_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Siembra la base de datos (BORRA lo que haya).")
+    parser.add_argument("--socios", type=int, help="Generar N socios sintéticos con historial en vez de la demo.")
+    parser.add_argument("--anios", type=int, default=2)
+    parser.add_argument("--semanas-asistencia", type=int, default=12)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Fecha final del historial (AAAA-MM-DD).")
+    args = parser.parse_args()
+
+    if args.socios:
+        seed_volumen(args.socios, args.anios, args.semanas_asistencia, args.semilla, args.hasta)
+    else:
+        seed_database()